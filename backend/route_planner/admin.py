@@ -1,6 +1,14 @@
 from django.contrib import admin
 import logging
-from .models import TripPlan, HOSViolation
+from .models import (
+    TripPlan,
+    HOSViolation,
+    GeocodeCacheEntry,
+    RouteCacheEntry,
+    FuelStation,
+    FuelPrice,
+    DriverDutyDay,
+)
 
 logger = logging.getLogger("route_planner.admin")
 
@@ -38,3 +46,41 @@ class HOSViolationAdmin(admin.ModelAdmin):
             f"{action} HOSViolation: Type={obj.violation_type}, Severity={obj.severity}, Trip ID={obj.trip.id}"
         )
         super().save_model(request, obj, form, change)
+
+
+@admin.register(GeocodeCacheEntry)
+class GeocodeCacheEntryAdmin(admin.ModelAdmin):
+    list_display = ("key", "found", "latitude", "longitude", "hit_count", "expires_at")
+    list_filter = ("found",)
+    search_fields = ("key", "query")
+    readonly_fields = ("created_at",)
+
+
+@admin.register(RouteCacheEntry)
+class RouteCacheEntryAdmin(admin.ModelAdmin):
+    list_display = ("key", "profile", "size_bytes", "hit_count", "last_accessed_at")
+    list_filter = ("profile",)
+    search_fields = ("key",)
+    readonly_fields = ("created_at",)
+    exclude = ("payload",)
+
+
+@admin.register(FuelStation)
+class FuelStationAdmin(admin.ModelAdmin):
+    list_display = ("osm_id", "name", "latitude", "longitude", "imported_at")
+    search_fields = ("name", "osm_id")
+    readonly_fields = ("imported_at",)
+
+
+@admin.register(FuelPrice)
+class FuelPriceAdmin(admin.ModelAdmin):
+    list_display = ("osm_id", "price_per_gallon", "updated_at")
+    search_fields = ("osm_id",)
+    readonly_fields = ("updated_at",)
+
+
+@admin.register(DriverDutyDay)
+class DriverDutyDayAdmin(admin.ModelAdmin):
+    list_display = ("user", "date", "on_duty_minutes")
+    list_filter = ("date",)
+    search_fields = ("user__username",)
@@ -0,0 +1,372 @@
+import asyncio
+import logging
+import time
+from contextlib import AsyncExitStack
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from . import metrics
+from .cache import ROUTE_CACHE_MODES, get_station_tile_cache
+from .circuit import get_breaker, is_upstream_failure
+from .coalesce import coalesce_many_async
+from .fuel_stations import get_station_index
+from .providers import get_provider
+from .services import FUEL_PLAN_RADIUS_KM, HOSCalculator, RouteService
+from .utils import (
+    FUEL_SEARCH_MODES,
+    RouteCorridor,
+    assign_stations_to_positions,
+    build_overpass_corridor_query,
+    build_overpass_tiles_query,
+    build_overpass_union_query,
+    is_truck_friendly,
+    lookup_station_tiles,
+    overpass_elements_to_stations,
+    route_corridor,
+    route_stop_positions,
+    search_corridor_index,
+    search_station_index,
+    stations_from_tiles,
+    store_station_tiles,
+    summarize_station,
+)
+
+logger = logging.getLogger("route_planner.async_services")
+
+
+class AsyncRouteService(RouteService):
+    """
+    ``RouteService`` whose upstream calls are awaited through the provider's
+    async methods (the shared ``httpx.AsyncClient`` for the live provider)
+    instead of blocking a worker thread.
+
+    Cache reads and writes still go through the ORM and run via
+    ``sync_to_async``; request building and response parsing are inherited.
+    """
+
+    async def geocode_location(self, location):
+        return (await self.geocode_locations([location]))[0]
+
+    async def geocode_locations(self, locations):
+        """Async counterpart of ``RouteService.geocode_locations``"""
+        results, misses = await sync_to_async(self._lookup_geocodes)(locations)
+        if misses:
+            async with coalesce_many_async(self._geocode_flight_keys(misses)) as waited:
+                if waited:
+                    results, misses = await sync_to_async(self._recheck_geocodes)(
+                        results, misses
+                    )
+                fetched = await asyncio.gather(
+                    *(self._request_geocode_async(location) for location in misses)
+                )
+                await sync_to_async(self._store_geocodes)(results, misses, fetched)
+                await sync_to_async(self._serve_stale_geocodes)(
+                    results, misses, fetched
+                )
+        return [results[location] for location in locations]
+
+    async def _request_geocode_async(self, location):
+        breaker = get_breaker("ors")
+        if not breaker.allow():
+            logger.warning(f"ORS circuit open, not geocoding '{location}'")
+            return None, False
+
+        response = None
+        started = time.monotonic()
+        try:
+            logger.debug(f"Making async geocoding request for '{location}'")
+            response = await self.provider.geocode_async(location)
+            elapsed = time.monotonic() - started
+            metrics.observe("geocode.upstream", elapsed)
+            breaker.record(not is_upstream_failure(response.status_code), elapsed)
+            return self._handle_geocode_response(location, response)
+        except Exception as e:
+            logger.error(f"Geocoding error for location '{location}': {e}")
+
+        if response is None:
+            breaker.record(False)
+        return None, False
+
+    async def get_route(
+        self, start_coords, end_coords, waypoints=None, cache_mode=None
+    ):
+        return (
+            await self.get_routes(
+                [(start_coords, end_coords, waypoints)], cache_mode=cache_mode
+            )
+        )[0]
+
+    async def get_routes(self, legs, cache_mode=None):
+        """Async counterpart of ``RouteService.get_routes``"""
+        cache_mode = cache_mode or self.route_cache_mode
+        if cache_mode not in ROUTE_CACHE_MODES:
+            raise ValueError(f"Invalid route cache mode: {cache_mode}")
+
+        results, pending, route_requests = await sync_to_async(self._lookup_routes)(
+            legs, cache_mode
+        )
+        if not pending:
+            return results
+
+        async with AsyncExitStack() as stack:
+            if cache_mode == "default":
+                waited = await stack.enter_async_context(
+                    coalesce_many_async(self._route_flight_keys(pending))
+                )
+                if waited:
+                    results, pending, route_requests = await sync_to_async(
+                        self._recheck_routes
+                    )(legs, cache_mode, pending)
+            fetched = await asyncio.gather(
+                *(self._request_route_async(*args) for args in route_requests)
+            )
+            await sync_to_async(self._store_routes)(
+                results, pending, fetched, cache_mode
+            )
+            await sync_to_async(self._serve_stale_routes)(
+                results, pending, route_requests, cache_mode
+            )
+        return results
+
+    async def _request_route_async(self, data, start_coords, end_coords):
+        breaker = get_breaker("ors")
+        if not breaker.allow():
+            logger.warning(
+                f"ORS circuit open, not routing between {start_coords} and {end_coords}"
+            )
+            return None
+
+        response = None
+        try:
+            logger.debug(
+                f"Making async routing request from {start_coords} to {end_coords}"
+            )
+            started = time.monotonic()
+            response = await self.provider.directions_async(self.routing_profile, data)
+            elapsed = time.monotonic() - started
+            metrics.observe("route.upstream", elapsed)
+            breaker.record(not is_upstream_failure(response.status_code), elapsed)
+
+            return self._handle_route_response(response, start_coords, end_coords)
+        except httpx.TimeoutException:
+            logger.error(
+                f"Request timeout for route between {start_coords} and {end_coords}"
+            )
+        except httpx.TransportError as e:
+            logger.error(
+                f"Connection error for route between {start_coords} and {end_coords}: {e}"
+            )
+        except Exception as e:
+            logger.error(f"Route error between {start_coords} and {end_coords}: {e}")
+            logger.exception("Detailed exception info for route calculation:")
+
+        if response is None:
+            breaker.record(False)
+        return None
+
+
+async def find_nearby_gas_stations_async(
+    lat: float, lng: float, radius_km: float = 2.0
+) -> List[Dict[str, Any]]:
+    """Async counterpart of ``utils.find_nearby_gas_stations``"""
+    return (await find_gas_stations_near_positions_async([(lat, lng)], radius_km))[0]
+
+
+async def find_gas_stations_near_positions_async(
+    positions: List[Tuple[float, float]], radius_km: float = 2.0
+) -> List[List[Dict[str, Any]]]:
+    """Async counterpart of ``utils.find_gas_stations_near_positions``"""
+    index = await sync_to_async(get_station_index)()
+    results, remote = search_station_index(index, positions, radius_km)
+    if remote:
+        remote_positions = [positions[i] for i in remote]
+        if get_station_tile_cache().enabled:
+            fetched = await query_station_tiles_async(remote_positions, radius_km)
+        else:
+            fetched = await query_overpass_stations_async(remote_positions, radius_km)
+        for i, stations in zip(remote, fetched):
+            results[i] = stations
+    return results
+
+
+async def query_station_tiles_async(
+    positions: List[Tuple[float, float]], radius_km: float = 2.0
+) -> List[List[Dict[str, Any]]]:
+    """Async counterpart of ``utils.query_station_tiles``"""
+    cache = get_station_tile_cache()
+    covering, tiles, missing = lookup_station_tiles(cache, positions, radius_km)
+    if missing:
+        stations = await fetch_overpass_stations_async(
+            build_overpass_tiles_query(missing), f"{len(missing)} tiles"
+        )
+        store_station_tiles(cache, tiles, missing, stations)
+    return stations_from_tiles(positions, radius_km, covering, tiles)
+
+
+async def query_overpass_stations_async(
+    positions: List[Tuple[float, float]], radius_km: float = 2.0
+) -> List[List[Dict[str, Any]]]:
+    """Async counterpart of ``utils.query_overpass_stations``"""
+    stations = await fetch_overpass_stations_async(
+        build_overpass_union_query(positions, radius_km), f"{len(positions)} points"
+    )
+    if stations is None:
+        return [[] for _ in positions]
+    return assign_stations_to_positions(stations, positions)
+
+
+async def fetch_overpass_stations_async(
+    query: str, target: str
+) -> Optional[List[Dict[str, Any]]]:
+    """Async counterpart of ``utils.fetch_overpass_stations``"""
+    breaker = get_breaker("overpass")
+    if not breaker.allow():
+        logger.warning(f"Overpass circuit open, skipping fuel search at {target}")
+        return None
+
+    response = None
+    try:
+        started = time.monotonic()
+        response = await get_provider().overpass_async(query)
+        breaker.record(
+            not is_upstream_failure(response.status_code), time.monotonic() - started
+        )
+
+        if response.status_code != 200:
+            logger.error(f"Overpass API error: {response.status_code}, {response.text}")
+            return None
+
+        return overpass_elements_to_stations(response.json())
+
+    except Exception as e:
+        logger.error(f"Error finding nearby gas stations: {str(e)}", exc_info=True)
+        if response is None:
+            breaker.record(False)
+        return None
+
+
+async def find_gas_stations_in_corridor_async(
+    corridor: RouteCorridor,
+) -> List[Dict[str, Any]]:
+    """Async counterpart of ``utils.find_gas_stations_in_corridor``"""
+    index = await sync_to_async(get_station_index)()
+    stations = search_corridor_index(index, corridor)
+    if stations is None:
+        stations = (
+            await fetch_overpass_stations_async(
+                build_overpass_corridor_query(corridor.line, corridor.search_radius_km),
+                f"corridor of {len(corridor.line)} points",
+            )
+            or []
+        )
+    return corridor.locate([s for s in stations if is_truck_friendly(s)])
+
+
+async def find_gas_stations_along_route_async(
+    route_geometry: Dict[str, Any],
+    number_of_stops: int,
+    radius_km: float = 2.0,
+    mode: str = "points",
+) -> List[Dict[str, Any]]:
+    """Async counterpart of ``utils.find_gas_stations_along_route``"""
+    if mode not in FUEL_SEARCH_MODES:
+        raise ValueError(f"Invalid fuel search mode: {mode}")
+
+    if not route_geometry or (mode == "points" and number_of_stops <= 0):
+        logger.warning("Invalid parameters for finding gas stations")
+        return []
+
+    try:
+        if mode == "corridor":
+            corridor = route_corridor(route_geometry, radius_km)
+            if corridor is None:
+                return []
+            stations = await find_gas_stations_in_corridor_async(corridor)
+            return [summarize_station(station) for station in stations]
+
+        stop_positions = route_stop_positions(route_geometry, number_of_stops)
+        if not stop_positions:
+            return []
+
+        results = await find_gas_stations_near_positions_async(
+            stop_positions, radius_km
+        )
+        return [summarize_station(stations[0]) for stations in results if stations]
+
+    except Exception as e:
+        logger.error(f"Error finding gas stations: {str(e)}", exc_info=True)
+        return []
+
+
+class AsyncHOSCalculator(HOSCalculator):
+    """``HOSCalculator`` whose geocoding, routing and fuel lookups are awaited"""
+
+    async def calculate_eld_logs(self, trip_data):
+        """Async counterpart of ``HOSCalculator.calculate_eld_logs``"""
+        current_location, pickup_location, dropoff_location, current_cycle_hours = (
+            self._parse_trip_data(trip_data)
+        )
+        departure = self._parse_departure(trip_data)
+        route_service = AsyncRouteService(route_cache_mode=self.route_cache_mode)
+
+        current_coords, pickup_coords, dropoff_coords = (
+            await route_service.geocode_locations(
+                [current_location, pickup_location, dropoff_location]
+            )
+        )
+        current = (current_location, current_coords)
+        pickup = (pickup_location, pickup_coords)
+        dropoff = (dropoff_location, dropoff_coords)
+        self._check_geocodes(current, pickup, dropoff)
+
+        legs = None
+        if settings.ROUTE_SINGLE_REQUEST:
+            full_route = await route_service.get_route(
+                current_coords, dropoff_coords, waypoints=[pickup_coords]
+            )
+            legs = self._split_full_route(full_route, current, pickup, dropoff)
+        if legs is None:
+            routes = await route_service.get_routes(
+                [(current_coords, pickup_coords), (pickup_coords, dropoff_coords)]
+            )
+            legs = self._check_legs(*routes, current, pickup, dropoff)
+        route_to_pickup, route_to_delivery = legs
+
+        total_distance, total_duration = self._summarize_route(
+            route_to_pickup, route_to_delivery
+        )
+        route_geometry, instructions = self._compact_route_legs(
+            route_to_pickup, route_to_delivery
+        )
+
+        if self.fuel_strategy == "interval":
+            fuel_stops = self._fuel_stops_required(total_distance)
+            gas_stations = await find_gas_stations_along_route_async(
+                route_geometry, fuel_stops, mode=self.fuel_search_mode
+            )
+            fuel_stop_hours = None
+        else:
+            corridor = route_corridor(route_geometry, FUEL_PLAN_RADIUS_KM)
+            stations = (
+                await find_gas_stations_in_corridor_async(corridor) if corridor else []
+            )
+            fuel_stops, gas_stations, fuel_stop_hours = await sync_to_async(
+                self._plan_fuel_stops
+            )(corridor, stations, total_distance, total_duration)
+        logger.info(f"Found {len(gas_stations)} gas stations along the route")
+
+        return self._build_trip_result(
+            total_distance,
+            total_duration,
+            current_cycle_hours,
+            route_geometry,
+            fuel_stops,
+            gas_stations,
+            stale=bool(route_service.stale_sources),
+            route_instructions=instructions,
+            fuel_stop_hours=fuel_stop_hours,
+            departure=departure,
+        )
@@ -0,0 +1,283 @@
+"""
+Planning many trips in one request.
+
+Every address in the batch is geocoded once and every distinct lane routed
+once, fuel stations are looked up on the I/O pool and the HOS simulation of
+each trip, the CPU-bound part, runs on the planner process pool. Trips
+succeed or fail independently: one bad address does not fail the batch.
+"""
+
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.conf import settings
+
+from .executor import map_concurrent, map_processes
+from .fuel_stations import get_station_index
+from .services import FUEL_PLAN_RADIUS_KM, HOSCalculator, RouteService
+from .utils import (
+    find_gas_stations_along_route,
+    find_gas_stations_in_corridor,
+    route_corridor,
+)
+
+logger = logging.getLogger("route_planner.batch")
+
+
+def _coords_key(coords) -> Tuple[float, ...]:
+    return tuple(coords)
+
+
+def _simulate_trip(args) -> List[Dict[str, Any]]:
+    """Process pool task: the daily logs of one trip"""
+    total_duration, current_cycle_hours, fuel_stops, fuel_stop_hours, departure = args
+    return HOSCalculator()._trip_logs(
+        total_duration,
+        current_cycle_hours,
+        fuel_stops,
+        fuel_stop_hours,
+        departure=departure,
+    )
+
+
+def _failure(e: Exception) -> Dict[str, Any]:
+    if isinstance(e, ValueError):
+        return {"error": str(e), "error_type": "validation_error"}
+    logger.error(f"Batch trip planning failed: {e}", exc_info=e)
+    return {"error": str(e), "error_type": "server_error"}
+
+
+class BatchTripPlanner:
+    """
+    Plans a list of trips with the same inputs as
+    ``HOSCalculator.calculate_eld_logs``.
+
+    ``plan`` returns one outcome per trip, in order: ``{"result": ...}``
+    holding the trip result, or ``{"error": ..., "error_type": ...}``.
+    """
+
+    def __init__(
+        self, route_cache_mode="default", fuel_search_mode=None, fuel_strategy=None
+    ):
+        self.calculator = HOSCalculator(
+            route_cache_mode=route_cache_mode,
+            fuel_search_mode=fuel_search_mode,
+            fuel_strategy=fuel_strategy,
+        )
+        self.route_cache_mode = route_cache_mode
+
+    def plan(self, trips: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        if not trips:
+            return []
+        outcomes: List[Optional[Dict[str, Any]]] = [None] * len(trips)
+        route_service = RouteService(route_cache_mode=self.route_cache_mode)
+
+        parsed = {}
+        departures = {}
+        for i, trip in enumerate(trips):
+            try:
+                parsed[i] = self.calculator._parse_trip_data(trip)
+                departures[i] = self.calculator._parse_departure(trip)
+            except ValueError as e:
+                parsed.pop(i, None)
+                outcomes[i] = _failure(e)
+
+        # Trips planned from a stale geocode or route
+        stale = set()
+        endpoints = self._geocode(route_service, parsed, outcomes, stale)
+        legs = self._route(route_service, endpoints, outcomes, stale)
+
+        routes = {}
+        for i, (route_to_pickup, route_to_delivery) in legs.items():
+            try:
+                total_distance, total_duration = self.calculator._summarize_route(
+                    route_to_pickup, route_to_delivery
+                )
+                route_geometry, instructions = self.calculator._compact_route_legs(
+                    route_to_pickup, route_to_delivery
+                )
+            except ValueError as e:
+                outcomes[i] = _failure(e)
+                continue
+            routes[i] = (total_distance, total_duration, route_geometry, instructions)
+
+        fuel = self._find_fuel_stops(routes, outcomes)
+
+        order = list(fuel)
+        logs = map_processes(
+            _simulate_trip,
+            [
+                (routes[i][1], parsed[i][3], fuel[i][0], fuel[i][2], departures[i])
+                for i in order
+            ],
+        )
+        for i, trip_logs in zip(order, logs):
+            if isinstance(trip_logs, Exception):
+                outcomes[i] = _failure(trip_logs)
+                continue
+            total_distance, total_duration, route_geometry, instructions = routes[i]
+            fuel_stops, gas_stations, fuel_stop_hours = fuel[i]
+            outcomes[i] = {
+                "result": self.calculator._build_trip_result(
+                    total_distance,
+                    total_duration,
+                    parsed[i][3],
+                    route_geometry,
+                    fuel_stops,
+                    gas_stations,
+                    stale=i in stale,
+                    route_instructions=instructions,
+                    fuel_stop_hours=fuel_stop_hours,
+                    logs=trip_logs,
+                    departure=departures[i],
+                )
+            }
+
+        logger.info(
+            f"Planned {sum('result' in o for o in outcomes)} of {len(trips)} trips"
+        )
+        return outcomes
+
+    def _geocode(self, route_service, parsed, outcomes, stale):
+        """
+        Geocode every distinct address in the batch once; returns the
+        ``(location, coords)`` endpoints of each trip that geocoded and adds
+        trips with a stale address to ``stale``
+        """
+        locations = list(
+            dict.fromkeys(
+                location for trip in parsed.values() for location in trip[:3]
+            )
+        )
+        coords = dict(zip(locations, route_service.geocode_locations(locations)))
+
+        endpoints = {}
+        for i, trip in parsed.items():
+            ends = tuple((location, coords[location]) for location in trip[:3])
+            try:
+                self.calculator._check_geocodes(*ends)
+            except ValueError as e:
+                outcomes[i] = _failure(e)
+                continue
+            endpoints[i] = ends
+            if route_service.stale_locations.intersection(trip[:3]):
+                stale.add(i)
+        return endpoints
+
+    def _route(self, route_service, endpoints, outcomes, stale):
+        """
+        Route every distinct lane once, as one request via pickup when
+        ``ROUTE_SINGLE_REQUEST`` is set, falling back to separate legs for
+        routes that cannot be split; adds trips routed stale to ``stale``
+        """
+        legs = {}
+        pending = dict(endpoints)
+
+        if settings.ROUTE_SINGLE_REQUEST:
+            full_routes, stale_full = self._get_routes(
+                route_service,
+                {
+                    i: (current[1], dropoff[1], [pickup[1]])
+                    for i, (current, pickup, dropoff) in endpoints.items()
+                },
+            )
+            for i, (current, pickup, dropoff) in endpoints.items():
+                try:
+                    split = self.calculator._split_full_route(
+                        full_routes[i], current, pickup, dropoff
+                    )
+                except ValueError as e:
+                    outcomes[i] = _failure(e)
+                    del pending[i]
+                    continue
+                if split is not None:
+                    legs[i] = split
+                    del pending[i]
+                    if i in stale_full:
+                        stale.add(i)
+
+        if pending:
+            requests = {}
+            for i, (current, pickup, dropoff) in pending.items():
+                requests[i, "to_pickup"] = (current[1], pickup[1])
+                requests[i, "to_delivery"] = (pickup[1], dropoff[1])
+            leg_routes, stale_legs = self._get_routes(route_service, requests)
+            for i, ends in pending.items():
+                try:
+                    legs[i] = self.calculator._check_legs(
+                        leg_routes[i, "to_pickup"], leg_routes[i, "to_delivery"], *ends
+                    )
+                except ValueError as e:
+                    outcomes[i] = _failure(e)
+                    continue
+                if {(i, "to_pickup"), (i, "to_delivery")} & stale_legs:
+                    stale.add(i)
+        return legs
+
+    def _get_routes(self, route_service, requests):
+        """Route ``{key: (start, end[, waypoints])}`` requesting each distinct
+        lane once; returns the routes by key and the keys served stale"""
+        keys = {
+            i: tuple(
+                _coords_key(part) if j < 2 else tuple(map(_coords_key, part))
+                for j, part in enumerate(request)
+            )
+            for i, request in requests.items()
+        }
+        unique = dict(zip(keys.values(), requests.values()))
+        routed = dict(zip(unique, route_service.get_routes(list(unique.values()))))
+        stale_lanes = {
+            key
+            for key, request in unique.items()
+            if route_service.route_cache_key(*request)
+            in route_service.stale_route_keys
+        }
+        return (
+            {i: routed[key] for i, key in keys.items()},
+            {i for i, key in keys.items() if key in stale_lanes},
+        )
+
+    def _find_fuel_stops(self, routes, outcomes):
+        """
+        ``(number of stops, fuel stops, driving hours at each stop)`` per trip
+
+        Station searches run on the I/O pool against the station index
+        loaded here, on the request thread, so pool threads never reload it
+        from the database; fuel prices for planned stops are read here too.
+        """
+        index = get_station_index()
+
+        calculator = self.calculator
+        order = list(routes)
+
+        def search(i):
+            total_distance, _, route_geometry, _ = routes[i]
+            try:
+                if calculator.fuel_strategy == "interval":
+                    fuel_stops = calculator._fuel_stops_required(total_distance)
+                    return fuel_stops, find_gas_stations_along_route(
+                        route_geometry,
+                        fuel_stops,
+                        mode=calculator.fuel_search_mode,
+                        index=index,
+                    )
+                corridor = route_corridor(route_geometry, FUEL_PLAN_RADIUS_KM)
+                stations = (
+                    find_gas_stations_in_corridor(corridor, index) if corridor else []
+                )
+                return corridor, stations
+            except Exception as e:
+                return e
+
+        fuel = {}
+        for i, found in zip(order, map_concurrent(search, order)):
+            if isinstance(found, Exception):
+                outcomes[i] = _failure(found)
+            elif calculator.fuel_strategy == "interval":
+                fuel[i] = (found[0], found[1], None)
+            else:
+                total_distance, total_duration, _, _ = routes[i]
+                fuel[i] = calculator._plan_fuel_stops(
+                    found[0], found[1], total_distance, total_duration
+                )
+        return fuel
@@ -0,0 +1,385 @@
+"""
+Offline benchmark suite for the planning hot paths.
+
+Three components are measured on fixed inputs so results from different
+commits can be compared:
+
+- ``HOSCalculator``: daily log generation (simulation, violation checks and
+  JSON) for synthetic trips of 50 to 6,000 miles, schedule cache bypassed;
+  and for multi-week trips, the simulation alone, log generation and logs
+  served from the schedule cache
+- ``ELDLogRenderer``: grid data for every log day of the same trips
+- ``find_gas_stations_along_route``: fuel stop and corridor searches over
+  fixture routes of up to 50,000 points, answered from a synthetic station
+  index laid along each route
+
+Fixture routes are seeded random walks written to a fixture directory the
+first time they are needed and read back on later runs; their SHA-256 is
+recorded with the results. Nothing touches the network or the database:
+the suite fails if any lookup falls through to Overpass.
+"""
+
+import hashlib
+import json
+import math
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime, timezone as dt_timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.test import override_settings
+
+from . import geometry, metrics, polyline
+from .fuel_stations import StationIndex, reset_station_index, use_station_index
+from .services import ELDLogRenderer, HOSCalculator
+from .utils import (
+    KM_PER_MILE,
+    find_gas_stations_along_route,
+    route_stop_positions,
+    station_from_tags,
+)
+
+# Average highway speed used to turn synthetic trip miles into driving hours
+AVERAGE_MPH = 55
+TRIP_MILES = (50, 250, 1000, 3000, 6000)
+# Multi-week trips, in weeks of driving
+HOS_WEEKS = (1, 2, 4, 8)
+# (points, miles) of each fixture route
+FIXTURE_ROUTES = ((1000, 300), (10000, 1500), (50000, 3000))
+# A synthetic station about every this many miles along fixture routes
+STATION_SPACING_MILES = 5
+DEPARTURE = datetime(2024, 3, 4, 6, tzinfo=dt_timezone.utc)
+RESULTS_VERSION = 1
+
+
+def measure(
+    run: Callable[[], Any], seconds: float, min_calls: int = 5
+) -> Dict[str, Any]:
+    """
+    Time ``run`` for at least ``seconds`` and ``min_calls`` calls, then
+    trace the memory of one more call
+
+    Returns:
+        ``calls``, ``ops_per_sec``, ``latency_ms`` (min, p50, p90, p99,
+        max) and ``peak_memory_kb``, the most memory allocated at
+        once during a call
+    """
+    samples = []
+    started = time.perf_counter()
+    while len(samples) < min_calls or time.perf_counter() - started < seconds:
+        call_started = time.perf_counter()
+        run()
+        samples.append(time.perf_counter() - call_started)
+
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    latency = np.array(samples) * 1000
+    p50, p90, p99 = np.percentile(latency, [50, 90, 99])
+    return {
+        "calls": len(samples),
+        "ops_per_sec": round(len(samples) / float(latency.sum() / 1000), 2),
+        "latency_ms": {
+            "min": round(float(latency.min()), 4),
+            "p50": round(float(p50), 4),
+            "p90": round(float(p90), 4),
+            "p99": round(float(p99), 4),
+            "max": round(float(latency.max()), 4),
+        },
+        "peak_memory_kb": round(peak / 1024, 1),
+    }
+
+
+def synthetic_trip(miles: float) -> Tuple[float, int]:
+    """Driving hours and fuel stops of a trip of ``miles``"""
+    return miles / AVERAGE_MPH, math.floor(miles / 500)
+
+
+def multi_week_trip(weeks: int) -> Tuple[Tuple[float, ...], int, List[float]]:
+    """
+    Schedule inputs, fuel stops and fuel stop hours of a trip of ``weeks``
+    of driving; 60 driving hours a week keeps the 70-hour cycle restarting
+    """
+    driving = weeks * 60.0
+    fuel_stops = math.floor(driving * AVERAGE_MPH / 500)
+    inputs = (driving, driving + 2.0 + fuel_stops * 0.5, 0.0, 1.0, 1.0)
+    fuel_stop_hours = [(i + 1) * driving / (fuel_stops + 1) for i in range(fuel_stops)]
+    return inputs, fuel_stops, fuel_stop_hours
+
+
+def fixture_route(points: int, miles: float, seed: int = 0) -> np.ndarray:
+    """
+    A road-like polyline of ``points`` vertices and about ``miles`` long:
+    a random walk heading roughly west from New York
+    """
+    rng = np.random.default_rng(seed + points)
+    step_km = miles * KM_PER_MILE / (points - 1)
+    heading = np.radians(260) + np.cumsum(rng.normal(0, 0.05, points - 1)).clip(-1, 1)
+    lat = np.empty(points)
+    lng = np.empty(points)
+    lat[0], lng[0] = 40.71, -74.01
+    north = np.cos(heading) * step_km / geometry.KM_PER_DEGREE
+    lat[1:] = lat[0] + np.cumsum(north)
+    east = np.sin(heading) * step_km / geometry.KM_PER_DEGREE
+    lng[1:] = lng[0] + np.cumsum(east / np.cos(np.radians(lat[1:])))
+    return np.column_stack([lat, lng])
+
+
+def load_fixture_route(directory: str, points: int, miles: float) -> Dict[str, Any]:
+    """
+    The stored fixture route of ``points`` vertices, generated and written
+    to ``directory`` when missing
+
+    Returns:
+        ``{"name", "points", "miles", "geometry", "sha256"}`` with the
+        route as an encoded polyline
+    """
+    name = f"route_{points}"
+    path = os.path.join(directory, f"{name}.json")
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        encoded = polyline.encode(fixture_route(points, miles).tolist())
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"name": name, "points": points, "miles": miles, "geometry": encoded}, f
+            )
+    with open(path, encoding="utf-8") as f:
+        route = json.load(f)
+    route["sha256"] = hashlib.sha256(route["geometry"].encode()).hexdigest()
+    return route
+
+
+def route_geometry(encoded: str) -> Dict[str, Any]:
+    """A trip's ``route_geometry`` with the whole fixture as one leg"""
+    return {"to_delivery": {"geometry": encoded, "summary": {}}}
+
+
+def stations_along(
+    coordinates: np.ndarray,
+    searched: Sequence[Tuple[float, float]] = (),
+    seed: int = 0,
+) -> List[Dict[str, Any]]:
+    """
+    Truck stops scattered within a few km of a route, plus one at each of
+    the ``searched`` points so their lookups are answered locally
+    """
+    rng = np.random.default_rng(seed)
+    cumulative = geometry.cumulative_distance_km(coordinates)
+    spacing_km = STATION_SPACING_MILES * KM_PER_MILE
+    at = np.searchsorted(
+        cumulative, np.arange(0, cumulative[-1], spacing_km), side="left"
+    )
+    offsets = rng.normal(0, 1.5, (len(at), 2)) / geometry.KM_PER_DEGREE
+    positions = np.concatenate(
+        [coordinates[at] + offsets, np.reshape(searched, (-1, 2))]
+    )
+    return [
+        station_from_tags(
+            i, float(lat), float(lng), {"name": f"Stop {i}", "hgv": "yes"}
+        )
+        for i, (lat, lng) in enumerate(positions)
+    ]
+
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(
+    fixture_dir: str,
+    seconds: float = 1.0,
+    trip_miles=TRIP_MILES,
+    fixture_routes=FIXTURE_ROUTES,
+    hos_weeks=HOS_WEEKS,
+) -> Dict[str, Any]:
+    """
+    Run every benchmark; returns the JSON document saved by the
+    ``run_benchmarks`` command
+    """
+    results = []
+
+    def record(component, case, params, run):
+        results.append(
+            {
+                "component": component,
+                "case": case,
+                "params": params,
+                **measure(run, seconds),
+            }
+        )
+
+    calculator = HOSCalculator()
+    renderer = ELDLogRenderer()
+    for miles in trip_miles:
+        hours, fuel_stops = synthetic_trip(miles)
+        inputs = calculator._trip_duty(hours, 0, fuel_stops)
+
+        def generate():
+            return calculator._generate_daily_logs(
+                *inputs, departure=DEPARTURE, use_cache=False
+            )
+
+        logs = generate()
+        params = {"miles": miles, "driving_hours": round(hours, 2), "days": len(logs)}
+        record("HOSCalculator", f"trip_{miles}mi", params, generate)
+        record(
+            "ELDLogRenderer",
+            f"trip_{miles}mi",
+            params,
+            lambda: [renderer.generate_log_grid_data(log) for log in logs],
+        )
+
+    for weeks in hos_weeks:
+        inputs, fuel_stops, fuel_stop_hours = multi_week_trip(weeks)
+        params = {
+            "weeks": weeks,
+            "days": len(calculator._simulate(*inputs, fuel_stops, fuel_stop_hours)),
+        }
+        record(
+            "HOSCalculator",
+            f"weeks_{weeks}_simulate",
+            params,
+            lambda: calculator._simulate(*inputs, fuel_stops, fuel_stop_hours),
+        )
+        record(
+            "HOSCalculator",
+            f"weeks_{weeks}_logs",
+            params,
+            lambda: calculator._generate_daily_logs(
+                *inputs, fuel_stops, fuel_stop_hours, use_cache=False
+            ),
+        )
+        calculator._generate_daily_logs(*inputs, fuel_stops, fuel_stop_hours)
+        record(
+            "HOSCalculator",
+            f"weeks_{weeks}_memoized",
+            params,
+            lambda: calculator._generate_daily_logs(
+                *inputs, fuel_stops, fuel_stop_hours
+            ),
+        )
+
+    metrics.reset()
+    fixtures = []
+    try:
+        # Pin the synthetic index for the whole run and keep every lookup
+        # local, so nothing is fetched
+        with override_settings(FUEL_STATION_INDEX_TTL=math.inf):
+            for points, miles in fixture_routes:
+                route = load_fixture_route(fixture_dir, points, miles)
+                fixtures.append(
+                    {key: route[key] for key in ("name", "points", "miles", "sha256")}
+                )
+                coordinates = np.array(polyline.decode(route["geometry"]))
+                geometry_data = route_geometry(route["geometry"])
+                stops = max(1, math.floor(miles / 500))
+                index = StationIndex(
+                    stations_along(
+                        coordinates, route_stop_positions(geometry_data, stops)
+                    )
+                )
+                # Cover the whole route, as an extract imported around it would
+                south, west, north, east = index.bounds
+                index.bounds = (
+                    min(south, float(coordinates[:, 0].min())),
+                    min(west, float(coordinates[:, 1].min())),
+                    max(north, float(coordinates[:, 0].max())),
+                    max(east, float(coordinates[:, 1].max())),
+                )
+                use_station_index(index)
+                params = {"points": points, "miles": miles, "stops": stops}
+                record(
+                    "find_gas_stations_along_route",
+                    f"{route['name']}_points",
+                    params,
+                    lambda: find_gas_stations_along_route(geometry_data, stops),
+                )
+                record(
+                    "find_gas_stations_along_route",
+                    f"{route['name']}_corridor",
+                    params,
+                    lambda: find_gas_stations_along_route(
+                        geometry_data, stops, mode="corridor"
+                    ),
+                )
+    finally:
+        reset_station_index()
+
+    fetched = metrics.get("fuel.overpass") + metrics.get("fuel.corridor_overpass")
+    if fetched:
+        raise RuntimeError(f"{fetched:.0f} fuel station lookups left the local index")
+
+    return {
+        "version": RESULTS_VERSION,
+        "commit": _commit(),
+        "created_at": datetime.now(dt_timezone.utc).isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "cpus": os.cpu_count(),
+        },
+        "seconds_per_case": seconds,
+        "fixtures": fixtures,
+        "results": results,
+    }
+
+
+def compare(
+    baseline: Dict[str, Any], current: Dict[str, Any], threshold: float
+) -> List[Dict[str, Any]]:
+    """
+    Throughput and memory of each case relative to ``baseline``
+
+    Returns:
+        One row per case in both runs with ``ops_ratio`` and
+        ``memory_ratio`` (current / baseline) and ``regression``: throughput
+        down or peak memory up by more than ``threshold``. Throughput is
+        compared on the fastest call, which the noise of a shared machine
+        moves least.
+    """
+    previous = {(r["component"], r["case"]): r for r in baseline["results"]}
+    rows = []
+    for result in current["results"]:
+        key = (result["component"], result["case"])
+        if key not in previous:
+            continue
+        before = previous[key]
+        ops_ratio = before["latency_ms"]["min"] / max(
+            result["latency_ms"]["min"], 1e-9
+        )
+        memory_ratio = (
+            result["peak_memory_kb"] / before["peak_memory_kb"]
+            if before["peak_memory_kb"]
+            else 1.0
+        )
+        rows.append(
+            {
+                "component": key[0],
+                "case": key[1],
+                "ops_ratio": round(ops_ratio, 3),
+                "memory_ratio": round(memory_ratio, 3),
+                "regression": ops_ratio < 1 - threshold
+                or memory_ratio > 1 + threshold,
+            }
+        )
+    return rows
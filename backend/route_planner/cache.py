@@ -0,0 +1,641 @@
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from . import metrics
+
+logger = logging.getLogger("route_planner.cache")
+
+MISSING = object()
+
+ROUTE_CACHE_MODES = ("default", "refresh", "bypass")
+
+
+class LRUCache:
+    """
+    Small thread-safe LRU with per-entry expiry.
+
+    Used as the in-process layer in front of the database-backed caches so
+    that hot keys never leave the worker.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Any, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Any) -> Any:
+        """Return the cached value, or ``MISSING`` if absent or expired"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return MISSING
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return MISSING
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Any, value: Any, ttl: float) -> None:
+        """Store ``value`` for ``ttl`` seconds, evicting the oldest entry if full"""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Any) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def stale_cutoff():
+    """
+    Expiry time before which cache entries are too old to serve as stale
+    fallbacks; newer expired entries are kept for upstream outages.
+    """
+    return timezone.now() - timedelta(seconds=settings.CACHE_STALE_TTL)
+
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_COMMA_RE = re.compile(r"\s*,\s*")
+
+
+def normalize_address(address: str) -> str:
+    """
+    Build a cache key for a free-text address
+
+    Case, surrounding/duplicate whitespace, spacing around commas and
+    trailing punctuation do not change the geocoding result, so they are
+    folded away to maximise cache hits for the same depot typed differently.
+    """
+    key = _WHITESPACE_RE.sub(" ", address.strip().lower())
+    key = _COMMA_RE.sub(", ", key)
+    return key.strip(" ,.;")[:255]
+
+
+class GeocodeCache:
+    """
+    Two-level geocoding cache: a per-process LRU in front of the
+    ``GeocodeCacheEntry`` table, which is shared by all gunicorn workers.
+
+    Addresses the provider could not resolve are cached as negative entries
+    with a shorter TTL so that typos do not hit the API on every request.
+    """
+
+    def __init__(
+        self,
+        ttl: Optional[int] = None,
+        negative_ttl: Optional[int] = None,
+        lru_size: Optional[int] = None,
+    ):
+        self.ttl = ttl if ttl is not None else settings.GEOCODE_CACHE_TTL
+        self.negative_ttl = (
+            negative_ttl
+            if negative_ttl is not None
+            else settings.GEOCODE_CACHE_NEGATIVE_TTL
+        )
+        self.local = LRUCache(
+            lru_size if lru_size is not None else settings.GEOCODE_CACHE_LRU_SIZE
+        )
+
+    def get(self, address: str) -> Tuple[bool, Optional[List[float]]]:
+        """
+        Look up an address
+
+        Returns:
+            ``(found, coords)`` where ``found`` tells whether the cache had an
+            answer and ``coords`` is ``[lat, lng]`` or ``None`` for a cached
+            negative result.
+        """
+        from .models import GeocodeCacheEntry
+
+        key = normalize_address(address)
+
+        coords = self.local.get(key)
+        if coords is not MISSING:
+            metrics.incr("geocode.lru_hit")
+            if coords is None:
+                metrics.incr("geocode.negative_hit")
+            return True, coords
+
+        try:
+            entry = GeocodeCacheEntry.objects.filter(
+                key=key, expires_at__gt=timezone.now()
+            ).first()
+        except Exception as e:
+            logger.error(f"Geocode cache lookup failed for '{key}': {e}")
+            entry = None
+
+        if entry is None:
+            metrics.incr("geocode.miss")
+            return False, None
+
+        metrics.incr("geocode.db_hit")
+        if not entry.found:
+            metrics.incr("geocode.negative_hit")
+        try:
+            GeocodeCacheEntry.objects.filter(pk=entry.pk).update(
+                hit_count=F("hit_count") + 1
+            )
+        except Exception as e:
+            # The hit counter is bookkeeping; the cached answer still stands
+            logger.warning(f"Geocode cache hit count update failed for '{key}': {e}")
+        remaining = (entry.expires_at - timezone.now()).total_seconds()
+        self.local.set(key, entry.coords, max(remaining, 0))
+        return True, entry.coords
+
+    def get_stale(self, address: str) -> Optional[List[float]]:
+        """
+        Return the last known coordinates for an address even if the entry
+        has expired, for use while the geocoding API is unavailable.
+        """
+        from .models import GeocodeCacheEntry
+
+        key = normalize_address(address)
+        try:
+            entry = GeocodeCacheEntry.objects.filter(
+                key=key, found=True, expires_at__gt=stale_cutoff()
+            ).first()
+        except Exception as e:
+            logger.error(f"Stale geocode lookup failed for '{key}': {e}")
+            return None
+        return entry.coords if entry else None
+
+    def set(self, address: str, coords: Optional[List[float]]) -> None:
+        """Store a positive (``[lat, lng]``) or negative (``None``) result"""
+        from .models import GeocodeCacheEntry
+
+        key = normalize_address(address)
+        ttl = self.ttl if coords else self.negative_ttl
+        self.local.set(key, coords, ttl)
+
+        try:
+            GeocodeCacheEntry.objects.update_or_create(
+                key=key,
+                defaults={
+                    "query": address[:255],
+                    "latitude": coords[0] if coords else None,
+                    "longitude": coords[1] if coords else None,
+                    "found": bool(coords),
+                    "expires_at": timezone.now() + timedelta(seconds=ttl),
+                },
+            )
+        except Exception as e:
+            logger.error(f"Failed to store geocode cache entry for '{key}': {e}")
+
+    def invalidate(self, address: str) -> None:
+        from .models import GeocodeCacheEntry
+
+        key = normalize_address(address)
+        self.local.delete(key)
+        GeocodeCacheEntry.objects.filter(key=key).delete()
+
+    def clear_local(self) -> None:
+        self.local.clear()
+
+
+_geocode_cache = None
+_geocode_cache_lock = threading.Lock()
+
+
+def get_geocode_cache() -> GeocodeCache:
+    """Return the process-wide geocode cache, creating it on first use"""
+    global _geocode_cache
+    if _geocode_cache is None:
+        with _geocode_cache_lock:
+            if _geocode_cache is None:
+                _geocode_cache = GeocodeCache()
+    return _geocode_cache
+
+
+def geocode_cache_stats() -> Dict[str, Any]:
+    """Summarize geocode cache effectiveness for this worker"""
+    lru_hits = metrics.get("geocode.lru_hit")
+    db_hits = metrics.get("geocode.db_hit")
+    misses = metrics.get("geocode.miss")
+    upstream_calls = metrics.get("geocode.upstream.count")
+    upstream_seconds = metrics.get("geocode.upstream.seconds")
+    avg_latency = upstream_seconds / upstream_calls if upstream_calls else 0.0
+
+    return {
+        "lru_hits": int(lru_hits),
+        "db_hits": int(db_hits),
+        "negative_hits": int(metrics.get("geocode.negative_hit")),
+        "misses": int(misses),
+        "hit_ratio": metrics.hit_ratio(lru_hits + db_hits, misses),
+        "upstream_calls": int(upstream_calls),
+        "avg_upstream_latency": round(avg_latency, 4),
+        "upstream_calls_saved": int(lru_hits + db_hits),
+        "estimated_seconds_saved": round((lru_hits + db_hits) * avg_latency, 2),
+    }
+
+
+class RouteCache:
+    """
+    Content-addressed cache of directions responses.
+
+    Keys hash the routing profile, the request options and the coordinates
+    rounded to ``ROUTE_CACHE_COORD_PRECISION`` decimals, so requests for the
+    same lane share an entry even when geocoding jitters slightly. Entries
+    live in the ``RouteCacheEntry`` table behind a small per-process LRU; the
+    table is trimmed least-recently-used first once it exceeds
+    ``ROUTE_CACHE_MAX_BYTES``, checked every ``ROUTE_CACHE_EVICT_EVERY``
+    writes so stores do not sum the whole table each time.
+    """
+
+    def __init__(
+        self,
+        ttl: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        lru_size: Optional[int] = None,
+        precision: Optional[int] = None,
+        evict_every: Optional[int] = None,
+    ):
+        self.ttl = ttl if ttl is not None else settings.ROUTE_CACHE_TTL
+        self.max_bytes = (
+            max_bytes if max_bytes is not None else settings.ROUTE_CACHE_MAX_BYTES
+        )
+        self.precision = (
+            precision if precision is not None else settings.ROUTE_CACHE_COORD_PRECISION
+        )
+        self.local = LRUCache(
+            lru_size if lru_size is not None else settings.ROUTE_CACHE_LRU_SIZE
+        )
+        if evict_every is None:
+            evict_every = settings.ROUTE_CACHE_EVICT_EVERY
+        self.evict_every = max(1, evict_every)
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+
+    def make_key(self, profile: str, request_data: Dict[str, Any]) -> str:
+        """Hash a directions request into a cache key"""
+        options = {k: v for k, v in request_data.items() if k != "coordinates"}
+        coordinates = [
+            [round(float(lng), self.precision), round(float(lat), self.precision)]
+            for lng, lat in request_data.get("coordinates", [])
+        ]
+        canonical = json.dumps(
+            {"profile": profile, "coordinates": coordinates, "options": options},
+            sort_keys=True,
+            separators=(",", ":"),
+        )
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached route for ``key``, or None"""
+        from .models import RouteCacheEntry
+
+        route_data = self.local.get(key)
+        if route_data is not MISSING:
+            metrics.incr("route.lru_hit")
+            return route_data
+
+        now = timezone.now()
+        try:
+            entry = RouteCacheEntry.objects.filter(key=key, expires_at__gt=now).first()
+        except Exception as e:
+            logger.error(f"Route cache lookup failed for {key[:12]}: {e}")
+            entry = None
+
+        if entry is None:
+            metrics.incr("route.miss")
+            return None
+
+        metrics.incr("route.db_hit")
+        try:
+            RouteCacheEntry.objects.filter(pk=entry.pk).update(
+                hit_count=F("hit_count") + 1, last_accessed_at=now
+            )
+        except Exception as e:
+            # The hit counter is bookkeeping; the cached route still stands
+            logger.warning(f"Route cache hit count update failed for {key[:12]}: {e}")
+        self.local.set(key, entry.payload, (entry.expires_at - now).total_seconds())
+        return entry.payload
+
+    def get_stale(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Return the last known route for ``key`` even if it has expired, for
+        use while the routing API is unavailable.
+        """
+        from .models import RouteCacheEntry
+
+        try:
+            entry = RouteCacheEntry.objects.filter(
+                key=key, expires_at__gt=stale_cutoff()
+            ).first()
+        except Exception as e:
+            logger.error(f"Stale route lookup failed for {key[:12]}: {e}")
+            return None
+        return entry.payload if entry else None
+
+    def set(self, key: str, route_data: Dict[str, Any], profile: str = "") -> None:
+        """Store a route, trimming the table every ``evict_every`` writes"""
+        from .models import RouteCacheEntry
+
+        self.local.set(key, route_data, self.ttl)
+
+        now = timezone.now()
+        try:
+            size_bytes = len(json.dumps(route_data, separators=(",", ":")))
+            RouteCacheEntry.objects.update_or_create(
+                key=key,
+                defaults={
+                    "profile": profile,
+                    "payload": route_data,
+                    "size_bytes": size_bytes,
+                    "last_accessed_at": now,
+                    "expires_at": now + timedelta(seconds=self.ttl),
+                },
+            )
+            if self._eviction_due():
+                self.evict()
+        except Exception as e:
+            logger.error(f"Failed to store route cache entry {key[:12]}: {e}")
+
+    def _eviction_due(self) -> bool:
+        with self._writes_lock:
+            self._writes += 1
+            if self._writes < self.evict_every:
+                return False
+            self._writes = 0
+            return True
+
+    def evict(self) -> int:
+        """
+        Drop entries that expired longer than ``CACHE_STALE_TTL`` ago, then
+        least recently used ones until the table is back under 90% of
+        ``max_bytes``. Returns the number of rows removed.
+        """
+        from .models import RouteCacheEntry
+
+        removed, _ = RouteCacheEntry.objects.filter(
+            expires_at__lte=stale_cutoff()
+        ).delete()
+
+        total = RouteCacheEntry.objects.aggregate(total=Sum("size_bytes"))["total"]
+        if not total or total <= self.max_bytes:
+            return removed
+
+        target = total - int(self.max_bytes * 0.9)
+        victims = []
+        freed = 0
+        for pk, size_bytes in RouteCacheEntry.objects.order_by(
+            "last_accessed_at"
+        ).values_list("pk", "size_bytes"):
+            victims.append(pk)
+            freed += size_bytes
+            if freed >= target:
+                break
+
+        deleted, _ = RouteCacheEntry.objects.filter(pk__in=victims).delete()
+        metrics.incr("route.evicted", deleted)
+        logger.info(f"Evicted {deleted} route cache entries ({freed} bytes)")
+        return removed + deleted
+
+    def clear(self, expired_only: bool = False) -> int:
+        """
+        Delete cached routes; returns the number of rows removed.
+
+        With ``expired_only`` only entries past their stale grace period are
+        removed, so the last known good routes survive for outages.
+        """
+        from .models import RouteCacheEntry
+
+        queryset = RouteCacheEntry.objects.all()
+        if expired_only:
+            queryset = queryset.filter(expires_at__lte=stale_cutoff())
+        else:
+            self.local.clear()
+        deleted, _ = queryset.delete()
+        return deleted
+
+    def clear_local(self) -> None:
+        self.local.clear()
+
+
+_route_cache = None
+_route_cache_lock = threading.Lock()
+
+
+def get_route_cache() -> RouteCache:
+    """Return the process-wide route cache, creating it on first use"""
+    global _route_cache
+    if _route_cache is None:
+        with _route_cache_lock:
+            if _route_cache is None:
+                _route_cache = RouteCache()
+    return _route_cache
+
+
+def route_cache_stats() -> Dict[str, Any]:
+    """Summarize route cache effectiveness for this worker"""
+    lru_hits = metrics.get("route.lru_hit")
+    db_hits = metrics.get("route.db_hit")
+    misses = metrics.get("route.miss")
+    upstream_calls = metrics.get("route.upstream.count")
+    upstream_seconds = metrics.get("route.upstream.seconds")
+    avg_latency = upstream_seconds / upstream_calls if upstream_calls else 0.0
+
+    return {
+        "lru_hits": int(lru_hits),
+        "db_hits": int(db_hits),
+        "misses": int(misses),
+        "refreshes": int(metrics.get("route.refresh")),
+        "bypasses": int(metrics.get("route.bypass")),
+        "evicted": int(metrics.get("route.evicted")),
+        "hit_ratio": metrics.hit_ratio(lru_hits + db_hits, misses),
+        "upstream_calls": int(upstream_calls),
+        "avg_upstream_latency": round(avg_latency, 4),
+        "estimated_seconds_saved": round((lru_hits + db_hits) * avg_latency, 2),
+    }
+
+
+class StationTileCache:
+    """
+    In-process cache of fuel stations per geohash tile.
+
+    Radius searches are answered by merging the tiles covering the search
+    circle, so nearby searches along the same interstate share entries.
+    Tiles expire after ``FUEL_TILE_CACHE_TTL`` seconds and the least
+    recently used ones are dropped once the cached stations exceed
+    ``FUEL_TILE_CACHE_MAX_BYTES`` (measured as their JSON size).
+    """
+
+    def __init__(
+        self,
+        ttl: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        precision: Optional[int] = None,
+    ):
+        self.ttl = ttl if ttl is not None else settings.FUEL_TILE_CACHE_TTL
+        self.max_bytes = (
+            max_bytes if max_bytes is not None else settings.FUEL_TILE_CACHE_MAX_BYTES
+        )
+        self.precision = (
+            precision if precision is not None else settings.FUEL_TILE_PRECISION
+        )
+        self._data: "OrderedDict[str, Tuple[float, int, List[Dict[str, Any]]]]" = (
+            OrderedDict()
+        )
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def get_many(
+        self, tiles: List[str]
+    ) -> Tuple[Dict[str, List[Dict[str, Any]]], List[str]]:
+        """Return ``(cached stations by tile, missing tiles)``"""
+        found = {}
+        missing = []
+        now = time.monotonic()
+        with self._lock:
+            for tile in tiles:
+                entry = self._data.get(tile)
+                if entry is not None and entry[0] < now:
+                    self._drop(tile)
+                    metrics.incr("fuel_tile.expired")
+                    entry = None
+                if entry is None:
+                    missing.append(tile)
+                    continue
+                self._data.move_to_end(tile)
+                found[tile] = entry[2]
+
+        metrics.incr("fuel_tile.hit", len(found))
+        metrics.incr("fuel_tile.miss", len(missing))
+        return found, missing
+
+    def set_many(self, stations_by_tile: Dict[str, List[Dict[str, Any]]]) -> None:
+        """Cache each tile's stations (an empty list is a valid answer)"""
+        if not self.enabled:
+            return
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            for tile, stations in stations_by_tile.items():
+                size = len(json.dumps(stations, separators=(",", ":"))) + len(tile)
+                self._drop(tile)
+                self._data[tile] = (expires_at, size, stations)
+                self._bytes += size
+
+            evicted = 0
+            while self._bytes > self.max_bytes and self._data:
+                self._drop(next(iter(self._data)))
+                evicted += 1
+        if evicted:
+            metrics.incr("fuel_tile.evicted", evicted)
+
+    def _drop(self, tile: str) -> None:
+        entry = self._data.pop(tile, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            tiles, size = len(self._data), self._bytes
+        hits = metrics.get("fuel_tile.hit")
+        misses = metrics.get("fuel_tile.miss")
+        return {
+            "tiles": tiles,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "hits": int(hits),
+            "misses": int(misses),
+            "expired": int(metrics.get("fuel_tile.expired")),
+            "evicted": int(metrics.get("fuel_tile.evicted")),
+            "hit_ratio": metrics.hit_ratio(hits, misses),
+        }
+
+
+_station_tile_cache = None
+_station_tile_cache_lock = threading.Lock()
+
+
+def get_station_tile_cache() -> StationTileCache:
+    """Return the process-wide station tile cache, creating it on first use"""
+    global _station_tile_cache
+    if _station_tile_cache is None:
+        with _station_tile_cache_lock:
+            if _station_tile_cache is None:
+                _station_tile_cache = StationTileCache()
+    return _station_tile_cache
+
+
+def reset_station_tile_cache() -> None:
+    """Drop the tile cache so it is rebuilt from settings (used by tests)"""
+    global _station_tile_cache
+    with _station_tile_cache_lock:
+        _station_tile_cache = None
+
+
+def station_tile_cache_stats() -> Dict[str, Any]:
+    """Summarize fuel station tile cache effectiveness for this worker"""
+    return get_station_tile_cache().stats()
+
+
+_schedule_cache = None
+_schedule_cache_lock = threading.Lock()
+
+
+def get_schedule_cache() -> LRUCache:
+    """
+    Return the process-wide cache of simulated HOS schedules, creating it on
+    first use. Schedules are pure functions of their inputs, so entries never
+    expire; ``HOS_SCHEDULE_CACHE_SIZE`` bounds how many are kept.
+    """
+    global _schedule_cache
+    if _schedule_cache is None:
+        with _schedule_cache_lock:
+            if _schedule_cache is None:
+                _schedule_cache = LRUCache(maxsize=settings.HOS_SCHEDULE_CACHE_SIZE)
+    return _schedule_cache
+
+
+def reset_schedule_cache() -> None:
+    """Drop the schedule cache so it is rebuilt from settings (used by tests)"""
+    global _schedule_cache
+    with _schedule_cache_lock:
+        _schedule_cache = None
+
+
+def schedule_cache_stats() -> Dict[str, Any]:
+    """Summarize HOS schedule memoization for this worker"""
+    cache = get_schedule_cache()
+    hits = metrics.get("hos_schedule.hit")
+    misses = metrics.get("hos_schedule.miss")
+    return {
+        "entries": len(cache),
+        "max_entries": cache.maxsize,
+        "quantum_minutes": settings.HOS_SCHEDULE_QUANTUM_MINUTES,
+        "hits": int(hits),
+        "misses": int(misses),
+        "hit_ratio": metrics.hit_ratio(hits, misses),
+    }
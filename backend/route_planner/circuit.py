@@ -0,0 +1,151 @@
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+
+from . import metrics
+
+logger = logging.getLogger("route_planner.circuit")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+def is_upstream_failure(status_code: int) -> bool:
+    """Whether a response status means the upstream itself is unhealthy"""
+    return status_code == 429 or status_code >= 500
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker for one upstream service.
+
+    After ``failure_threshold`` failures in a row (errors, 429/5xx responses
+    or calls slower than ``slow_call_seconds``) the circuit opens and callers
+    are refused immediately instead of waiting out the upstream timeout.
+    Once ``reset_timeout`` seconds have passed a single probe call is let
+    through; its outcome closes the circuit again or re-opens it.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: Optional[int] = None,
+        reset_timeout: Optional[float] = None,
+        slow_call_seconds: Optional[float] = None,
+    ):
+        self.name = name
+        self.failure_threshold = (
+            failure_threshold
+            if failure_threshold is not None
+            else settings.CIRCUIT_FAILURE_THRESHOLD
+        )
+        self.reset_timeout = (
+            reset_timeout
+            if reset_timeout is not None
+            else settings.CIRCUIT_RESET_TIMEOUT
+        )
+        self.slow_call_seconds = (
+            slow_call_seconds
+            if slow_call_seconds is not None
+            else settings.CIRCUIT_SLOW_CALL_SECONDS
+        )
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def allow(self) -> bool:
+        """Return True if a call may go upstream now"""
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    metrics.incr(f"circuit.{self.name}.rejected")
+                    return False
+                self._state = HALF_OPEN
+                self._probe_in_flight = False
+            if self._probe_in_flight:
+                metrics.incr(f"circuit.{self.name}.rejected")
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record(self, ok: bool, elapsed: float = 0.0) -> None:
+        """Record the outcome of a call that ``allow`` let through"""
+        if ok and elapsed > self.slow_call_seconds:
+            metrics.incr(f"circuit.{self.name}.slow")
+            ok = False
+
+        with self._lock:
+            self._probe_in_flight = False
+            if ok:
+                if self._state != CLOSED:
+                    logger.info(f"Circuit for {self.name} closed")
+                self._state = CLOSED
+                self._failures = 0
+                return
+
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    metrics.incr(f"circuit.{self.name}.opened")
+                    logger.warning(
+                        f"Circuit for {self.name} opened after {self._failures} failures"
+                    )
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            state, failures = self._state, self._failures
+        return {
+            "state": state,
+            "consecutive_failures": failures,
+            "opened": int(metrics.get(f"circuit.{self.name}.opened")),
+            "rejected": int(metrics.get(f"circuit.{self.name}.rejected")),
+            "slow_calls": int(metrics.get(f"circuit.{self.name}.slow")),
+        }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """Return this process's breaker for the named upstream"""
+    breaker = _breakers.get(name)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.get(name)
+            if breaker is None:
+                breaker = _breakers[name] = CircuitBreaker(name)
+    return breaker
+
+
+def reset_breakers() -> None:
+    """Drop every breaker so they are rebuilt from settings (used by tests)"""
+    with _breakers_lock:
+        _breakers.clear()
+
+
+def circuit_stats() -> Dict[str, Dict[str, Any]]:
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.stats() for breaker in breakers}
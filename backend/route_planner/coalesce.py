@@ -0,0 +1,205 @@
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+import weakref
+from contextlib import AsyncExitStack, ExitStack, asynccontextmanager, contextmanager
+from typing import Iterable, Iterator, Optional
+
+from django.conf import settings
+
+from . import metrics
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+logger = logging.getLogger("route_planner.coalesce")
+
+_POLL_INTERVAL = 0.05
+
+
+class _KeyLocks:
+    """Reference-counted per-key locks, dropped once nobody holds them"""
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._guard = threading.Lock()
+        self._locks = {}
+
+    def acquire_ref(self, key):
+        with self._guard:
+            lock, refs = self._locks.get(key, (None, 0))
+            if lock is None:
+                lock = self._factory()
+            self._locks[key] = (lock, refs + 1)
+            return lock
+
+    def release_ref(self, key):
+        with self._guard:
+            lock, refs = self._locks[key]
+            if refs <= 1:
+                del self._locks[key]
+            else:
+                self._locks[key] = (lock, refs - 1)
+
+
+_thread_locks = _KeyLocks(threading.Lock)
+_async_locks = weakref.WeakKeyDictionary()
+
+
+def _lock_path(key: str) -> str:
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+    return os.path.join(settings.COALESCE_LOCK_DIR, f"{digest}.lock")
+
+
+def _try_flock(fd: int) -> bool:
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except BlockingIOError:
+        return False
+
+
+def _open_lock_file(key: str) -> Optional[int]:
+    if fcntl is None or not settings.COALESCE_ACROSS_PROCESSES:
+        return None
+    try:
+        os.makedirs(settings.COALESCE_LOCK_DIR, exist_ok=True)
+        return os.open(_lock_path(key), os.O_CREAT | os.O_RDWR, 0o600)
+    except OSError as e:
+        logger.warning(f"Cannot open coalescing lock file for {key}: {e}")
+        return None
+
+
+def _close_lock_file(fd: int) -> None:
+    try:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def coalesce(key: str, deadline: Optional[float] = None) -> Iterator[bool]:
+    """
+    Serialize upstream lookups for ``key`` across threads and workers.
+
+    The first caller proceeds immediately; concurrent callers for the same key
+    (in this process or another gunicorn worker, via a ``flock`` on a file in
+    ``COALESCE_LOCK_DIR``) wait until it is done. Yields True when the caller
+    had to wait, meaning the result has most likely been cached by the leader
+    and the cache should be checked again before going upstream. Waiting is
+    bounded by ``COALESCE_LOCK_TIMEOUT``; after that the caller proceeds
+    without the lock rather than failing.
+    """
+    if deadline is None:
+        deadline = time.monotonic() + settings.COALESCE_LOCK_TIMEOUT
+
+    waited = False
+    local_lock = _thread_locks.acquire_ref(key)
+    local_held = local_lock.acquire(blocking=False)
+    if not local_held:
+        waited = True
+        local_held = local_lock.acquire(timeout=max(deadline - time.monotonic(), 0))
+
+    fd = _open_lock_file(key)
+    file_held = False
+    try:
+        if fd is not None:
+            file_held = _try_flock(fd)
+            while not file_held and time.monotonic() < deadline:
+                waited = True
+                time.sleep(_POLL_INTERVAL)
+                file_held = _try_flock(fd)
+
+        if waited:
+            metrics.incr("coalesce.waited")
+        if not (local_held and (fd is None or file_held)):
+            metrics.incr("coalesce.timeout")
+            logger.warning(f"Timed out waiting for in-flight lookup of {key}")
+
+        yield waited
+    finally:
+        if fd is not None:
+            _close_lock_file(fd)
+        if local_held:
+            local_lock.release()
+        _thread_locks.release_ref(key)
+
+
+@contextmanager
+def coalesce_many(keys: Iterable[str]) -> Iterator[bool]:
+    """
+    ``coalesce`` for a batch of keys, acquired in sorted order under one
+    shared deadline. Yields True if any key had to wait.
+    """
+    deadline = time.monotonic() + settings.COALESCE_LOCK_TIMEOUT
+    with ExitStack() as stack:
+        waited = False
+        for key in sorted(set(keys)):
+            waited |= stack.enter_context(coalesce(key, deadline))
+        yield waited
+
+
+def _loop_locks() -> "_KeyLocks":
+    loop = asyncio.get_running_loop()
+    locks = _async_locks.get(loop)
+    if locks is None:
+        locks = _async_locks[loop] = _KeyLocks(asyncio.Lock)
+    return locks
+
+
+@asynccontextmanager
+async def coalesce_async(key: str, deadline: Optional[float] = None):
+    """``coalesce`` for coroutines; waits with ``asyncio.sleep`` instead of blocking"""
+    if deadline is None:
+        deadline = time.monotonic() + settings.COALESCE_LOCK_TIMEOUT
+
+    locks = _loop_locks()
+    local_lock = locks.acquire_ref(key)
+    waited = local_lock.locked()
+    try:
+        await asyncio.wait_for(
+            local_lock.acquire(), timeout=max(deadline - time.monotonic(), 0)
+        )
+        local_held = True
+    except asyncio.TimeoutError:
+        local_held = False
+
+    fd = _open_lock_file(key)
+    file_held = False
+    try:
+        if fd is not None:
+            file_held = _try_flock(fd)
+            while not file_held and time.monotonic() < deadline:
+                waited = True
+                await asyncio.sleep(_POLL_INTERVAL)
+                file_held = _try_flock(fd)
+
+        if waited:
+            metrics.incr("coalesce.waited")
+        if not (local_held and (fd is None or file_held)):
+            metrics.incr("coalesce.timeout")
+            logger.warning(f"Timed out waiting for in-flight lookup of {key}")
+
+        yield waited
+    finally:
+        if fd is not None:
+            _close_lock_file(fd)
+        if local_held:
+            local_lock.release()
+        locks.release_ref(key)
+
+
+@asynccontextmanager
+async def coalesce_many_async(keys: Iterable[str]):
+    """Async counterpart of ``coalesce_many``"""
+    deadline = time.monotonic() + settings.COALESCE_LOCK_TIMEOUT
+    async with AsyncExitStack() as stack:
+        waited = False
+        for key in sorted(set(keys)):
+            waited |= await stack.enter_async_context(coalesce_async(key, deadline))
+        yield waited
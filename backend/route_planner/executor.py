@@ -0,0 +1,162 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Iterable, List, Optional, TypeVar, Union
+
+from django import db
+from django.conf import settings
+
+logger = logging.getLogger("route_planner.executor")
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_pid: Optional[int] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """
+    Return the per-process thread pool used for outbound I/O.
+
+    The pool is bounded by ``PLANNER_MAX_WORKERS`` so concurrent requests in
+    one worker cannot open an unbounded number of upstream connections.
+    """
+    global _executor, _executor_pid
+    pid = os.getpid()
+    if _executor is None or _executor_pid != pid:
+        with _executor_lock:
+            if _executor is None or _executor_pid != pid:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.PLANNER_MAX_WORKERS,
+                    thread_name_prefix="planner-io",
+                )
+                _executor_pid = pid
+    return _executor
+
+
+def map_concurrent(fn: Callable[[T], R], items: Iterable[T]) -> List[R]:
+    """
+    Apply ``fn`` to every item on the I/O pool and return results in order.
+
+    Tasks must not touch the database: they run on pool threads with their
+    own connections, outside the caller's transaction. A single item is run
+    inline to avoid the hand-off.
+    """
+    items = list(items)
+    if len(items) <= 1:
+        return [fn(item) for item in items]
+
+    executor = get_executor()
+    futures = [executor.submit(fn, item) for item in items]
+    return [future.result() for future in futures]
+
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+_process_pool_pid: Optional[int] = None
+
+
+def _init_process_worker() -> None:
+    import django
+
+    django.setup()
+
+
+def get_process_pool() -> Optional[ProcessPoolExecutor]:
+    """
+    Return the per-process pool used for CPU-bound planning work, or None
+    when ``PLANNER_PROCESS_WORKERS`` is 0.
+
+    Workers are spawned rather than forked so they inherit no database
+    connections, locks or pool threads from the web worker.
+    """
+    global _process_pool, _process_pool_pid
+    if settings.PLANNER_PROCESS_WORKERS <= 0:
+        return None
+    pid = os.getpid()
+    if _process_pool is None or _process_pool_pid != pid:
+        with _executor_lock:
+            if _process_pool is None or _process_pool_pid != pid:
+                _process_pool = ProcessPoolExecutor(
+                    max_workers=settings.PLANNER_PROCESS_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_process_worker,
+                )
+                _process_pool_pid = pid
+    return _process_pool
+
+
+def map_processes(
+    fn: Callable[[T], R], items: Iterable[T]
+) -> List[Union[R, Exception]]:
+    """
+    Apply ``fn`` to every item on the process pool and return results in
+    order, with the exception raised in place of the result for items that
+    failed.
+
+    ``fn`` and the items must be picklable, and tasks must not touch the
+    database. Runs inline for a single item or when the pool is disabled.
+    """
+    items = list(items)
+    pool = get_process_pool() if len(items) > 1 else None
+    if pool is None:
+        results: List[Union[R, Exception]] = []
+        for item in items:
+            try:
+                results.append(fn(item))
+            except Exception as e:
+                results.append(e)
+        return results
+
+    futures = [pool.submit(fn, item) for item in items]
+    return [future.exception() or future.result() for future in futures]
+
+
+_refresh_executor: Optional[ThreadPoolExecutor] = None
+_refresh_executor_pid: Optional[int] = None
+_refreshing = set()
+
+
+def _get_refresh_executor() -> ThreadPoolExecutor:
+    global _refresh_executor, _refresh_executor_pid
+    pid = os.getpid()
+    if _refresh_executor is None or _refresh_executor_pid != pid:
+        with _executor_lock:
+            if _refresh_executor is None or _refresh_executor_pid != pid:
+                _refresh_executor = ThreadPoolExecutor(
+                    max_workers=settings.PLANNER_REFRESH_WORKERS,
+                    thread_name_prefix="planner-refresh",
+                )
+                _refresh_executor_pid = pid
+                _refreshing.clear()
+    return _refresh_executor
+
+
+def run_in_background(key: str, fn: Callable[[], None]) -> bool:
+    """
+    Run ``fn`` once on the refresh pool unless a task for ``key`` is already
+    queued or running. Returns whether a task was scheduled.
+
+    Unlike ``map_concurrent`` tasks these may use the database; the thread's
+    connection is closed when the task finishes.
+    """
+    with _executor_lock:
+        if key in _refreshing:
+            return False
+        _refreshing.add(key)
+
+    def task():
+        try:
+            fn()
+        except Exception as e:
+            logger.error(f"Background refresh {key} failed: {e}", exc_info=True)
+        finally:
+            with _executor_lock:
+                _refreshing.discard(key)
+            db.connections.close_all()
+
+    _get_refresh_executor().submit(task)
+    return True
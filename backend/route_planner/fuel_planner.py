@@ -0,0 +1,220 @@
+"""
+Fuel stop planning over the stations found along a route.
+
+Stations are points at known along-route mileages (see
+``utils.RouteCorridor.locate``). Given the truck's usable range the planner
+decides where to refuel and how much range to buy in one forward pass:
+with uniform prices it makes the fewest stops, with per-station prices it
+buys every mile of range at the cheapest station that can reach it.
+"""
+
+import logging
+from collections import deque
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from django.conf import settings
+
+from . import metrics
+
+logger = logging.getLogger("route_planner.fuel_planner")
+
+# "interval" keeps the fixed one-stop-per-500-miles estimate; the others
+# plan stops over the stations found along the route
+FUEL_STOP_STRATEGIES = ("interval", "fewest", "cheapest")
+
+
+class FuelPlanError(ValueError):
+    """The route has a stretch without stations longer than the truck's range"""
+
+
+def plan_fuel_stops(
+    station_miles: Sequence[float],
+    total_miles: float,
+    usable_range_miles: float,
+    prices: Optional[Sequence[float]] = None,
+    start_range_miles: Optional[float] = None,
+) -> List[Tuple[int, float]]:
+    """
+    Choose refueling stations for a route
+
+    From every stop the planner either buys just enough range to reach the
+    next strictly cheaper station, when one is in range, or fills up and
+    moves on to the cheapest station in range (the farthest on ties). The
+    destination acts as a station cheaper than all others, so the final
+    purchase only buys what is needed to arrive. Without prices every
+    station costs the same and this reduces to "drive to the farthest
+    reachable station", the fewest possible stops.
+
+    Each station is pushed to and popped from the candidate window at most
+    once, so the pass is linear in the number of stations.
+
+    Args:
+        station_miles: Along-route mileage of each station, ascending
+        total_miles: Route length in miles
+        usable_range_miles: Miles a full tank covers, less the reserve
+        prices: Price per gallon of each station, or None to minimize stops
+        start_range_miles: Range in the tank at departure (default: full)
+
+    Returns:
+        ``(station index, miles of range bought)`` for every stop, in order
+
+    Raises:
+        FuelPlanError: If some stretch of the route cannot be covered
+    """
+    if usable_range_miles <= 0:
+        raise FuelPlanError("Usable fuel range must be positive")
+
+    miles = np.asarray(station_miles, dtype=float)
+    # Stations past the destination are never worth driving to
+    count = int(np.searchsorted(miles, total_miles, side="left"))
+    positions = np.append(miles[:count], float(total_miles))
+
+    costs = np.zeros(count + 1)
+    if prices is not None:
+        costs[:count] = np.asarray(prices, dtype=float)[:count]
+    costs[count] = -np.inf
+
+    next_cheaper = _next_cheaper(costs)
+    reach = (
+        np.searchsorted(positions, positions + usable_range_miles, side="right") - 1
+    )
+    cost_list = costs.tolist()
+    position_list = positions.tolist()
+
+    window: deque = deque()
+    pushed = 0
+
+    def cheapest_in(first: int, last: int) -> Optional[int]:
+        nonlocal pushed
+        last = min(last, count - 1)
+        while pushed <= last:
+            while window and cost_list[window[-1]] >= cost_list[pushed]:
+                window.pop()
+            window.append(pushed)
+            pushed += 1
+        while window and window[0] < first:
+            window.popleft()
+        return window[0] if window else None
+
+    fuel = usable_range_miles
+    if start_range_miles is not None:
+        fuel = min(start_range_miles, usable_range_miles)
+    if fuel >= total_miles:
+        return []
+
+    current = cheapest_in(
+        0, int(np.searchsorted(positions, fuel, side="right")) - 1
+    )
+    if current is None:
+        raise FuelPlanError(f"No fuel station within {fuel:.0f} miles of the start")
+    fuel -= position_list[current]
+
+    stops = []
+    while True:
+        target = int(next_cheaper[current])
+        distance = position_list[target] - position_list[current]
+        if distance <= usable_range_miles:
+            bought = max(0.0, distance - fuel)
+            if bought > 0:
+                stops.append((current, bought))
+            if target == count:
+                return stops
+            fuel += bought - distance
+            current = target
+            continue
+
+        bought = usable_range_miles - fuel
+        if bought > 0:
+            stops.append((current, bought))
+        target = cheapest_in(current + 1, int(reach[current]))
+        if target is None:
+            raise FuelPlanError(
+                f"No fuel station within {usable_range_miles:.0f} miles after "
+                f"mile {position_list[current]:.0f}"
+            )
+        fuel = usable_range_miles - (position_list[target] - position_list[current])
+        current = target
+
+
+def _next_cheaper(costs: np.ndarray) -> np.ndarray:
+    """Index of the first later entry strictly cheaper than each entry"""
+    result = np.full(len(costs), len(costs) - 1)
+    values = costs.tolist()
+    stack: List[int] = []
+    for i, value in enumerate(values):
+        while stack and values[stack[-1]] > value:
+            result[stack.pop()] = i
+        stack.append(i)
+    return result
+
+
+def station_prices(stations: List[Dict[str, Any]]) -> List[float]:
+    """
+    Price per gallon of each station from the ``FuelPrice`` table, with
+    ``FUEL_DEFAULT_PRICE`` for stations that have no recorded price
+    """
+    from .models import FuelPrice
+
+    ids = [station.get("id") for station in stations]
+    known = dict(
+        FuelPrice.objects.filter(
+            osm_id__in=[osm_id for osm_id in ids if osm_id is not None]
+        ).values_list("osm_id", "price_per_gallon")
+    )
+    metrics.incr("fuel.price_known", sum(osm_id in known for osm_id in ids))
+    return [known.get(osm_id, settings.FUEL_DEFAULT_PRICE) for osm_id in ids]
+
+
+def plan_route_fuel(
+    stations: List[Dict[str, Any]],
+    total_miles: float,
+    strategy: str = "fewest",
+    start_range_miles: Optional[float] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Pick the fuel stops for a route from its along-route stations
+
+    Args:
+        stations: Stations with ``route_miles``, ordered by it
+        total_miles: Route length in miles on the same scale
+        strategy: ``"fewest"`` or ``"cheapest"``
+        start_range_miles: Range in the tank at departure (default: full)
+
+    Returns:
+        Copies of the chosen stations with ``refuel_miles`` set, plus
+        ``price_per_gallon`` and ``fuel_cost`` for the cheapest strategy
+
+    Raises:
+        FuelPlanError: If some stretch of the route cannot be covered
+    """
+    if strategy not in ("fewest", "cheapest"):
+        raise ValueError(f"Invalid fuel stop strategy: {strategy}")
+
+    usable_range = settings.FUEL_TANK_RANGE_MILES - settings.FUEL_RESERVE_MILES
+    prices = station_prices(stations) if strategy == "cheapest" else None
+    plan = plan_fuel_stops(
+        [station["route_miles"] for station in stations],
+        total_miles,
+        usable_range,
+        prices=prices,
+        start_range_miles=start_range_miles,
+    )
+    metrics.incr("fuel.planned_stops", len(plan))
+
+    stops = []
+    for index, bought in plan:
+        stop = dict(stations[index])
+        stop["refuel_miles"] = round(bought, 1)
+        if prices is not None:
+            stop["price_per_gallon"] = prices[index]
+            stop["fuel_cost"] = round(
+                bought / settings.FUEL_MILES_PER_GALLON * prices[index], 2
+            )
+        stops.append(stop)
+
+    logger.info(
+        f"Planned {len(stops)} fuel stops ({strategy}) over {len(stations)} "
+        f"stations and {total_miles:.0f} miles"
+    )
+    return stops
@@ -0,0 +1,221 @@
+import logging
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+
+from . import geometry, metrics
+from .utils import station_from_tags
+
+logger = logging.getLogger("route_planner.fuel_stations")
+
+KM_PER_DEGREE_LAT = 111.32
+
+
+class StationIndex:
+    """
+    Uniform lat/lng grid over fuel stations for radius and nearest queries.
+
+    Cells are ``cell_degrees`` on a side, so a few-kilometer radius query
+    only inspects the handful of cells around the point instead of every
+    station.
+    """
+
+    def __init__(
+        self,
+        stations: Iterable[Dict[str, Any]] = (),
+        cell_degrees: Optional[float] = None,
+    ):
+        self.cell_degrees = (
+            cell_degrees
+            if cell_degrees is not None
+            else settings.FUEL_STATION_INDEX_CELL_DEGREES
+        )
+        self._cells: Dict[Tuple[int, int], List[Dict[str, Any]]] = defaultdict(list)
+        self._count = 0
+        self.bounds: Optional[Tuple[float, float, float, float]] = None
+
+        for station in stations:
+            self.add(station)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _cell(self, lat: float, lng: float) -> Tuple[int, int]:
+        return (
+            math.floor(lat / self.cell_degrees),
+            math.floor(lng / self.cell_degrees),
+        )
+
+    def add(self, station: Dict[str, Any]) -> None:
+        lat, lng = station["lat"], station["lng"]
+        self._cells[self._cell(lat, lng)].append(station)
+        self._count += 1
+
+        if self.bounds is None:
+            self.bounds = (lat, lng, lat, lng)
+        else:
+            south, west, north, east = self.bounds
+            self.bounds = (
+                min(south, lat),
+                min(west, lng),
+                max(north, lat),
+                max(east, lng),
+            )
+
+    def covers(self, lat: float, lng: float) -> bool:
+        """Whether the point lies inside the imported extract's bounding box"""
+        if self.bounds is None:
+            return False
+        south, west, north, east = self.bounds
+        return south <= lat <= north and west <= lng <= east
+
+    def within(self, lat: float, lng: float, radius_km: float) -> List[Dict[str, Any]]:
+        """Stations within ``radius_km`` of the point, closest first"""
+        dlat = radius_km / KM_PER_DEGREE_LAT
+        dlng = radius_km / (KM_PER_DEGREE_LAT * max(math.cos(math.radians(lat)), 0.01))
+        south, west = self._cell(lat - dlat, lng - dlng)
+        north, east = self._cell(lat + dlat, lng + dlng)
+
+        candidates = [
+            station
+            for row in range(south, north + 1)
+            for col in range(west, east + 1)
+            for station in self._cells.get((row, col), ())
+        ]
+        if not candidates:
+            return []
+
+        distances = geometry.distances_from(
+            lat, lng, [(station["lat"], station["lng"]) for station in candidates]
+        )
+        order = np.argsort(distances, kind="stable")
+        return [candidates[i] for i in order if distances[i] <= radius_km]
+
+    def near_polyline(
+        self, line: Iterable[Tuple[float, float]], radius_km: float
+    ) -> List[Dict[str, Any]]:
+        """
+        Candidate stations for a corridor search: every station in a cell
+        within ``radius_km`` of the polyline. Callers filter the exact
+        distance themselves.
+        """
+        line = geometry.as_points(line)
+        if len(line) == 0:
+            return []
+
+        max_lat = float(np.abs(line[:, 0]).max())
+        dlat = radius_km / KM_PER_DEGREE_LAT
+        dlng = radius_km / (
+            KM_PER_DEGREE_LAT * max(math.cos(math.radians(max_lat)), 0.01)
+        )
+        row_margin = max(1, math.ceil(dlat / self.cell_degrees))
+        col_margin = max(1, math.ceil(dlng / self.cell_degrees))
+
+        # Sample each segment at least once per cell so no crossed cell is
+        # skipped, then widen by the buffer.
+        samples = [line[:1]]
+        for start, end in zip(line[:-1], line[1:]):
+            steps = max(1, math.ceil(np.abs(end - start).max() / self.cell_degrees))
+            fractions = np.linspace(0, 1, steps + 1)[1:, None]
+            samples.append(start + fractions * (end - start))
+        cells = np.unique(
+            np.floor(np.concatenate(samples) / self.cell_degrees).astype(np.int64),
+            axis=0,
+        )
+
+        seen = set()
+        for row, col in cells.tolist():
+            for r in range(row - row_margin, row + row_margin + 1):
+                for c in range(col - col_margin, col + col_margin + 1):
+                    seen.add((r, c))
+        return [station for cell in seen for station in self._cells.get(cell, ())]
+
+    def nearest(
+        self, lat: float, lng: float, max_km: float = 50.0
+    ) -> Optional[Dict[str, Any]]:
+        """The closest station within ``max_km``, or None"""
+        radius_km = self.cell_degrees * KM_PER_DEGREE_LAT
+        while True:
+            stations = self.within(lat, lng, min(radius_km, max_km))
+            if stations:
+                return stations[0]
+            if radius_km >= max_km:
+                return None
+            radius_km *= 2
+
+
+def load_station_index() -> StationIndex:
+    """Build an index over every imported ``FuelStation``"""
+    from .models import FuelStation
+
+    started = time.monotonic()
+    index = StationIndex(
+        station_from_tags(osm_id, lat, lng, tags)
+        for osm_id, lat, lng, tags in FuelStation.objects.values_list(
+            "osm_id", "latitude", "longitude", "tags"
+        ).iterator(chunk_size=5000)
+    )
+    elapsed = time.monotonic() - started
+    metrics.observe("fuel.index_load", elapsed)
+    logger.info(f"Loaded {len(index)} fuel stations into the index in {elapsed:.2f}s")
+    return index
+
+
+_index: Optional[StationIndex] = None
+_index_loaded_at = 0.0
+_index_pid: Optional[int] = None
+_index_lock = threading.Lock()
+
+
+def get_station_index() -> StationIndex:
+    """
+    Return this worker's station index, loading it on first use and again
+    once it is older than ``FUEL_STATION_INDEX_TTL`` seconds so imports
+    are picked up without a restart.
+    """
+    global _index, _index_loaded_at, _index_pid
+    pid = os.getpid()
+
+    def expired():
+        return (
+            _index is None
+            or _index_pid != pid
+            or time.monotonic() - _index_loaded_at > settings.FUEL_STATION_INDEX_TTL
+        )
+
+    if expired():
+        with _index_lock:
+            if expired():
+                try:
+                    _index = load_station_index()
+                except Exception as e:
+                    logger.error(f"Failed to load fuel station index: {e}")
+                    _index = StationIndex()
+                _index_loaded_at = time.monotonic()
+                _index_pid = pid
+    return _index
+
+
+def use_station_index(index: StationIndex) -> None:
+    """
+    Serve this worker's lookups from ``index`` until it expires, instead of
+    the imported stations (offline benchmarks)
+    """
+    global _index, _index_loaded_at, _index_pid
+    with _index_lock:
+        _index = index
+        _index_loaded_at = time.monotonic()
+        _index_pid = os.getpid()
+
+
+def reset_station_index() -> None:
+    """Drop the loaded index so the next lookup reloads it"""
+    global _index
+    with _index_lock:
+        _index = None
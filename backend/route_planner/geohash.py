@@ -0,0 +1,93 @@
+"""
+Geohash encoding and tile coverage for caching spatial lookups.
+
+A geohash of a given precision names a fixed lat/lng rectangle, so nearby
+searches share tiles even though their exact coordinates never repeat.
+"""
+
+import math
+from typing import List, Tuple
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_DECODE = {char: i for i, char in enumerate(_BASE32)}
+
+KM_PER_DEGREE_LAT = 111.32
+
+
+def encode(lat: float, lng: float, precision: int) -> str:
+    """Geohash of the tile containing the point"""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+
+    while len(chars) < precision:
+        if even:
+            mid = (lng_range[0] + lng_range[1]) / 2
+            if lng >= mid:
+                value = (value << 1) | 1
+                lng_range[0] = mid
+            else:
+                value <<= 1
+                lng_range[1] = mid
+        else:
+            mid = (lat_range[0] + lat_range[1]) / 2
+            if lat >= mid:
+                value = (value << 1) | 1
+                lat_range[0] = mid
+            else:
+                value <<= 1
+                lat_range[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits = 0
+            value = 0
+
+    return "".join(chars)
+
+
+def bounds(geohash: str) -> Tuple[float, float, float, float]:
+    """``(south, west, north, east)`` of a geohash tile"""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    even = True
+
+    for char in geohash:
+        value = _DECODE[char]
+        for shift in range(4, -1, -1):
+            bit = (value >> shift) & 1
+            target = lng_range if even else lat_range
+            mid = (target[0] + target[1]) / 2
+            target[1 - bit] = mid
+            even = not even
+
+    return lat_range[0], lng_range[0], lat_range[1], lng_range[1]
+
+
+def covering(lat: float, lng: float, radius_km: float, precision: int) -> List[str]:
+    """Geohashes of every tile intersecting the circle's bounding box"""
+    south, west, north, east = bounds(encode(lat, lng, precision))
+    tile_height = north - south
+    tile_width = east - west
+
+    dlat = radius_km / KM_PER_DEGREE_LAT
+    dlng = radius_km / (KM_PER_DEGREE_LAT * max(math.cos(math.radians(lat)), 0.01))
+
+    first_row = math.floor((lat - dlat - south) / tile_height)
+    last_row = math.floor((lat + dlat - south) / tile_height)
+    first_col = math.floor((lng - dlng - west) / tile_width)
+    last_col = math.floor((lng + dlng - west) / tile_width)
+
+    tiles = []
+    for row in range(first_row, last_row + 1):
+        center_lat = south + (row + 0.5) * tile_height
+        if not -90 < center_lat < 90:
+            continue
+        for col in range(first_col, last_col + 1):
+            center_lng = (west + (col + 0.5) * tile_width + 180) % 360 - 180
+            tiles.append(encode(center_lat, center_lng, precision))
+    return list(dict.fromkeys(tiles))
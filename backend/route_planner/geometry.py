@@ -0,0 +1,179 @@
+"""
+Vectorized distance helpers over route polylines.
+
+Coordinates are ``(lat, lng)`` pairs in degrees and distances are in
+kilometers, matching ``utils.calculate_distance``.
+"""
+
+from typing import Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = EARTH_RADIUS_KM * np.pi / 180
+# Point-segment pairs per ``project_onto_polyline`` chunk, bounding each of
+# its dense float arrays to 2 MB however many points and segments there are
+PROJECTION_CHUNK_PAIRS = 1 << 18
+
+
+def as_points(coordinates: Iterable[Sequence[float]]) -> np.ndarray:
+    """Return ``coordinates`` as an ``(n, 2)`` float array of lat/lng"""
+    points = np.asarray(coordinates, dtype=np.float64)
+    if points.size == 0:
+        return points.reshape(0, 2)
+    return points.reshape(-1, 2)
+
+
+def haversine_km(lat1, lng1, lat2, lng2) -> np.ndarray:
+    """Great circle distance between points, broadcasting over arrays"""
+    lat1, lng1, lat2, lng2 = map(np.radians, (lat1, lng1, lat2, lng2))
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def distances_from(lat: float, lng: float, points: np.ndarray) -> np.ndarray:
+    """Distance from one point to each row of an ``(n, 2)`` array"""
+    points = as_points(points)
+    return haversine_km(lat, lng, points[:, 0], points[:, 1])
+
+
+def distance_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """``(len(a), len(b))`` distances between two sets of points"""
+    a, b = as_points(a), as_points(b)
+    return haversine_km(a[:, None, 0], a[:, None, 1], b[None, :, 0], b[None, :, 1])
+
+
+def cumulative_distance_km(points: np.ndarray) -> np.ndarray:
+    """
+    Distance traveled from the first point to each point of a polyline,
+    starting at 0.
+    """
+    points = as_points(points)
+    cumulative = np.zeros(len(points))
+    if len(points) > 1:
+        np.cumsum(
+            haversine_km(points[:-1, 0], points[:-1, 1], points[1:, 0], points[1:, 1]),
+            out=cumulative[1:],
+        )
+    return cumulative
+
+
+def indices_at_distances(
+    cumulative: np.ndarray, distances_km: Sequence[float]
+) -> np.ndarray:
+    """
+    Index of the first polyline vertex reached at each distance, found by
+    binary search over the cumulative distances.
+    """
+    indices = np.searchsorted(cumulative, distances_km, side="left")
+    return np.minimum(indices, len(cumulative) - 1)
+
+
+def points_at_distances(
+    coordinates: Sequence[Sequence[float]], distances_km: Sequence[float]
+) -> List[Tuple[float, float]]:
+    """Route vertices reached after traveling each of ``distances_km``"""
+    points = as_points(coordinates)
+    if len(points) == 0:
+        return []
+    indices = indices_at_distances(cumulative_distance_km(points), distances_km)
+    return [tuple(points[i].tolist()) for i in indices]
+
+
+def evenly_spaced_distances(total_km: float, count: int) -> np.ndarray:
+    """``count`` distances splitting ``total_km`` into equal intervals"""
+    return total_km * np.arange(1, count + 1) / (count + 1)
+
+
+def _segment_offsets(
+    points: np.ndarray, starts: np.ndarray, ends: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Distance (km) from each point to each segment and the fraction along
+    the segment of the closest point, as ``(len(points), len(starts))``
+    arrays.
+
+    Uses an equirectangular projection scaled at each point's latitude,
+    which is accurate at the few-kilometer offsets that matter here.
+    """
+    scale = np.cos(np.radians(points[:, 0]))[:, None]
+    ax = (starts[None, :, 1] - points[:, None, 1]) * scale
+    ay = starts[None, :, 0] - points[:, None, 0]
+    dx = (ends[None, :, 1] - starts[None, :, 1]) * scale
+    dy = np.broadcast_to(ends[None, :, 0] - starts[None, :, 0], dx.shape)
+
+    length_sq = dx**2 + dy**2
+    with np.errstate(invalid="ignore", divide="ignore"):
+        t = np.where(length_sq > 0, -(ax * dx + ay * dy) / length_sq, 0.0)
+    t = np.clip(t, 0.0, 1.0)
+    offsets = np.hypot(ax + t * dx, ay + t * dy) * KM_PER_DEGREE
+    return offsets, t
+
+
+def simplify(points: np.ndarray, tolerance_km: float) -> np.ndarray:
+    """
+    Douglas–Peucker simplification of a polyline.
+
+    Returns the indices of the kept vertices; every dropped vertex lies
+    within ``tolerance_km`` of the simplified line.
+    """
+    points = as_points(points)
+    if len(points) <= 2:
+        return np.arange(len(points))
+
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        offsets, _ = _segment_offsets(
+            points[first + 1 : last], points[first : first + 1], points[last : last + 1]
+        )
+        farthest = int(offsets[:, 0].argmax())
+        if offsets[farthest, 0] > tolerance_km:
+            split = first + 1 + farthest
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+
+    return np.flatnonzero(keep)
+
+
+def project_onto_polyline(
+    points: np.ndarray, line: np.ndarray, line_cumulative: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Locate points relative to a polyline.
+
+    Args:
+        points: ``(n, 2)`` points to locate
+        line: ``(k, 2)`` polyline vertices, ``k >= 2``
+        line_cumulative: Along-route distance of each vertex of ``line``
+
+    Returns:
+        ``(offsets, along)``: each point's distance from the line and the
+        along-route distance of its closest point on the line, in km
+    """
+    points, line = as_points(points), as_points(line)
+    offsets = np.empty(len(points))
+    along = np.empty(len(points))
+
+    # Points are projected a chunk at a time so the point-by-segment arrays
+    # stay bounded on long routes with many candidates
+    starts, ends = line[:-1], line[1:]
+    step = max(1, PROJECTION_CHUNK_PAIRS // len(starts))
+    for first in range(0, len(points), step):
+        chunk = slice(first, first + step)
+        chunk_offsets, t = _segment_offsets(points[chunk], starts, ends)
+        segment = chunk_offsets.argmin(axis=1)
+        rows = np.arange(len(segment))
+        offsets[chunk] = chunk_offsets[rows, segment]
+        along[chunk] = line_cumulative[segment] + t[rows, segment] * (
+            line_cumulative[segment + 1] - line_cumulative[segment]
+        )
+    return offsets, along
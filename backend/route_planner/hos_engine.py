@@ -0,0 +1,390 @@
+"""
+Event-driven hours-of-service simulation over compact activity records.
+
+All times are integer minutes. An activity holds its start and end as
+minutes from its log day's midnight; each day keeps its per-status totals
+in a four-slot array updated as activities are recorded, and counts its
+driving segments as it goes. Dates, "HH:MM" strings and hour durations
+are only produced when a day is serialized to the JSON stored on trips
+(``DayLog.as_dict``), so one simulated schedule can be dated for any
+departure.
+"""
+
+from array import array
+from collections import deque
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+STATUSES = ("off_duty", "sleeper_berth", "driving", "on_duty_not_driving")
+OFF_DUTY, SLEEPER_BERTH, DRIVING, ON_DUTY = range(len(STATUSES))
+
+MINUTES_PER_DAY = 24 * 60
+CLOCK = [f"{m // 60:02d}:{m % 60:02d}" for m in range(MINUTES_PER_DAY)]
+MINUTES_BY_CLOCK = {clock: minute for minute, clock in enumerate(CLOCK)}
+
+
+def to_minutes(hours: float) -> int:
+    """Whole minutes in a number of hours"""
+    return int(round(hours * 60))
+
+
+class Activity:
+    """One duty status change: ``[start, start + minutes)`` in day minutes"""
+
+    __slots__ = ("start", "end", "minutes", "status", "location", "description")
+
+    def __init__(
+        self,
+        start: int,
+        minutes: int,
+        status: int,
+        location: Optional[str],
+        description: str,
+        end: Optional[int] = None,
+    ):
+        self.start = start
+        self.minutes = minutes
+        # The displayed end differs from start + minutes only for the
+        # closing rest (shown ending at 23:59) and the 34-hour restart
+        self.end = start + minutes if end is None else end
+        self.status = status
+        # None is shown as the log date (the pre-trip inspection)
+        self.location = location
+        self.description = description
+
+    def as_dict(self, day_date: str) -> Dict[str, Any]:
+        return {
+            "start_time": CLOCK[self.start % MINUTES_PER_DAY],
+            "end_time": CLOCK[self.end % MINUTES_PER_DAY],
+            "status": STATUSES[self.status],
+            "duration": self.minutes / 60,
+            "location": day_date if self.location is None else self.location,
+            "description": self.description,
+        }
+
+
+class DayLog:
+    """The activities of one log day with running per-status totals"""
+
+    __slots__ = ("day_number", "activities", "totals", "driving_segments")
+
+    def __init__(self, day_number: int):
+        self.day_number = day_number
+        self.activities: List[Activity] = []
+        self.totals = array("i", bytes(4 * len(STATUSES)))
+        self.driving_segments = 0
+
+    @property
+    def logged_minutes(self) -> int:
+        return sum(self.totals)
+
+    def record(
+        self,
+        start: int,
+        minutes: int,
+        status: int,
+        location: Optional[str],
+        description: str,
+        end: Optional[int] = None,
+    ) -> int:
+        """Append an activity and return the minute it ends"""
+        self.activities.append(
+            Activity(start, minutes, status, location, description, end)
+        )
+        self.totals[status] += minutes
+        if status == DRIVING:
+            self.driving_segments += 1
+        return start + minutes
+
+    def as_dict(self, start_date: date) -> Dict[str, Any]:
+        """The JSON shape stored in ``TripPlan.eld_logs``"""
+        day_date = (start_date + timedelta(days=self.day_number - 1)).isoformat()
+        return {
+            "date": day_date,
+            "day_number": self.day_number,
+            "activities": [activity.as_dict(day_date) for activity in self.activities],
+            "daily_totals": {
+                status: minutes / 60 for status, minutes in zip(STATUSES, self.totals)
+            },
+            "violations": [],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "DayLog":
+        """Rebuild a day from its ``as_dict`` JSON"""
+        day = cls(data["day_number"])
+        clock = None
+        for activity in data["activities"]:
+            # Activities follow each other, so only the first start is read
+            # from its clock time (which wraps past midnight)
+            start = MINUTES_BY_CLOCK[activity["start_time"]] if clock is None else clock
+            minutes = to_minutes(activity["duration"])
+            shown_end = MINUTES_BY_CLOCK[activity["end_time"]]
+            end = (
+                None
+                if (start + minutes - shown_end) % MINUTES_PER_DAY == 0
+                else shown_end
+            )
+            location = activity["location"]
+            clock = day.record(
+                start,
+                minutes,
+                STATUSES.index(activity["status"]),
+                None if location == data["date"] else location,
+                activity["description"],
+                end,
+            )
+        return day
+
+    def until(self, minute: int) -> "DayLog":
+        """The activities up to ``minute`` of the day, the one under way cut
+        short there"""
+        day = DayLog(self.day_number)
+        for activity in self.activities:
+            if activity.start >= minute:
+                break
+            day.record(
+                activity.start,
+                min(activity.minutes, minute - activity.start),
+                activity.status,
+                activity.location,
+                activity.description,
+            )
+        return day
+
+
+def _driving_since_break(activities: List[Activity], break_minutes: int) -> int:
+    """Driving minutes since the last non-driving stretch of ``break_minutes``"""
+    continuous = 0
+    for activity in activities:
+        if activity.status == DRIVING:
+            continuous += activity.minutes
+        elif activity.minutes >= break_minutes:
+            continuous = 0
+    return continuous
+
+
+class HOSSimulator:
+    """
+    Lays a trip's duty out over log days under the HOS limits.
+
+    Each working day starts at ``day_start`` and drives from event to
+    event: the next drive segment ends at whichever comes first of the
+    daily driving or duty limit, the 8-hour break, the segment cap, the
+    next planned fuel stop or the end of driving, and that event is then
+    handled (break, fueling) before driving resumes. Days on which the
+    70-hour cycle is exhausted are logged as a 34-hour restart.
+    """
+
+    def __init__(
+        self,
+        max_driving: int = 11 * 60,
+        max_duty: int = 14 * 60,
+        max_cycle: int = 70 * 60,
+        break_after: int = 8 * 60,
+        break_minutes: int = 30,
+        max_segment: int = 4 * 60,
+        fuel_minutes: int = 30,
+        pre_trip_minutes: int = 15,
+        restart_minutes: int = 34 * 60,
+        day_start: int = 6 * 60,
+    ):
+        self.max_driving = max_driving
+        self.max_duty = max_duty
+        self.max_cycle = max_cycle
+        self.break_after = break_after
+        self.break_minutes = break_minutes
+        self.max_segment = max_segment
+        self.fuel_minutes = fuel_minutes
+        self.pre_trip_minutes = pre_trip_minutes
+        self.restart_minutes = restart_minutes
+        self.day_start = day_start
+
+    def run(
+        self,
+        driving: int,
+        duty: int,
+        cycle_used: int,
+        pickup: int,
+        delivery: int,
+        fuel_stops: int,
+        fuel_stop_minutes: Optional[Iterable[int]] = None,
+        resume: Optional[DayLog] = None,
+    ) -> List[DayLog]:
+        """
+        Simulate a trip, or the rest of one under way
+
+        Args:
+            driving: Total driving minutes
+            duty: Total on-duty minutes (driving, pickup, delivery, fueling)
+            cycle_used: Minutes already used in the 70-hour cycle
+            pickup: Minutes spent loading at pickup
+            delivery: Minutes spent unloading at delivery
+            fuel_stops: Fuel stops to log after every fourth driving hour of
+                a day, when ``fuel_stop_minutes`` is not given
+            fuel_stop_minutes: Driving minutes at which to fuel
+            resume: The log day in progress, holding its activities so
+                far; duty continues where they end and counts toward the
+                day's limits, and later days are numbered on from it.
+                ``cycle_used`` then excludes the day's duty so far.
+
+        Returns:
+            One ``DayLog`` per log day, from ``resume`` when given
+        """
+        fuel_events = (
+            deque(sorted(fuel_stop_minutes)) if fuel_stop_minutes is not None else None
+        )
+        remaining_driving = driving
+        remaining_duty = duty
+        started = resume is not None
+        days: List[DayLog] = []
+        day_number = 1 if resume is None else resume.day_number
+
+        while remaining_duty > 0 and (remaining_driving > 0 or pickup or delivery):
+            resumed = resume is not None
+            if resumed:
+                day, resume = resume, None
+            else:
+                day = DayLog(day_number)
+            days.append(day)
+            day_number += 1
+
+            clock = self.day_start
+            if day.activities:
+                last = day.activities[-1]
+                clock = last.start + last.minutes
+            daily_driving = day.totals[DRIVING]
+            daily_duty = daily_driving + day.totals[ON_DUTY]
+            continuous = _driving_since_break(day.activities, self.break_minutes)
+
+            available_driving = min(
+                self.max_driving, daily_driving + remaining_driving
+            )
+            available_duty = min(
+                self.max_duty,
+                daily_duty + remaining_duty,
+                self.max_cycle - cycle_used,
+            )
+            if resumed:
+                # Leave the 10-hour rest before the next day starts
+                latest = self.day_start + MINUTES_PER_DAY - 10 * 60
+                available_duty = min(available_duty, daily_duty + latest - clock)
+            if available_duty <= 0 and not day.activities:
+                day.record(
+                    self.day_start,
+                    self.restart_minutes,
+                    OFF_DUTY,
+                    "Rest Area",
+                    "34-hour restart required",
+                    end=self.day_start + self.restart_minutes,
+                )
+                if len(days) >= 2:
+                    cycle_used = 0
+                continue
+
+            if not started:
+                started = True
+                clock = day.record(
+                    clock,
+                    self.pre_trip_minutes,
+                    ON_DUTY,
+                    None,
+                    "Pre-trip inspection",
+                )
+                daily_duty += self.pre_trip_minutes
+
+            while (
+                remaining_driving > 0
+                and daily_driving < available_driving
+                and daily_duty < available_duty
+                and continuous < self.break_after
+            ):
+                segment = min(
+                    remaining_driving,
+                    available_driving - daily_driving,
+                    available_duty - daily_duty,
+                    self.break_after - continuous,
+                    self.max_segment,
+                )
+                if fuel_events:
+                    until_fuel = fuel_events[0] - (driving - remaining_driving)
+                    if until_fuel > 0:
+                        segment = min(segment, until_fuel)
+                if segment <= 0:
+                    break
+
+                clock = day.record(
+                    clock,
+                    segment,
+                    DRIVING,
+                    "En Route",
+                    f"Driving - Segment {day.driving_segments + 1}",
+                )
+                daily_driving += segment
+                daily_duty += segment
+                remaining_driving -= segment
+                remaining_duty -= segment
+                continuous += segment
+
+                if continuous >= self.break_after and remaining_driving > 0:
+                    clock = day.record(
+                        clock,
+                        self.break_minutes,
+                        OFF_DUTY,
+                        "Rest Area",
+                        "30-minute rest break (required after 8 hours driving)",
+                    )
+                    continuous = 0
+
+                if fuel_events is not None:
+                    fuel_due = bool(fuel_events) and (
+                        driving - remaining_driving >= fuel_events[0]
+                    )
+                    if fuel_due:
+                        fuel_events.popleft()
+                else:
+                    fuel_due = (
+                        fuel_stops > 0
+                        and daily_driving > 0
+                        and daily_driving % self.max_segment == 0
+                    )
+
+                if fuel_due:
+                    clock = day.record(
+                        clock, self.fuel_minutes, ON_DUTY, "Fuel Station", "Fueling"
+                    )
+                    daily_duty += self.fuel_minutes
+                    remaining_duty -= self.fuel_minutes
+                    fuel_stops -= 1
+
+            if pickup > 0:
+                clock = day.record(
+                    clock, pickup, ON_DUTY, "Pickup Location", "Loading/Pickup"
+                )
+                daily_duty += pickup
+                remaining_duty -= pickup
+                pickup = 0
+
+            if remaining_driving <= 0 and delivery > 0:
+                clock = day.record(
+                    clock, delivery, ON_DUTY, "Delivery Location", "Unloading/Delivery"
+                )
+                daily_duty += delivery
+                remaining_duty -= delivery
+                delivery = 0
+
+            off_duty = MINUTES_PER_DAY - day.logged_minutes
+            if off_duty > 0:
+                rest = off_duty >= 10 * 60
+                day.record(
+                    clock,
+                    off_duty,
+                    SLEEPER_BERTH if rest else OFF_DUTY,
+                    "Truck Stop" if rest else "Rest Area",
+                    "Required 10-hour rest" if rest else "Off duty",
+                    end=MINUTES_PER_DAY - 1,
+                )
+
+            cycle_used += daily_duty
+
+        return days
@@ -0,0 +1,233 @@
+import asyncio
+import logging
+import os
+import random
+import threading
+import weakref
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Optional, Tuple, Union
+
+import httpx
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger("route_planner.http_client")
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+# Methods whose read errors (timeouts, dropped responses) are retried. A
+# POST that timed out reading has already waited a full read timeout, and
+# retrying it would let one routing or Overpass call outlast the worker
+# timeout.
+READ_RETRY_METHODS = frozenset(["GET"])
+
+Timeout = Union[float, Tuple[float, float]]
+
+_session: Optional[requests.Session] = None
+_session_pid: Optional[int] = None
+_session_lock = threading.Lock()
+
+_async_clients = weakref.WeakKeyDictionary()
+
+
+class CappedRetry(Retry):
+    """
+    urllib3 retry policy whose ``Retry-After`` wait is capped, so a
+    misbehaving upstream cannot park a worker for minutes. Read errors are
+    only retried for ``READ_RETRY_METHODS``.
+    """
+
+    def increment(self, method=None, url=None, *args, error=None, **kwargs):
+        if (
+            error is not None
+            and self._is_read_error(error)
+            and (method or "").upper() not in READ_RETRY_METHODS
+        ):
+            raise error
+        return super().increment(method, url, *args, error=error, **kwargs)
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        return min(retry_after, settings.HTTP_RETRY_AFTER_MAX)
+
+
+def build_session() -> requests.Session:
+    """
+    Create a keep-alive session with bounded per-host connection pools and
+    jittered exponential backoff on connection errors, 429 and 5xx responses
+    (and read errors on GET). ``Retry-After`` headers are honoured up to
+    ``HTTP_RETRY_AFTER_MAX``.
+    """
+    retry = CappedRetry(
+        total=settings.HTTP_MAX_RETRIES,
+        connect=settings.HTTP_MAX_RETRIES,
+        read=settings.HTTP_MAX_RETRIES,
+        status=settings.HTTP_MAX_RETRIES,
+        backoff_factor=settings.HTTP_BACKOFF_FACTOR,
+        backoff_max=settings.HTTP_BACKOFF_MAX,
+        backoff_jitter=settings.HTTP_BACKOFF_JITTER,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=frozenset(["GET", "POST"]),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=settings.HTTP_POOL_CONNECTIONS,
+        pool_maxsize=settings.HTTP_POOL_MAXSIZE,
+        pool_block=True,
+        max_retries=retry,
+    )
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session() -> requests.Session:
+    """
+    Return this process's shared session.
+
+    The session is rebuilt after a fork so gunicorn workers never share
+    sockets inherited from the master process.
+    """
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _session_lock:
+            if _session is None or _session_pid != pid:
+                logger.debug(f"Creating pooled HTTP session for process {pid}")
+                _session = build_session()
+                _session_pid = pid
+    return _session
+
+
+def default_timeout() -> Tuple[float, float]:
+    return (settings.HTTP_CONNECT_TIMEOUT, settings.HTTP_READ_TIMEOUT)
+
+
+def request(
+    method: str, url: str, timeout: Optional[Timeout] = None, **kwargs: Any
+) -> requests.Response:
+    """Send a request through the shared session, always with a timeout"""
+    if timeout is None:
+        timeout = default_timeout()
+    return get_session().request(method, url, timeout=timeout, **kwargs)
+
+
+def get(url: str, **kwargs: Any) -> requests.Response:
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs: Any) -> requests.Response:
+    return request("POST", url, **kwargs)
+
+
+def close_session() -> None:
+    """Close pooled connections (used by tests and on shutdown)"""
+    global _session, _session_pid
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+        _session_pid = None
+
+
+def retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """Parse a ``Retry-After`` header (seconds or HTTP date), capped"""
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            when = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if when.tzinfo is None:
+            when = when.replace(tzinfo=timezone.utc)
+        seconds = (when - datetime.now(timezone.utc)).total_seconds()
+    return min(max(seconds, 0.0), settings.HTTP_RETRY_AFTER_MAX)
+
+
+def backoff_delay(attempt: int) -> float:
+    """Jittered exponential backoff matching the sync session's retry policy"""
+    delay = min(settings.HTTP_BACKOFF_FACTOR * (2**attempt), settings.HTTP_BACKOFF_MAX)
+    return delay + random.uniform(0, settings.HTTP_BACKOFF_JITTER)
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """
+    Return the keep-alive ``httpx.AsyncClient`` for the running event loop.
+
+    Clients are bound to the loop that created them, so one is kept per loop
+    (in practice one per ASGI worker process).
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.HTTP_POOL_CONNECTIONS
+                * settings.HTTP_POOL_MAXSIZE,
+                max_keepalive_connections=settings.HTTP_POOL_MAXSIZE,
+            ),
+        )
+        _async_clients[loop] = client
+    return client
+
+
+async def async_request(
+    method: str, url: str, timeout: Optional[Timeout] = None, **kwargs: Any
+) -> httpx.Response:
+    """
+    Send a request on the shared async client with the same timeout and
+    retry policy as the sync session: transport errors, 429 and 5xx are
+    retried with jittered exponential backoff, honouring ``Retry-After``.
+    Read errors are only retried for ``READ_RETRY_METHODS``.
+    """
+    if timeout is None:
+        timeout = default_timeout()
+    if isinstance(timeout, tuple):
+        connect, read = timeout
+        timeout = httpx.Timeout(read, connect=connect)
+
+    client = get_async_client()
+    attempt = 0
+    while True:
+        try:
+            response = await client.request(method, url, timeout=timeout, **kwargs)
+        except httpx.TransportError as e:
+            if attempt >= settings.HTTP_MAX_RETRIES or (
+                isinstance(e, (httpx.ReadTimeout, httpx.ReadError))
+                and method.upper() not in READ_RETRY_METHODS
+            ):
+                raise
+            delay = backoff_delay(attempt)
+            logger.warning(f"{method} {url} failed ({e}), retrying in {delay:.2f}s")
+        else:
+            if (
+                response.status_code not in RETRY_STATUS_CODES
+                or attempt >= settings.HTTP_MAX_RETRIES
+            ):
+                return response
+            delay = retry_after_seconds(response.headers.get("Retry-After"))
+            if delay is None:
+                delay = backoff_delay(attempt)
+            logger.warning(
+                f"{method} {url} returned {response.status_code}, retrying in {delay:.2f}s"
+            )
+        attempt += 1
+        await asyncio.sleep(delay)
+
+
+async def async_get(url: str, **kwargs: Any) -> httpx.Response:
+    return await async_request("GET", url, **kwargs)
+
+
+async def async_post(url: str, **kwargs: Any) -> httpx.Response:
+    return await async_request("POST", url, **kwargs)
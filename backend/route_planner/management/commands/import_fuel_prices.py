@@ -0,0 +1,49 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from route_planner.models import FuelPrice
+
+
+class Command(BaseCommand):
+    help = (
+        "Load per-station fuel prices from a CSV with osm_id and "
+        "price_per_gallon columns into the FuelPrice table"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Path to the CSV file")
+        parser.add_argument(
+            "--replace",
+            action="store_true",
+            help="Delete previously loaded prices first",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        try:
+            with open(path, newline="", encoding="utf-8") as f:
+                # Keyed by OSM id: an upsert may not touch the same row twice
+                prices = {
+                    int(row["osm_id"]): FuelPrice(
+                        osm_id=int(row["osm_id"]),
+                        price_per_gallon=float(row["price_per_gallon"]),
+                    )
+                    for row in csv.DictReader(f)
+                }
+        except (OSError, KeyError, ValueError) as e:
+            raise CommandError(f"Could not read {path}: {e}")
+
+        with transaction.atomic():
+            if options["replace"]:
+                deleted, _ = FuelPrice.objects.all().delete()
+                self.stdout.write(f"Deleted {deleted} existing prices")
+            FuelPrice.objects.bulk_create(
+                prices.values(),
+                update_conflicts=True,
+                unique_fields=["osm_id"],
+                update_fields=["price_per_gallon", "updated_at"],
+            )
+
+        self.stdout.write(self.style.SUCCESS(f"Loaded {len(prices)} fuel prices"))
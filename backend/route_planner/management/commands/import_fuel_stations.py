@@ -0,0 +1,146 @@
+import gzip
+import json
+import xml.etree.ElementTree as ElementTree
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from route_planner.fuel_stations import reset_station_index
+from route_planner.models import FuelStation
+
+Node = Tuple[int, float, float, Dict[str, str]]
+
+
+def _open(path: str, mode: str = "rt"):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode, encoding="utf-8" if "t" in mode else None)
+    return open(path, mode, encoding="utf-8" if "t" in mode else None)
+
+
+def _osm_id(value: Any) -> Optional[int]:
+    """Parse ids like ``123``, ``"123"`` or ``"node/123"``"""
+    if value is None:
+        return None
+    try:
+        return int(str(value).rsplit("/", 1)[-1])
+    except ValueError:
+        return None
+
+
+def iter_osm_xml(path: str) -> Iterator[Node]:
+    """Yield tagged nodes from an OSM XML extract without loading it whole"""
+    with _open(path, "rb") as f:
+        for _, element in ElementTree.iterparse(f, events=("end",)):
+            if element.tag == "node":
+                tags = {tag.get("k"): tag.get("v") for tag in element.iter("tag")}
+                if tags:
+                    yield (
+                        int(element.get("id")),
+                        float(element.get("lat")),
+                        float(element.get("lon")),
+                        tags,
+                    )
+                element.clear()
+            elif element.tag in ("way", "relation"):
+                element.clear()
+
+
+def iter_json(path: str) -> Iterator[Node]:
+    """Yield nodes from a GeoJSON FeatureCollection or Overpass JSON export"""
+    with _open(path) as f:
+        data = json.load(f)
+
+    for element in data.get("elements", []):
+        if element.get("type") == "node":
+            yield (
+                element["id"],
+                element["lat"],
+                element["lon"],
+                element.get("tags", {}),
+            )
+
+    for feature in data.get("features", []):
+        geometry = feature.get("geometry") or {}
+        if geometry.get("type") != "Point":
+            continue
+        properties = feature.get("properties") or {}
+        tags = properties.get("tags") or {
+            k: str(v) for k, v in properties.items() if not k.startswith("@")
+        }
+        osm_id = _osm_id(
+            properties.get("@id") or properties.get("osm_id") or feature.get("id")
+        )
+        if osm_id is None:
+            continue
+        lng, lat = geometry["coordinates"][:2]
+        yield osm_id, lat, lng, tags
+
+
+class Command(BaseCommand):
+    help = (
+        "Import amenity=fuel nodes from an OSM XML, GeoJSON or Overpass JSON "
+        "extract (optionally gzipped) into the FuelStation table"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Path to the extract")
+        parser.add_argument(
+            "--replace",
+            action="store_true",
+            help="Delete previously imported stations first",
+        )
+        parser.add_argument("--batch-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        name = path[:-3] if path.endswith(".gz") else path
+        if name.endswith((".osm", ".xml")):
+            nodes = iter_osm_xml(path)
+        elif name.endswith((".json", ".geojson")):
+            nodes = iter_json(path)
+        else:
+            raise CommandError(
+                "Unsupported extract format, expected .osm, .xml, .json or .geojson"
+            )
+
+        imported = 0
+        try:
+            with transaction.atomic():
+                if options["replace"]:
+                    deleted, _ = FuelStation.objects.all().delete()
+                    self.stdout.write(f"Deleted {deleted} existing stations")
+
+                # Keyed by OSM id: an upsert may not touch the same row twice
+                batch = {}
+                for osm_id, lat, lng, tags in nodes:
+                    if tags.get("amenity") != "fuel":
+                        continue
+                    batch[osm_id] = FuelStation(
+                        osm_id=osm_id,
+                        name=tags.get("name", "")[:255],
+                        latitude=lat,
+                        longitude=lng,
+                        tags=tags,
+                    )
+                    if len(batch) >= options["batch_size"]:
+                        imported += self._save(batch.values())
+                        batch = {}
+                imported += self._save(batch.values())
+        except (OSError, ValueError, ElementTree.ParseError) as e:
+            raise CommandError(f"Could not read {path}: {e}")
+
+        reset_station_index()
+        self.stdout.write(self.style.SUCCESS(f"Imported {imported} fuel stations"))
+
+    def _save(self, batch):
+        batch = list(batch)
+        if not batch:
+            return 0
+        FuelStation.objects.bulk_create(
+            batch,
+            update_conflicts=True,
+            unique_fields=["osm_id"],
+            update_fields=["name", "latitude", "longitude", "tags", "imported_at"],
+        )
+        return len(batch)
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from route_planner.cache import get_route_cache
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete cached directions responses: by default those expired longer "
+        "than CACHE_STALE_TTL ago, then least recently used ones until the "
+        "table is under ROUTE_CACHE_MAX_BYTES"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Delete every cached route, not just expired entries",
+        )
+
+    def handle(self, *args, **options):
+        cache = get_route_cache()
+        deleted = cache.clear() if options["all"] else cache.evict()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} cached routes"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from route_planner.recap import rebuild_duty_days
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the per-driver daily on-duty buckets behind the 70-hour/"
+        "8-day recap from the ELD logs of all stored trips"
+    )
+
+    def handle(self, *args, **options):
+        buckets = rebuild_duty_days()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {buckets} driver duty days"))
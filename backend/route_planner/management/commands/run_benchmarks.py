@@ -0,0 +1,114 @@
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from route_planner.benchmarks import compare, run_suite
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark HOSCalculator (including multi-week simulation and "
+        "memoized schedules), ELDLogRenderer and "
+        "find_gas_stations_along_route offline on synthetic trips and fixture "
+        "routes, save the results as JSON and optionally compare them with "
+        "an earlier run"
+    )
+
+    def add_arguments(self, parser):
+        benchmarks_dir = os.path.join(settings.BASE_DIR, "benchmarks")
+        parser.add_argument(
+            "--seconds",
+            type=float,
+            default=1.0,
+            help="Minimum time to spend on each case",
+        )
+        parser.add_argument(
+            "--fixtures",
+            default=os.path.join(benchmarks_dir, "fixtures"),
+            help="Directory holding the fixture routes (created when missing)",
+        )
+        parser.add_argument(
+            "--output",
+            help=(
+                "Results file (default: benchmarks/results/<commit or "
+                "timestamp>.json)"
+            ),
+        )
+        parser.add_argument(
+            "--compare",
+            metavar="BASELINE",
+            help="Results file of an earlier run to compare with",
+        )
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=0.1,
+            help=(
+                "Relative drop in ops/sec or rise in peak memory reported as "
+                "a regression"
+            ),
+        )
+
+    def handle(self, *args, **options):
+        try:
+            report = run_suite(options["fixtures"], seconds=options["seconds"])
+        except RuntimeError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(
+            f"{'component':<30} {'case':<22} {'ops/s':>10} {'p50 ms':>9} "
+            f"{'p99 ms':>9} {'peak KiB':>10}"
+        )
+        for result in report["results"]:
+            latency = result["latency_ms"]
+            self.stdout.write(
+                f"{result['component']:<30} {result['case']:<22} "
+                f"{result['ops_per_sec']:>10.1f} {latency['p50']:>9.3f} "
+                f"{latency['p99']:>9.3f} {result['peak_memory_kb']:>10.1f}"
+            )
+
+        output = options["output"] or os.path.join(
+            settings.BASE_DIR,
+            "benchmarks",
+            "results",
+            f"{report['commit'] or report['created_at'].replace(':', '')}.json",
+        )
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(f"Saved results to {output}")
+
+        if options["compare"]:
+            self._compare(options["compare"], report, options["threshold"])
+
+    def _compare(self, path, report, threshold):
+        try:
+            with open(path, encoding="utf-8") as f:
+                baseline = json.load(f)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Could not read baseline {path}: {e}")
+
+        if [f["sha256"] for f in baseline.get("fixtures", [])] != [
+            f["sha256"] for f in report["fixtures"]
+        ]:
+            self.stderr.write("Fixture routes differ from the baseline run")
+
+        rows = compare(baseline, report, threshold)
+        self.stdout.write(
+            f"\nAgainst {baseline.get('commit') or path}:\n"
+            f"{'component':<30} {'case':<22} {'ops/s':>8} {'memory':>8}"
+        )
+        for row in rows:
+            flag = "  REGRESSION" if row["regression"] else ""
+            self.stdout.write(
+                f"{row['component']:<30} {row['case']:<22} "
+                f"{row['ops_ratio']:>7.2f}x {row['memory_ratio']:>7.2f}x{flag}"
+            )
+
+        regressions = sum(row["regression"] for row in rows)
+        if regressions:
+            raise CommandError(
+                f"{regressions} case(s) regressed by more than {threshold:.0%}"
+            )
@@ -0,0 +1,47 @@
+import threading
+from collections import defaultdict
+from typing import Dict, Optional
+
+_lock = threading.Lock()
+_counters: Dict[str, float] = defaultdict(float)
+
+
+def incr(name: str, amount: float = 1) -> None:
+    """Increment a named in-process counter"""
+    with _lock:
+        _counters[name] += amount
+
+
+def observe(name: str, seconds: float) -> None:
+    """Record a timing sample as ``<name>.count`` and ``<name>.seconds``"""
+    with _lock:
+        _counters[f"{name}.count"] += 1
+        _counters[f"{name}.seconds"] += seconds
+
+
+def get(name: str) -> float:
+    """Return the current value of a counter (0 if never incremented)"""
+    with _lock:
+        return _counters.get(name, 0)
+
+
+def snapshot(prefix: Optional[str] = None) -> Dict[str, float]:
+    """Return a copy of all counters, optionally filtered by name prefix"""
+    with _lock:
+        return {
+            name: value
+            for name, value in sorted(_counters.items())
+            if prefix is None or name.startswith(prefix)
+        }
+
+
+def hit_ratio(hits: float, misses: float) -> float:
+    """Return hits / (hits + misses), or 0.0 when nothing was counted"""
+    total = hits + misses
+    return round(hits / total, 4) if total else 0.0
+
+
+def reset() -> None:
+    """Clear all counters (used by tests)"""
+    with _lock:
+        _counters.clear()
@@ -0,0 +1,37 @@
+
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("route_planner", "0005_routecacheentry"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TripRouteInstructions",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("legs", models.JSONField(default=dict)),
+                (
+                    "trip",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="route_instructions",
+                        to="route_planner.tripplan",
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,112 @@
+from django.db import migrations
+
+# Frozen copies of route_planner.utils.compact_route and route_instructions
+# (and the polyline encoder) as of this migration, so later changes to
+# those helpers cannot change what it does.
+
+
+def _encode_value(value, chunks):
+    value = ~(value << 1) if value < 0 else value << 1
+    while value >= 0x20:
+        chunks.append(chr((0x20 | (value & 0x1F)) + 63))
+        value >>= 5
+    chunks.append(chr(value + 63))
+
+
+def encode_polyline(coordinates, precision=5):
+    """Encode [lat, lng] pairs as a Google encoded polyline"""
+    factor = 10**precision
+    chunks = []
+    prev_lat = 0
+    prev_lng = 0
+    for point in coordinates:
+        lat = int(round(point[0] * factor))
+        lng = int(round(point[1] * factor))
+        _encode_value(lat - prev_lat, chunks)
+        _encode_value(lng - prev_lng, chunks)
+        prev_lat = lat
+        prev_lng = lng
+    return "".join(chunks)
+
+
+def compact_route(route_data):
+    """Reduce a directions response to its encoded geometry and summary"""
+    if not route_data or "routes" not in route_data:
+        return route_data
+
+    route = route_data["routes"][0]
+    geometry = route.get("geometry", "")
+    if isinstance(geometry, dict) and "coordinates" in geometry:
+        geometry = encode_polyline(
+            [coord[1], coord[0]] for coord in geometry["coordinates"]
+        )
+    summary = route.get("summary", {})
+    return {
+        "geometry": geometry,
+        "summary": {
+            "distance": summary.get("distance", 0),
+            "duration": summary.get("duration", 0),
+        },
+    }
+
+
+def route_instructions(route_data):
+    """The turn-by-turn steps of a directions response"""
+    if not route_data or not route_data.get("routes"):
+        return []
+
+    steps = []
+    for segment in route_data["routes"][0].get("segments", []):
+        for step in segment.get("steps", []):
+            steps.append(
+                {
+                    "instruction": step.get("instruction", ""),
+                    "name": step.get("name", ""),
+                    "distance": step.get("distance", 0),
+                    "duration": step.get("duration", 0),
+                    "type": step.get("type"),
+                    "way_points": step.get("way_points", []),
+                }
+            )
+    return steps
+
+
+def compact_route_geometry(apps, schema_editor):
+    """
+    Rewrite stored full directions responses into the compact leg schema,
+    moving their turn-by-turn steps to ``TripRouteInstructions``
+    """
+    TripPlan = apps.get_model("route_planner", "TripPlan")
+    TripRouteInstructions = apps.get_model("route_planner", "TripRouteInstructions")
+
+    for trip in TripPlan.objects.exclude(route_geometry=None).iterator(chunk_size=200):
+        legs = trip.route_geometry
+        if not isinstance(legs, dict) or not any(
+            isinstance(leg, dict) and "routes" in leg for leg in legs.values()
+        ):
+            continue
+
+        instructions = {
+            name: route_instructions(leg) for name, leg in legs.items() if leg
+        }
+        if any(instructions.values()):
+            TripRouteInstructions.objects.get_or_create(
+                trip=trip, defaults={"legs": instructions}
+            )
+
+        trip.route_geometry = {
+            name: compact_route(leg) if isinstance(leg, dict) else leg
+            for name, leg in legs.items()
+        }
+        trip.save(update_fields=["route_geometry"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("route_planner", "0006_triprouteinstructions"),
+    ]
+
+    operations = [
+        migrations.RunPython(compact_route_geometry, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("route_planner", "0007_compact_route_geometry"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FuelStation",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("osm_id", models.BigIntegerField(unique=True)),
+                ("name", models.CharField(blank=True, max_length=255)),
+                ("latitude", models.FloatField()),
+                ("longitude", models.FloatField()),
+                ("tags", models.JSONField(default=dict)),
+                ("imported_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
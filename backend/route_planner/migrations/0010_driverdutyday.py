@@ -0,0 +1,89 @@
+from collections import defaultdict
+from datetime import date
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Frozen copy of the route_planner.recap bucketing as of this migration
+RECAP_STATUSES = ("in_progress", "completed")
+
+
+def trip_duty(user_id, status, eld_logs):
+    """On-duty minutes one trip adds to each ``(user, log date)`` bucket"""
+    minutes = defaultdict(int)
+    if user_id is None or status not in RECAP_STATUSES:
+        return minutes
+    for log in eld_logs or []:
+        totals = log.get("daily_totals", {})
+        on_duty = totals.get("driving", 0) + totals.get("on_duty_not_driving", 0)
+        if on_duty:
+            minutes[(user_id, date.fromisoformat(log["date"]))] += int(
+                round(on_duty * 60)
+            )
+    return minutes
+
+
+def backfill_duty_days(apps, schema_editor):
+    """Build the daily duty buckets from the ELD logs of existing trips"""
+    TripPlan = apps.get_model("route_planner", "TripPlan")
+    DriverDutyDay = apps.get_model("route_planner", "DriverDutyDay")
+
+    minutes = defaultdict(int)
+    trips = TripPlan.objects.exclude(user=None).values_list(
+        "user_id", "status", "eld_logs"
+    )
+    for user_id, status, eld_logs in trips.iterator(chunk_size=200):
+        for key, trip_minutes in trip_duty(user_id, status, eld_logs).items():
+            minutes[key] += trip_minutes
+
+    DriverDutyDay.objects.bulk_create(
+        [
+            DriverDutyDay(user_id=user_id, date=day, on_duty_minutes=total)
+            for (user_id, day), total in minutes.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("route_planner", "0009_fuelprice"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DriverDutyDay",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("on_duty_minutes", models.IntegerField(default=0)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="duty_days",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("user", "date"), name="unique_driver_duty_day"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_duty_days, migrations.RunPython.noop),
+    ]
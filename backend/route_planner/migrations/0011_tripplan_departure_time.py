@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("route_planner", "0010_driverdutyday"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="tripplan",
+            name="departure_time",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
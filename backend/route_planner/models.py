@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 import logging
 
@@ -24,6 +24,7 @@ class TripPlan(models.Model):
     route_geometry = models.JSONField(null=True, blank=True)
 
     eld_logs = models.JSONField(null=True, blank=True)
+    departure_time = models.DateTimeField(null=True, blank=True)
     status = models.CharField(
         max_length=20,
         choices=[
@@ -39,15 +40,58 @@ class TripPlan(models.Model):
         return f"Trip from {self.current_location} to {self.dropoff_location}"
 
     def save(self, *args, **kwargs):
+        from .recap import record_trip_change
+
         is_new = self.pk is None
         action = "Creating" if is_new else "Updating"
         logger.info(
             f"{action} TripPlan from {self.current_location} to {self.dropoff_location}"
         )
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            # Locked so concurrent saves of a trip each see the other's
+            # result and move its duty exactly once
+            previous = None if is_new else self._locked_recap_state()
+            super().save(*args, **kwargs)
+            record_trip_change(self, previous)
         if is_new:
             logger.info(f"Created TripPlan with ID: {self.pk}")
 
+    def delete(self, *args, **kwargs):
+        from .recap import record_trip_change
+
+        with transaction.atomic():
+            previous = self._locked_recap_state()
+            if previous is not None:
+                self.status = "cancelled"
+                record_trip_change(self, previous)
+            return super().delete(*args, **kwargs)
+
+    def _locked_recap_state(self):
+        """``(user_id, status, eld_logs)`` of the stored row, locked until
+        the end of the transaction; None if there is no row"""
+        return (
+            TripPlan.objects.select_for_update()
+            .filter(pk=self.pk)
+            .values_list("user_id", "status", "eld_logs")
+            .first()
+        )
+
+
+class TripRouteInstructions(models.Model):
+    """
+    Turn-by-turn steps for a trip's legs, kept out of ``TripPlan`` so trip
+    lists and details do not load them; served by the trip ``instructions``
+    action.
+    """
+
+    trip = models.OneToOneField(
+        TripPlan, on_delete=models.CASCADE, related_name="route_instructions"
+    )
+    legs = models.JSONField(default=dict)
+
+    def __str__(self):
+        return f"Route instructions for trip {self.trip_id}"
+
 
 class HOSViolation(models.Model):
     trip = models.ForeignKey(TripPlan, on_delete=models.CASCADE)
@@ -76,3 +120,98 @@ class HOSViolation(models.Model):
             logger.info(
                 f"Created HOSViolation with ID: {self.pk} for Trip ID: {self.trip.id}"
             )
+
+
+class GeocodeCacheEntry(models.Model):
+    """Geocoding result shared by all workers, keyed on a normalized address"""
+
+    key = models.CharField(max_length=255, unique=True)
+    query = models.CharField(max_length=255)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    found = models.BooleanField(default=True)
+    hit_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        if not self.found:
+            return f"{self.key} (not found)"
+        return f"{self.key} -> {self.latitude}, {self.longitude}"
+
+    @property
+    def coords(self):
+        if not self.found:
+            return None
+        return [self.latitude, self.longitude]
+
+
+class RouteCacheEntry(models.Model):
+    """Directions response keyed on a hash of the quantized routing request"""
+
+    key = models.CharField(max_length=64, unique=True)
+    profile = models.CharField(max_length=50)
+    payload = models.JSONField()
+    size_bytes = models.PositiveIntegerField(default=0)
+    hit_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_accessed_at = models.DateTimeField(db_index=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.profile} route {self.key[:12]}"
+
+
+class FuelStation(models.Model):
+    """
+    ``amenity=fuel`` node imported from an OpenStreetMap extract by the
+    ``import_fuel_stations`` command; served from an in-memory index
+    """
+
+    osm_id = models.BigIntegerField(unique=True)
+    name = models.CharField(max_length=255, blank=True)
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    tags = models.JSONField(default=dict)
+    imported_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name or 'Fuel station'} ({self.osm_id})"
+
+
+class FuelPrice(models.Model):
+    """
+    Price per gallon at an OSM fuel station, loaded by the
+    ``import_fuel_prices`` command and used by the cheapest fuel stop plan
+    """
+
+    osm_id = models.BigIntegerField(unique=True)
+    price_per_gallon = models.FloatField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.osm_id}: ${self.price_per_gallon:.3f}/gal"
+
+
+class DriverDutyDay(models.Model):
+    """
+    On-duty minutes a driver logged on one date across their trips, kept
+    current as trips are saved; the rolling 70-hour/8-day recap sums the
+    last eight rows (see ``recap``)
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="duty_days"
+    )
+    date = models.DateField()
+    on_duty_minutes = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "date"], name="unique_driver_duty_day"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.date}: {self.on_duty_minutes / 60:.2f}h"
@@ -0,0 +1,94 @@
+from functools import lru_cache
+from typing import Iterable, List, Sequence, Tuple
+
+
+def decode(encoded: str, precision: int = 5) -> List[List[float]]:
+    """
+    Decode a Google encoded polyline (as returned by OpenRouteService)
+
+    Args:
+        encoded: The encoded polyline string
+        precision: Number of decimal places used when encoding
+
+    Returns:
+        List of [lat, lng] coordinate pairs
+    """
+    factor = 10**precision
+    coordinates = []
+    index = 0
+    lat = 0
+    lng = 0
+    length = len(encoded)
+
+    while index < length:
+        shift = 0
+        result = 0
+        while True:
+            byte = ord(encoded[index]) - 63
+            index += 1
+            result |= (byte & 0x1F) << shift
+            shift += 5
+            if byte < 0x20:
+                break
+        lat += ~(result >> 1) if result & 1 else result >> 1
+
+        shift = 0
+        result = 0
+        while True:
+            byte = ord(encoded[index]) - 63
+            index += 1
+            result |= (byte & 0x1F) << shift
+            shift += 5
+            if byte < 0x20:
+                break
+        lng += ~(result >> 1) if result & 1 else result >> 1
+
+        coordinates.append([lat / factor, lng / factor])
+
+    return coordinates
+
+
+@lru_cache(maxsize=128)
+def decode_cached(encoded: str, precision: int = 5) -> Tuple[Tuple[float, float], ...]:
+    """
+    Memoized ``decode`` returning immutable pairs
+
+    Popular lanes are served from the route cache with the same geometry
+    string, so their points are decoded once per process.
+    """
+    return tuple((lat, lng) for lat, lng in decode(encoded, precision))
+
+
+def _encode_value(value: int, chunks: List[str]) -> None:
+    value = ~(value << 1) if value < 0 else value << 1
+    while value >= 0x20:
+        chunks.append(chr((0x20 | (value & 0x1F)) + 63))
+        value >>= 5
+    chunks.append(chr(value + 63))
+
+
+def encode(coordinates: Iterable[Sequence[float]], precision: int = 5) -> str:
+    """
+    Encode [lat, lng] coordinate pairs as a Google encoded polyline
+
+    Args:
+        coordinates: Iterable of [lat, lng] pairs
+        precision: Number of decimal places to keep
+
+    Returns:
+        The encoded polyline string
+    """
+    factor = 10**precision
+    chunks: List[str] = []
+    prev_lat = 0
+    prev_lng = 0
+
+    for point in coordinates:
+        lat = int(round(point[0] * factor))
+        lng = int(round(point[1] * factor))
+        _encode_value(lat - prev_lat, chunks)
+        _encode_value(lng - prev_lng, chunks)
+        prev_lat = lat
+        prev_lng = lng
+
+    return "".join(chunks)
@@ -0,0 +1,335 @@
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Mapping, Optional
+
+from django.conf import settings
+
+from . import http_client
+from .circuit import is_upstream_failure
+
+logger = logging.getLogger("route_planner.providers")
+
+PROVIDER_MODES = ("live", "record", "replay")
+
+ORS_BASE_URL = "https://api.openrouteservice.org"
+OVERPASS_URL = "https://overpass-api.de/api/interpreter"
+
+
+class MissingFixtureError(LookupError):
+    """Raised in replay mode for a request that was never recorded"""
+
+
+class FixtureResponse:
+    """
+    Minimal stand-in for a ``requests``/``httpx`` response, enough for the
+    response handlers in ``services`` and ``utils``.
+    """
+
+    def __init__(
+        self,
+        status_code: int,
+        text: str,
+        headers: Optional[Mapping[str, str]] = None,
+    ):
+        self.status_code = status_code
+        self.text = text
+        self.headers = dict(headers or {})
+
+    def json(self) -> Any:
+        return json.loads(self.text)
+
+
+class Provider(ABC):
+    """
+    Upstream services used by the planner: geocoding and directions
+    (OpenRouteService) and fuel station search (Overpass).
+
+    Methods return response objects exposing ``status_code``, ``text`` and
+    ``json()``; parsing and validation stay with the callers so every
+    provider is held to the same checks. Subclasses must implement every
+    method.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def geocode(self, text: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    def directions(self, profile: str, body: Dict[str, Any]):
+        raise NotImplementedError
+
+    @abstractmethod
+    def overpass(self, query: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def geocode_async(self, text: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def directions_async(self, profile: str, body: Dict[str, Any]):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def overpass_async(self, query: str):
+        raise NotImplementedError
+
+
+class LiveProvider(Provider):
+    """Talk to OpenRouteService and Overpass through the pooled HTTP clients"""
+
+    name = "live"
+
+    def __init__(self, api_key: Optional[str] = None, base_url: str = ORS_BASE_URL):
+        self.api_key = api_key if api_key is not None else settings.OPENROUTE_API_KEY
+        self.base_url = base_url
+
+    def _geocode_request(self, text):
+        url = f"{self.base_url}/geocode/search"
+        params = {"api_key": self.api_key, "text": text, "size": 1}
+        return url, params
+
+    def _directions_request(self, profile):
+        url = f"{self.base_url}/v2/directions/{profile}"
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+            "Accept": "application/json",
+        }
+        timeout = (settings.HTTP_CONNECT_TIMEOUT, settings.ORS_READ_TIMEOUT)
+        return url, headers, timeout
+
+    def _overpass_timeout(self):
+        return (settings.HTTP_CONNECT_TIMEOUT, settings.OVERPASS_READ_TIMEOUT)
+
+    def geocode(self, text):
+        url, params = self._geocode_request(text)
+        return http_client.get(url, params=params)
+
+    def directions(self, profile, body):
+        url, headers, timeout = self._directions_request(profile)
+        return http_client.post(url, headers=headers, json=body, timeout=timeout)
+
+    def overpass(self, query):
+        return http_client.post(
+            OVERPASS_URL, data={"data": query}, timeout=self._overpass_timeout()
+        )
+
+    async def geocode_async(self, text):
+        url, params = self._geocode_request(text)
+        return await http_client.async_get(url, params=params)
+
+    async def directions_async(self, profile, body):
+        url, headers, timeout = self._directions_request(profile)
+        return await http_client.async_post(
+            url, headers=headers, json=body, timeout=timeout
+        )
+
+    async def overpass_async(self, query):
+        return await http_client.async_post(
+            OVERPASS_URL, data={"data": query}, timeout=self._overpass_timeout()
+        )
+
+
+class FixtureStore:
+    """
+    Gzipped JSON fixtures, one file per distinct request, stored as
+    ``<directory>/<kind>/<sha256 of the request>.json.gz``.
+
+    Requests are keyed without credentials, so fixtures recorded with one
+    API key replay for any other.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    @staticmethod
+    def request_key(kind: str, request: Dict[str, Any]) -> str:
+        canonical = json.dumps(
+            {"kind": kind, "request": request}, sort_keys=True, separators=(",", ":")
+        )
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def path(self, kind: str, request: Dict[str, Any]) -> str:
+        return os.path.join(
+            self.directory, kind, f"{self.request_key(kind, request)}.json.gz"
+        )
+
+    def load(self, kind: str, request: Dict[str, Any]) -> FixtureResponse:
+        path = self.path(kind, request)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                fixture = json.load(f)
+        except FileNotFoundError:
+            raise MissingFixtureError(f"No recorded {kind} response for {request}")
+        return FixtureResponse(
+            fixture["status_code"], fixture["text"], fixture.get("headers")
+        )
+
+    def save(self, kind: str, request: Dict[str, Any], response) -> None:
+        path = self.path(kind, request)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fixture = {
+            "kind": kind,
+            "request": request,
+            "status_code": response.status_code,
+            "headers": {
+                "Content-Type": response.headers.get("Content-Type", ""),
+            },
+            "text": response.text,
+        }
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(fixture, f)
+        os.replace(tmp_path, path)
+        logger.debug(f"Recorded {kind} fixture {os.path.basename(path)}")
+
+
+class RecordingProvider(Provider):
+    """
+    Forward every call to ``inner`` and save its response as a fixture.
+    Responses from failed upstream calls (429/5xx) are not recorded.
+    """
+
+    name = "record"
+
+    def __init__(self, inner: Provider, store: FixtureStore):
+        self.inner = inner
+        self.store = store
+
+    def _record(self, kind, request, response):
+        if is_upstream_failure(response.status_code):
+            return response
+        try:
+            self.store.save(kind, request, response)
+        except OSError as e:
+            logger.error(f"Failed to record {kind} fixture: {e}")
+        return response
+
+    def geocode(self, text):
+        return self._record("geocode", {"text": text}, self.inner.geocode(text))
+
+    def directions(self, profile, body):
+        request = {"profile": profile, "body": body}
+        return self._record("directions", request, self.inner.directions(profile, body))
+
+    def overpass(self, query):
+        return self._record("overpass", {"query": query}, self.inner.overpass(query))
+
+    async def geocode_async(self, text):
+        response = await self.inner.geocode_async(text)
+        return self._record("geocode", {"text": text}, response)
+
+    async def directions_async(self, profile, body):
+        response = await self.inner.directions_async(profile, body)
+        return self._record("directions", {"profile": profile, "body": body}, response)
+
+    async def overpass_async(self, query):
+        response = await self.inner.overpass_async(query)
+        return self._record("overpass", {"query": query}, response)
+
+
+class ReplayProvider(Provider):
+    """
+    Serve recorded fixtures without touching the network.
+
+    Each call sleeps for ``latency_ms`` plus up to ``jitter_ms`` of random
+    extra delay to approximate the real upstream, so benchmarks keep their
+    concurrency characteristics. Unrecorded requests raise
+    ``MissingFixtureError``.
+    """
+
+    name = "replay"
+
+    def __init__(
+        self, store: FixtureStore, latency_ms: float = 0, jitter_ms: float = 0
+    ):
+        self.store = store
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+
+    def _delay(self) -> float:
+        return (self.latency_ms + random.uniform(0, self.jitter_ms)) / 1000
+
+    def _replay(self, kind, request):
+        delay = self._delay()
+        if delay > 0:
+            time.sleep(delay)
+        return self.store.load(kind, request)
+
+    async def _replay_async(self, kind, request):
+        delay = self._delay()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return self.store.load(kind, request)
+
+    def geocode(self, text):
+        return self._replay("geocode", {"text": text})
+
+    def directions(self, profile, body):
+        return self._replay("directions", {"profile": profile, "body": body})
+
+    def overpass(self, query):
+        return self._replay("overpass", {"query": query})
+
+    async def geocode_async(self, text):
+        return await self._replay_async("geocode", {"text": text})
+
+    async def directions_async(self, profile, body):
+        return await self._replay_async(
+            "directions", {"profile": profile, "body": body}
+        )
+
+    async def overpass_async(self, query):
+        return await self._replay_async("overpass", {"query": query})
+
+
+def build_provider(mode: Optional[str] = None) -> Provider:
+    """Build the provider selected by ``ROUTING_PROVIDER`` (or ``mode``)"""
+    mode = mode or settings.ROUTING_PROVIDER
+    if mode not in PROVIDER_MODES:
+        raise ValueError(f"Invalid routing provider: {mode}")
+
+    if mode == "live":
+        return LiveProvider()
+
+    store = FixtureStore(settings.PROVIDER_FIXTURE_DIR)
+    if mode == "record":
+        return RecordingProvider(LiveProvider(), store)
+    return ReplayProvider(
+        store,
+        latency_ms=settings.REPLAY_LATENCY_MS,
+        jitter_ms=settings.REPLAY_LATENCY_JITTER_MS,
+    )
+
+
+_provider: Optional[Provider] = None
+_provider_lock = threading.Lock()
+
+
+def get_provider() -> Provider:
+    """Return the process-wide provider, creating it on first use"""
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                _provider = build_provider()
+                logger.info(f"Using {_provider.name} routing provider")
+    return _provider
+
+
+def set_provider(provider: Optional[Provider]) -> None:
+    """Swap the process-wide provider; None rebuilds it from settings"""
+    global _provider
+    with _provider_lock:
+        _provider = provider
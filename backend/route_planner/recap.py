@@ -0,0 +1,179 @@
+"""
+Rolling 70-hour/8-day recap per driver.
+
+Each driver's on-duty time is kept in one ``DriverDutyDay`` row per log
+date, the sum over their trips' ELD logs. Rows are adjusted by the
+difference a single trip makes whenever that trip is saved, changes status
+or is deleted, so the hours a driver has available are a sum over the last
+eight rows and stored logs are never rescanned.
+"""
+
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+from django.db.models import Case, F, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+from .hos_engine import to_minutes
+from .models import DriverDutyDay, TripPlan
+
+# Trips whose logs count toward the recap: driven or being driven. Planned
+# trips (what-ifs, batch rows) count once they move to in progress.
+RECAP_STATUSES = ("in_progress", "completed")
+CYCLE_DAYS = 8
+CYCLE_MINUTES = 70 * 60
+
+DutyKey = Tuple[int, date]
+
+
+def duty_minutes_by_date(eld_logs: Optional[List[Dict[str, Any]]]) -> Dict[date, int]:
+    """On-duty (driving and not driving) minutes per log date"""
+    minutes: Dict[date, int] = defaultdict(int)
+    for log in eld_logs or []:
+        totals = log.get("daily_totals", {})
+        on_duty = totals.get("driving", 0) + totals.get("on_duty_not_driving", 0)
+        if on_duty:
+            minutes[date.fromisoformat(log["date"])] += to_minutes(on_duty)
+    return minutes
+
+
+def trip_duty(
+    user_id: Optional[int], status: str, eld_logs: Optional[List[Dict[str, Any]]]
+) -> Dict[DutyKey, int]:
+    """The minutes one trip adds to its driver's daily buckets"""
+    if user_id is None or status not in RECAP_STATUSES:
+        return {}
+    return {
+        (user_id, day): minutes
+        for day, minutes in duty_minutes_by_date(eld_logs).items()
+    }
+
+
+def apply_duty_deltas(deltas: Dict[DutyKey, int]) -> None:
+    """Add minutes to ``(user, date)`` buckets, creating missing ones"""
+    deltas = {key: minutes for key, minutes in deltas.items() if minutes}
+    if not deltas:
+        return
+
+    with transaction.atomic():
+        DriverDutyDay.objects.bulk_create(
+            [DriverDutyDay(user_id=user_id, date=day) for user_id, day in deltas],
+            ignore_conflicts=True,
+        )
+        # One UPDATE for every bucket, incremented in the database so
+        # concurrent trip saves cannot lose each other's minutes
+        match = Q()
+        for user_id, day in deltas:
+            match |= Q(user_id=user_id, date=day)
+        DriverDutyDay.objects.filter(match).update(
+            on_duty_minutes=F("on_duty_minutes")
+            + Case(
+                *[
+                    When(user_id=user_id, date=day, then=Value(minutes))
+                    for (user_id, day), minutes in deltas.items()
+                ],
+                default=Value(0),
+                output_field=IntegerField(),
+            )
+        )
+
+
+def record_trip_change(trip, previous: Optional[Tuple] = None) -> None:
+    """
+    Move a saved trip's duty into the recap
+
+    Args:
+        trip: The trip as saved
+        previous: ``(user_id, status, eld_logs)`` of the trip before the
+            save, or None for a new trip
+    """
+    deltas = trip_duty(trip.user_id, trip.status, trip.eld_logs)
+    if previous is not None:
+        for key, minutes in trip_duty(*previous).items():
+            deltas[key] = deltas.get(key, 0) - minutes
+    apply_duty_deltas(deltas)
+
+
+def record_new_trips(trips: Iterable) -> None:
+    """Add trips created without ``save()`` (bulk inserts) to the recap"""
+    deltas: Dict[DutyKey, int] = defaultdict(int)
+    for trip in trips:
+        for key, minutes in trip_duty(trip.user_id, trip.status, trip.eld_logs).items():
+            deltas[key] += minutes
+    apply_duty_deltas(deltas)
+
+
+def rebuild_duty_days() -> int:
+    """
+    Recompute every bucket from the stored trips, for recovery after bulk
+    changes that bypassed ``TripPlan.save``; returns the number of buckets
+    """
+    minutes: Dict[DutyKey, int] = defaultdict(int)
+    trips = TripPlan.objects.exclude(user=None).values_list(
+        "user_id", "status", "eld_logs"
+    )
+    for user_id, status, eld_logs in trips.iterator(chunk_size=200):
+        for key, trip_minutes in trip_duty(user_id, status, eld_logs).items():
+            minutes[key] += trip_minutes
+
+    with transaction.atomic():
+        DriverDutyDay.objects.all().delete()
+        DriverDutyDay.objects.bulk_create(
+            [
+                DriverDutyDay(user_id=user_id, date=day, on_duty_minutes=total)
+                for (user_id, day), total in minutes.items()
+            ],
+            batch_size=1000,
+        )
+    return len(minutes)
+
+
+def cycle_window(as_of: Optional[date] = None) -> Tuple[date, date]:
+    """First and last day of the 8-day window ending on ``as_of`` (default:
+    today in ``TIME_ZONE``, the zone log dates are written in)"""
+    as_of = as_of or timezone.localdate()
+    return as_of - timedelta(days=CYCLE_DAYS - 1), as_of
+
+
+def _recap(user, on_duty_minutes: int, window: Tuple[date, date]) -> Dict[str, Any]:
+    return {
+        "user": user.id,
+        "username": user.username,
+        "window_start": window[0].isoformat(),
+        "as_of": window[1].isoformat(),
+        "on_duty_hours": on_duty_minutes / 60,
+        "hours_available": max(0, CYCLE_MINUTES - on_duty_minutes) / 60,
+    }
+
+
+def hours_available(user, as_of: Optional[date] = None) -> Dict[str, Any]:
+    """A driver's 70-hour/8-day recap from at most eight daily buckets"""
+    window = cycle_window(as_of)
+    on_duty = DriverDutyDay.objects.filter(
+        user=user, date__range=window
+    ).aggregate(total=Coalesce(Sum("on_duty_minutes"), 0))["total"]
+    return _recap(user, on_duty, window)
+
+
+def fleet_hours_available(as_of: Optional[date] = None) -> List[Dict[str, Any]]:
+    """Every driver's recap, with a single aggregate query"""
+    window = cycle_window(as_of)
+    users = (
+        get_user_model()
+        .objects.filter(is_active=True)
+        .annotate(
+            on_duty=Coalesce(
+                Sum(
+                    "duty_days__on_duty_minutes",
+                    filter=Q(duty_days__date__range=window),
+                ),
+                0,
+            )
+        )
+        .order_by("username")
+    )
+    return [_recap(user, user.on_duty, window) for user in users]
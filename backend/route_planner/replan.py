@@ -0,0 +1,264 @@
+"""
+Re-planning trips already under way.
+
+A trip in progress keeps the log days its driver has finished; only the
+rest of the trip is planned again, from the driver's position and time.
+While the driver is still on the stored route, the distance and time left
+are read off its geometry and nothing is routed; otherwise only the
+current leg is routed again, from the driver's position to its stored end.
+The HOS simulation then resumes on the log day under way, its duty so far
+counting toward the day's limits, instead of starting over from departure.
+"""
+
+import logging
+import math
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import geometry, metrics
+from .hos_engine import DRIVING, MINUTES_PER_DAY, OFF_DUTY, ON_DUTY, DayLog, to_minutes
+from .models import TripRouteInstructions
+from .services import HOSCalculator, RouteService
+from .timeline import find_violations
+from .utils import compact_route, leg_coordinates, route_instructions
+
+logger = logging.getLogger("route_planner.replan")
+
+LEGS = ("to_pickup", "to_delivery")
+
+
+def _locate(leg: Dict[str, Any], position: Tuple[float, float]) -> Tuple[float, float]:
+    """
+    Distance (km) from ``position`` to a stored leg and the share of the
+    leg still ahead of the closest point on it
+    """
+    points = geometry.as_points(leg_coordinates(leg))
+    if len(points) < 2:
+        return math.inf, 1.0
+    cumulative = geometry.cumulative_distance_km(points)
+    offsets, along = geometry.project_onto_polyline([position], points, cumulative)
+    if cumulative[-1] <= 0:
+        return float(offsets[0]), 0.0
+    return float(offsets[0]), 1 - float(along[0]) / float(cumulative[-1])
+
+
+def _duty_end(day: DayLog) -> int:
+    """Minute of the log day at which its last on-duty activity ends"""
+    return max(
+        (
+            activity.start + activity.minutes
+            for activity in day.activities
+            if activity.status in (DRIVING, ON_DUTY)
+        ),
+        default=-1,
+    )
+
+
+class TripReplanner:
+    """
+    Re-plans the rest of a trip in progress.
+
+    ``replan`` returns the trip result fields that change (``eld_logs``,
+    ``violations``, ``route_geometry``, ``total_distance``,
+    ``total_duration``, ``route_instructions``, ``stale``) plus what was
+    re-planned: ``remaining_distance``, ``remaining_duration``,
+    ``picked_up``, ``rerouted`` and ``replanned_from_day``.
+    """
+
+    def __init__(self, route_cache_mode="default"):
+        self.calculator = HOSCalculator(route_cache_mode=route_cache_mode)
+        self.route_cache_mode = route_cache_mode
+
+    def replan(
+        self,
+        trip,
+        position: Tuple[float, float],
+        cycle_hours: float,
+        as_of: Optional[datetime] = None,
+        picked_up: Optional[bool] = None,
+    ) -> Dict[str, Any]:
+        """
+        Args:
+            trip: The ``TripPlan`` in progress
+            position: The driver's ``(lat, lng)``
+            cycle_hours: Hours the driver has used in the 70-hour cycle,
+                this trip included
+            as_of: When the driver is at ``position`` (default: now)
+            picked_up: Whether the load is on board; by default, whether
+                the driver is closer to the delivery leg than the pickup one
+        """
+        route_geometry = trip.route_geometry or {}
+        if not trip.eld_logs or not all(route_geometry.get(leg) for leg in LEGS):
+            raise ValueError("Trip has no stored route and logs to re-plan")
+
+        located = {leg: _locate(route_geometry[leg], position) for leg in LEGS}
+        if picked_up is None:
+            picked_up = located["to_delivery"][0] <= located["to_pickup"][0]
+        current_leg = "to_delivery" if picked_up else "to_pickup"
+
+        route_geometry = dict(route_geometry)
+        instructions = None
+        stale = False
+        offset, ahead = located[current_leg]
+        rerouted = offset > settings.REPLAN_ON_ROUTE_KM
+        if rerouted:
+            route_service = RouteService(route_cache_mode=self.route_cache_mode)
+            route_geometry[current_leg], instructions = self._reroute(
+                trip, route_service, current_leg, position
+            )
+            stale = bool(route_service.stale_sources)
+            ahead = 1.0
+        metrics.incr(f"replan.{'rerouted' if rerouted else 'on_route'}")
+
+        legs_ahead = [(current_leg, ahead)]
+        if not picked_up:
+            legs_ahead.append(("to_delivery", 1.0))
+        remaining_distance = sum(
+            route_geometry[leg]["summary"]["distance"] * share
+            for leg, share in legs_ahead
+        )
+        remaining_duration = sum(
+            route_geometry[leg]["summary"]["duration"] / 3600 * share
+            for leg, share in legs_ahead
+        )
+
+        kept, days, violations, start_date = self._resume_logs(
+            trip.eld_logs,
+            as_of or timezone.now(),
+            remaining_duration,
+            cycle_hours,
+            picked_up,
+            self.calculator._fuel_stops_required(remaining_distance),
+        )
+        logs = kept + self.calculator._dated_logs(days, violations, start_date)
+        logger.info(
+            f"Re-planned trip {trip.pk} from log day {days[0].day_number}: "
+            f"{remaining_distance:.1f} miles left, rerouted={rerouted}"
+        )
+
+        return {
+            "total_distance": sum(
+                route_geometry[leg]["summary"]["distance"] for leg in LEGS
+            ),
+            "total_duration": sum(
+                route_geometry[leg]["summary"]["duration"] for leg in LEGS
+            )
+            / 3600,
+            "route_geometry": route_geometry,
+            "route_instructions": instructions,
+            "eld_logs": logs,
+            "violations": [v for log in logs for v in log["violations"]],
+            "stale": stale,
+            "remaining_distance": remaining_distance,
+            "remaining_duration": remaining_duration,
+            "picked_up": picked_up,
+            "rerouted": rerouted,
+            "replanned_from_day": days[0].day_number,
+        }
+
+    def _reroute(self, trip, route_service, leg, position):
+        """
+        Route from ``position`` to the stored end of ``leg``; returns the
+        compact leg and, when instructions are stored, the trip's updated
+        instructions
+        """
+        target = list(leg_coordinates(trip.route_geometry[leg])[-1])
+        route = route_service.get_route(list(position), target)
+        if not route:
+            destination = (
+                trip.pickup_location if leg == "to_pickup" else trip.dropoff_location
+            )
+            raise ValueError(
+                f"Failed to calculate route from the driver's position to {destination}"
+            )
+
+        instructions = None
+        if settings.ROUTE_STORE_INSTRUCTIONS:
+            instructions = dict(
+                TripRouteInstructions.objects.filter(trip=trip)
+                .values_list("legs", flat=True)
+                .first()
+                or {}
+            )
+            instructions[leg] = route_instructions(route)
+        return compact_route(route), instructions
+
+    def _resume_logs(
+        self,
+        eld_logs: List[Dict[str, Any]],
+        as_of: datetime,
+        remaining_duration: float,
+        cycle_hours: float,
+        picked_up: bool,
+        fuel_stops: int,
+    ) -> Tuple[List[Dict[str, Any]], List[DayLog], List[Dict[str, Any]], date]:
+        """
+        Split stored logs at ``as_of`` and simulate the rest of the trip
+
+        Returns:
+            ``(kept logs, simulated days, their violations, date of log day
+            1)``; the log day under way is simulated again from its
+            activities so far, unless its duty was over by ``as_of``
+        """
+        start_date = date.fromisoformat(eld_logs[0]["date"]) - timedelta(
+            days=eld_logs[0]["day_number"] - 1
+        )
+        if timezone.is_aware(as_of):
+            as_of = timezone.localtime(as_of).replace(tzinfo=None)
+        elapsed = (as_of - datetime.combine(start_date, time())).total_seconds() // 60
+
+        first = DayLog.from_dict(eld_logs[0])
+        day_start = first.activities[0].start if first.activities else 0
+
+        def minute_of_day(day_number):
+            return int(elapsed) - (day_number - 1) * MINUTES_PER_DAY
+
+        current_index = None
+        for index, log in enumerate(eld_logs):
+            if minute_of_day(log["day_number"]) >= day_start:
+                current_index = index
+        if current_index is None:
+            raise ValueError("Trip has not started yet; plan it again instead")
+
+        current = DayLog.from_dict(eld_logs[current_index])
+        minute = minute_of_day(current.day_number)
+        days: List[DayLog] = []
+        if minute < _duty_end(current):
+            kept = eld_logs[:current_index]
+            resume = current.until(minute)
+        else:
+            # The day's duty is over: resume on the log day under way at
+            # ``as_of``, logging off duty up to then and for skipped days
+            kept = eld_logs[: current_index + 1]
+            number = current.day_number + 1
+            while minute_of_day(number) >= day_start + MINUTES_PER_DAY:
+                skipped = DayLog(number)
+                skipped.record(
+                    day_start, MINUTES_PER_DAY, OFF_DUTY, "Rest Area", "Off duty"
+                )
+                days.append(skipped)
+                number += 1
+            resume = DayLog(number)
+            waited = minute_of_day(number) - day_start
+            if waited > 0:
+                resume.record(day_start, waited, OFF_DUTY, "Rest Area", "Off duty")
+
+        # The cycle hours include the duty already logged on the resumed day
+        cycle_used = max(
+            0,
+            to_minutes(cycle_hours)
+            - resume.totals[DRIVING]
+            - resume.totals[ON_DUTY],
+        )
+        inputs = self.calculator._schedule_inputs(
+            *self.calculator._trip_duty(
+                remaining_duration, cycle_used / 60, fuel_stops, picked_up
+            ),
+            day_start=day_start,
+        )
+        days.extend(self.calculator._run_schedule(inputs, resume=resume))
+        violations = find_violations(days, inputs[2], first_day=days[0].day_number)
+        return kept, days, violations, start_date
@@ -0,0 +1,101 @@
+"""
+What-if sweeps of one routed trip over departure times and cycle hours.
+
+The HOS simulation does not depend on the time of day duty starts, only on
+where its activities fall on the clock, so each cycle hours value is
+simulated once with duty starting at midnight. The departure times are then
+applied to all those timelines together by
+``timeline.shifted_violation_counts``.
+"""
+
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from .hos_engine import DRIVING, MINUTES_PER_DAY, ON_DUTY, OFF_DUTY, DayLog
+from .timeline import build_timeline, shifted_violation_counts
+
+
+def _finished_at(days: List[DayLog]) -> Optional[int]:
+    """Minute, from the first day's midnight, at which the last duty ends"""
+    for day in reversed(days):
+        for activity in reversed(day.activities):
+            if activity.status in (DRIVING, ON_DUTY):
+                return (
+                    (day.day_number - 1) * MINUTES_PER_DAY
+                    + activity.start
+                    + activity.minutes
+                )
+    return None
+
+
+def sweep(
+    calculator,
+    total_duration: float,
+    fuel_stops: int,
+    departures: List[datetime],
+    cycle_hours: List[float],
+    fuel_stop_hours: Optional[List[float]] = None,
+) -> Dict[str, Any]:
+    """
+    Evaluate a trip for every departure time and starting cycle hours
+
+    Args:
+        calculator: ``HOSCalculator`` supplying the HOS limits
+        total_duration: Driving hours of the routed trip
+        fuel_stops: Fuel stops of the routed trip
+        departures: Departure times (grid rows)
+        cycle_hours: Cycle hours used before departure (grid columns)
+        fuel_stop_hours: Driving hours at which planned fuel stops happen
+
+    Returns:
+        Grids indexed ``[departure][cycle hours]`` of ``arrival_times``
+        (ISO 8601, when the last duty ends), ``days`` (log days) and
+        ``violations`` (rules broken, counted once per calendar day as in
+        the trip's logs), plus ``best_departure_times``: per cycle hours
+        value, the departure with the fewest violations and then the
+        shortest time to arrival
+    """
+    schedules = []
+    for hours in cycle_hours:
+        inputs = calculator._schedule_inputs(
+            *calculator._trip_duty(total_duration, hours, fuel_stops),
+            fuel_stop_hours,
+            day_start=0,
+        )
+        days = calculator._run_schedule(inputs)
+        schedules.append((inputs[2], days, build_timeline(days).ravel()))
+
+    width = max(len(timeline) for _, _, timeline in schedules)
+    timelines = np.full((len(schedules), width), OFF_DUTY, dtype=np.int8)
+    for row, (_, _, timeline) in enumerate(schedules):
+        timelines[row, : len(timeline)] = timeline
+    starts = [departure.hour * 60 + departure.minute for departure in departures]
+    violations = shifted_violation_counts(
+        timelines, np.array([cycle for cycle, _, _ in schedules]), np.array(starts)
+    )
+
+    arrivals = []
+    elapsed = np.full(violations.shape, np.inf)
+    finished = [_finished_at(days) for _, days, _ in schedules]
+    for row, departure in enumerate(departures):
+        midnight = departure.replace(hour=0, minute=0, second=0, microsecond=0)
+        arrivals.append([])
+        for col, end in enumerate(finished):
+            if end is None:
+                arrivals[row].append(None)
+                continue
+            arrival = midnight + timedelta(minutes=end + starts[row])
+            arrivals[row].append(arrival.isoformat())
+            elapsed[row, col] = (arrival - departure).total_seconds()
+
+    best = np.lexsort((elapsed, violations), axis=0)[0]
+    return {
+        "departure_times": [departure.isoformat() for departure in departures],
+        "cycle_hours": list(cycle_hours),
+        "arrival_times": arrivals,
+        "days": [[len(days) for _, days, _ in schedules] for _ in departures],
+        "violations": violations.tolist(),
+        "best_departure_times": [departures[row].isoformat() for row in best],
+    }
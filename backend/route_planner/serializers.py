@@ -1,3 +1,4 @@
+from django.conf import settings
 from rest_framework import serializers
 from .models import TripPlan, HOSViolation
 
@@ -26,6 +27,7 @@ class TripPlanSerializer(serializers.ModelSerializer):
             "pickup_location",
             "dropoff_location",
             "current_cycle_hours",
+            "departure_time",
             "total_distance",
             "total_duration",
             "route_geometry",
@@ -35,6 +37,7 @@ class TripPlanSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = [
             "id",
+            "departure_time",
             "total_distance",
             "total_duration",
             "route_geometry",
@@ -53,6 +56,7 @@ class TripPlanCreateSerializer(serializers.ModelSerializer):
             "pickup_location",
             "dropoff_location",
             "current_cycle_hours",
+            "departure_time",
         ]
 
     def validate(self, attrs):
@@ -64,6 +68,54 @@ class TripPlanCreateSerializer(serializers.ModelSerializer):
         return attrs
 
 
+class TripPlanBatchCreateSerializer(serializers.Serializer):
+    """Serializer for planning several trips in one request"""
+
+    trips = serializers.ListField(child=serializers.DictField(), allow_empty=False)
+
+    def validate_trips(self, value):
+        """Bound the batch size"""
+        if len(value) > settings.PLANNER_BATCH_MAX_TRIPS:
+            raise serializers.ValidationError(
+                f"At most {settings.PLANNER_BATCH_MAX_TRIPS} trips per batch"
+            )
+        return value
+
+
+class TripScenarioSerializer(serializers.Serializer):
+    """Serializer for sweeping one trip over departure times and cycle hours"""
+
+    current_location = serializers.CharField(max_length=255)
+    pickup_location = serializers.CharField(max_length=255)
+    dropoff_location = serializers.CharField(max_length=255)
+    departure_times = serializers.ListField(
+        child=serializers.DateTimeField(), allow_empty=False
+    )
+    cycle_hours = serializers.ListField(
+        child=serializers.FloatField(min_value=0, max_value=70), allow_empty=False
+    )
+
+    def validate(self, attrs):
+        """Bound the grid size"""
+        cells = len(attrs["departure_times"]) * len(attrs["cycle_hours"])
+        if cells > settings.SCENARIO_MAX_CELLS:
+            raise serializers.ValidationError(
+                f"At most {settings.SCENARIO_MAX_CELLS} departure time and "
+                f"cycle hours combinations per request"
+            )
+        return attrs
+
+
+class TripReplanSerializer(serializers.Serializer):
+    """Serializer for re-planning a trip in progress from the driver's state"""
+
+    latitude = serializers.FloatField(min_value=-90, max_value=90)
+    longitude = serializers.FloatField(min_value=-180, max_value=180)
+    as_of = serializers.DateTimeField(required=False)
+    cycle_hours = serializers.FloatField(min_value=0, max_value=70)
+    picked_up = serializers.BooleanField(required=False)
+
+
 class TripPlanDetailSerializer(TripPlanSerializer):
     """Detailed serializer for Trip Plans with additional computed fields"""
 
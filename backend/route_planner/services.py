@@ -2,49 +2,339 @@ import requests
 import logging
 from datetime import datetime, timedelta
 from django.conf import settings
+from django.utils import timezone
 import math
-from .utils import find_gas_stations_along_route
+import time
+from . import metrics
+from .circuit import get_breaker, is_upstream_failure
+from .executor import map_concurrent, run_in_background
+from .cache import (
+    MISSING,
+    ROUTE_CACHE_MODES,
+    get_geocode_cache,
+    get_route_cache,
+    get_schedule_cache,
+    normalize_address,
+)
+from .coalesce import coalesce_many
+from .fuel_planner import FUEL_STOP_STRATEGIES, FuelPlanError, plan_route_fuel
+from .hos_engine import MINUTES_BY_CLOCK, HOSSimulator, to_minutes
+from .timeline import find_violations
+from .providers import get_provider
+from .utils import (
+    FUEL_SEARCH_MODES,
+    compact_route,
+    encode_route_geometry,
+    find_gas_stations_along_route,
+    find_gas_stations_in_corridor,
+    route_corridor,
+    route_instructions,
+    split_route_legs,
+    summarize_station,
+)
 
 logger = logging.getLogger("route_planner.services")
 
+# Stations farther than this off the route are not considered for planned
+# fuel stops
+FUEL_PLAN_RADIUS_KM = 2.0
+
+# Hour at which trips without a departure time start
+DEFAULT_DEPARTURE_HOUR = 6
+
 
 class RouteService:
-    def __init__(self):
-        self.api_key = settings.OPENROUTE_API_KEY
-        self.base_url = "https://api.openrouteservice.org"
+    def __init__(self, route_cache_mode="default", provider=None):
+        if route_cache_mode not in ROUTE_CACHE_MODES:
+            raise ValueError(f"Invalid route cache mode: {route_cache_mode}")
+        self.provider = provider or get_provider()
+        self.routing_profile = "driving-hgv"
+        self.route_cache_mode = route_cache_mode
+        # Upstreams ("geocode", "route") for which a stale cached answer was
+        # served because the live request failed
+        self.stale_sources = set()
+        # The addresses and route cache keys those stale answers were for, so
+        # callers planning several trips can tell which of them are affected
+        self.stale_locations = set()
+        self.stale_route_keys = set()
 
     def geocode_location(self, location):
-        """Convert address to coordinates"""
-        if not location or not isinstance(location, str):
-            logger.error(f"Invalid location parameter: {location}")
-            return None
+        """Convert address to coordinates, using the shared geocode cache"""
+        return self.geocode_locations([location])[0]
+
+    def geocode_locations(self, locations):
+        """
+        Convert several addresses to coordinates.
+
+        Cache lookups happen on the calling thread; addresses that miss the
+        cache are sent to the geocoding API concurrently. Results are returned
+        in input order, with None for addresses that could not be resolved.
+        """
+        results, misses = self._lookup_geocodes(locations)
+        if misses:
+            with coalesce_many(self._geocode_flight_keys(misses)) as waited:
+                if waited:
+                    results, misses = self._recheck_geocodes(results, misses)
+                fetched = map_concurrent(self._request_geocode, misses)
+                self._store_geocodes(results, misses, fetched)
+                self._serve_stale_geocodes(results, misses, fetched)
+        return [results[location] for location in locations]
+
+    def _geocode_flight_keys(self, locations):
+        return [f"geocode:{normalize_address(location)}" for location in locations]
+
+    def _recheck_geocodes(self, results, misses):
+        """
+        Look up ``misses`` again after waiting on another caller's in-flight
+        request for the same addresses; returns the updated results and the
+        addresses that still have to be fetched.
+        """
+        rechecked, misses_left = self._lookup_geocodes(misses)
+        metrics.incr("geocode.coalesced", len(misses) - len(misses_left))
+        results.update(rechecked)
+        return results, misses_left
+
+    def _lookup_geocodes(self, locations):
+        """Resolve what the cache can; returns ``(results, misses)``"""
+        cache = get_geocode_cache()
+        results = {}
+        misses = []
+
+        for location in dict.fromkeys(locations):
+            if not location or not isinstance(location, str):
+                logger.error(f"Invalid location parameter: {location}")
+                results[location] = None
+                continue
+
+            cached, coords = cache.get(location)
+            if cached:
+                logger.debug(f"Geocode cache hit for '{location}': {coords}")
+                results[location] = coords
+            else:
+                misses.append(location)
+
+        return results, misses
+
+    def _store_geocodes(self, results, misses, fetched):
+        """Merge fetched geocodes into ``results`` and cache definitive ones"""
+        cache = get_geocode_cache()
+        for location, (coords, definitive) in zip(misses, fetched):
+            if definitive:
+                cache.set(location, coords)
+            results[location] = coords
+
+    def _serve_stale_geocodes(self, results, misses, fetched):
+        """
+        Fall back to the last known coordinates for addresses the geocoding
+        API failed to answer, and refresh them in the background.
+        """
+        cache = get_geocode_cache()
+        for location, (coords, definitive) in zip(misses, fetched):
+            if definitive:
+                continue
+            stale_coords = cache.get_stale(location)
+            if stale_coords is None:
+                continue
 
-        url = f"{self.base_url}/geocode/search"
-        params = {"api_key": self.api_key, "text": location, "size": 1}
+            logger.warning(f"Serving stale geocode for '{location}'")
+            metrics.incr("geocode.stale")
+            results[location] = stale_coords
+            self.stale_sources.add("geocode")
+            self.stale_locations.add(location)
+            run_in_background(
+                f"geocode:{normalize_address(location)}",
+                lambda location=location: self._refresh_geocode(location),
+            )
 
+    def _refresh_geocode(self, location):
+        coords, definitive = self._request_geocode(location)
+        if definitive:
+            get_geocode_cache().set(location, coords)
+
+    def _request_geocode(self, location):
+        """
+        Query the geocoding API.
+
+        Returns ``(coords, definitive)``; ``definitive`` is False for transport
+        or server errors, which must not be cached as "address not found".
+        Fails fast without a request while the ORS circuit is open.
+        """
+        breaker = get_breaker("ors")
+        if not breaker.allow():
+            logger.warning(f"ORS circuit open, not geocoding '{location}'")
+            return None, False
+
+        response = None
+        started = time.monotonic()
         try:
             logger.debug(f"Making geocoding request for '{location}'")
-            response = requests.get(url, params=params)
-            if response.status_code == 200:
-                data = response.json()
-                if data.get("features") and len(data["features"]) > 0:
-                    coords = data["features"][0]["geometry"]["coordinates"]
-                    logger.debug(f"Successfully geocoded '{location}' to {coords}")
-                    return [coords[1], coords[0]]
-                logger.debug(f"No geocoding results found for '{location}'")
-            else:
-                logger.error(
-                    f"Geocoding API returned status {response.status_code} for '{location}': {response.text}"
-                )
+            response = self.provider.geocode(location)
+            elapsed = time.monotonic() - started
+            metrics.observe("geocode.upstream", elapsed)
+            breaker.record(not is_upstream_failure(response.status_code), elapsed)
+            return self._handle_geocode_response(location, response)
         except Exception as e:
             logger.error(f"Geocoding error for location '{location}': {e}")
 
-        return None
+        if response is None:
+            breaker.record(False)
+        return None, False
+
+    def _handle_geocode_response(self, location, response):
+        """Parse a geocoding response into ``(coords, definitive)``"""
+        if response.status_code == 200:
+            data = response.json()
+            if data.get("features") and len(data["features"]) > 0:
+                coords = data["features"][0]["geometry"]["coordinates"]
+                logger.debug(f"Successfully geocoded '{location}' to {coords}")
+                return [coords[1], coords[0]], True
+            logger.debug(f"No geocoding results found for '{location}'")
+            return None, True
+
+        logger.error(
+            f"Geocoding API returned status {response.status_code} for '{location}': {response.text}"
+        )
+        return None, False
+
+    def get_route(self, start_coords, end_coords, waypoints=None, cache_mode=None):
+        """
+        Get route between coordinates
+
+        ``cache_mode`` overrides the service-wide route cache mode:
+        ``"default"`` reads and writes the cache, ``"refresh"`` skips the read
+        but stores the fresh result, ``"bypass"`` ignores the cache entirely.
+        """
+        return self.get_routes(
+            [(start_coords, end_coords, waypoints)], cache_mode=cache_mode
+        )[0]
+
+    def get_routes(self, legs, cache_mode=None):
+        """
+        Get several independent routes.
+
+        ``legs`` is a list of ``(start_coords, end_coords)`` or
+        ``(start_coords, end_coords, waypoints)`` tuples. Cache misses are
+        requested from the routing API concurrently; results are returned in
+        input order with None for legs that could not be routed.
+        """
+        cache_mode = cache_mode or self.route_cache_mode
+        if cache_mode not in ROUTE_CACHE_MODES:
+            raise ValueError(f"Invalid route cache mode: {cache_mode}")
+
+        results, pending, route_requests = self._lookup_routes(legs, cache_mode)
+        if not pending:
+            return results
+        if cache_mode != "default":
+            self._fetch_routes(results, pending, route_requests, cache_mode)
+            return results
+
+        with coalesce_many(self._route_flight_keys(pending)) as waited:
+            if waited:
+                results, pending, route_requests = self._recheck_routes(
+                    legs, cache_mode, pending
+                )
+            self._fetch_routes(results, pending, route_requests, cache_mode)
+        return results
 
-    def get_route(self, start_coords, end_coords, waypoints=None):
-        """Get route between coordinates"""
-        url = f"{self.base_url}/v2/directions/driving-hgv"
+    def _fetch_routes(self, results, pending, route_requests, cache_mode):
+        fetched = map_concurrent(
+            lambda args: self._request_route(*args), route_requests
+        )
+        self._store_routes(results, pending, fetched, cache_mode)
+        self._serve_stale_routes(results, pending, route_requests, cache_mode)
+
+    def _route_flight_keys(self, pending):
+        return [f"route:{cache_key}" for _, cache_key in pending]
+
+    def _recheck_routes(self, legs, cache_mode, pending):
+        """Route counterpart of ``_recheck_geocodes``"""
+        results, pending_left, route_requests = self._lookup_routes(legs, cache_mode)
+        metrics.incr("route.coalesced", len(pending) - len(pending_left))
+        return results, pending_left, route_requests
+
+    def route_cache_key(self, start_coords, end_coords, waypoints=None):
+        """Route cache key of a leg, as recorded in ``stale_route_keys``"""
+        data = self._build_route_request(start_coords, end_coords, waypoints)
+        return get_route_cache().make_key(self.routing_profile, data)
+
+    def _lookup_routes(self, legs, cache_mode):
+        """
+        Resolve what the route cache can.
+
+        Returns ``(results, pending, route_requests)`` where ``pending`` holds
+        ``(index, cache_key)`` for every leg that still has to be requested
+        and ``route_requests`` the matching ``_request_route`` arguments.
+        """
+        route_cache = get_route_cache()
+        results = [None] * len(legs)
+        pending = []
+        route_requests = []
+
+        for index, leg in enumerate(legs):
+            start_coords, end_coords = leg[0], leg[1]
+            waypoints = leg[2] if len(leg) > 2 else None
+            data = self._build_route_request(start_coords, end_coords, waypoints)
+            cache_key = route_cache.make_key(self.routing_profile, data)
+
+            if cache_mode == "default":
+                route_data = route_cache.get(cache_key)
+                if route_data is not None:
+                    logger.debug(
+                        f"Route cache hit for route between {start_coords} and {end_coords}"
+                    )
+                    results[index] = route_data
+                    continue
+            else:
+                metrics.incr(f"route.{cache_mode}")
+
+            pending.append((index, cache_key))
+            route_requests.append((data, start_coords, end_coords))
+
+        return results, pending, route_requests
+
+    def _store_routes(self, results, pending, fetched, cache_mode):
+        """Merge fetched routes into ``results`` and cache them"""
+        route_cache = get_route_cache()
+        for (index, cache_key), route_data in zip(pending, fetched):
+            if route_data is not None and cache_mode != "bypass":
+                route_cache.set(cache_key, route_data, profile=self.routing_profile)
+            results[index] = route_data
+
+    def _serve_stale_routes(self, results, pending, route_requests, cache_mode):
+        """
+        Fall back to the last known route for legs the routing API failed to
+        answer, and refresh them in the background. Not used in bypass mode.
+        """
+        if cache_mode == "bypass":
+            return
+
+        route_cache = get_route_cache()
+        for (index, cache_key), args in zip(pending, route_requests):
+            if results[index] is not None:
+                continue
+            route_data = route_cache.get_stale(cache_key)
+            if route_data is None:
+                continue
 
+            logger.warning(f"Serving stale route {cache_key[:12]}")
+            metrics.incr("route.stale")
+            results[index] = route_data
+            self.stale_sources.add("route")
+            self.stale_route_keys.add(cache_key)
+            run_in_background(
+                f"route:{cache_key}",
+                lambda cache_key=cache_key, args=args: self._refresh_route(
+                    cache_key, *args
+                ),
+            )
+
+    def _refresh_route(self, cache_key, data, start_coords, end_coords):
+        route_data = self._request_route(data, start_coords, end_coords)
+        if route_data is not None:
+            get_route_cache().set(cache_key, route_data, profile=self.routing_profile)
+
+    def _build_route_request(self, start_coords, end_coords, waypoints=None):
+        """Build the directions request body for a route"""
         coordinates = [[start_coords[1], start_coords[0]]]
         if waypoints and len(waypoints) > 0:
             for wp in waypoints:
@@ -53,13 +343,7 @@ class RouteService:
 
         logger.debug(f"Requesting route with coordinates: {coordinates}")
 
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json",
-            "Accept": "application/json",
-        }
-
-        data = {
+        return {
             "coordinates": coordinates,
             "preference": "recommended",
             "units": "mi",
@@ -68,65 +352,30 @@ class RouteService:
             "geometry": True,
         }
 
+    def _request_route(self, data, start_coords, end_coords):
+        """
+        POST a directions request and validate the response. Fails fast
+        without a request while the ORS circuit is open.
+        """
+        breaker = get_breaker("ors")
+        if not breaker.allow():
+            logger.warning(
+                f"ORS circuit open, not routing between {start_coords} and {end_coords}"
+            )
+            return None
+
+        response = None
         try:
             logger.debug(f"Making routing request from {start_coords} to {end_coords}")
-            logger.debug(f"Request URL: {url}")
-            logger.debug(f"Request headers: {headers}")
             logger.debug(f"Request data: {data}")
 
-            response = requests.post(url, headers=headers, json=data, timeout=30)
-
-            logger.debug(f"Response status code: {response.status_code}")
-            if response.status_code == 200:
-                route_data = response.json()
-                logger.debug(f"Response data keys: {route_data.keys()}")
-
-                if not route_data:
-                    logger.error("Empty response data received from routing API")
-                    return None
-
-                if "error" in route_data:
-                    error_info = route_data.get("error", {})
-                    error_code = error_info.get("code", "unknown")
-                    error_message = error_info.get("message", "Unknown error")
-                    logger.error(
-                        f"API error: code={error_code}, message={error_message}"
-                    )
-                    return None
-
-                if "routes" in route_data and len(route_data["routes"]) > 0:
-                    pass
-                else:
-                    logger.error(f"Unexpected response format: {route_data.keys()}")
-                    return None
+            started = time.monotonic()
+            response = self.provider.directions(self.routing_profile, data)
+            elapsed = time.monotonic() - started
+            metrics.observe("route.upstream", elapsed)
+            breaker.record(not is_upstream_failure(response.status_code), elapsed)
 
-                logger.debug(
-                    f"Successfully calculated route between {start_coords} and {end_coords}"
-                )
-
-                summary = route_data["routes"][0].get("summary", {})
-                distance = summary.get("distance", 0)
-                duration = summary.get("duration", 0)
-                logger.info(
-                    f"Route calculated: {distance:.1f} mi, {duration/3600:.1f} hours"
-                )
-
-                return route_data
-            else:
-                error_msg = f"Routing API returned status {response.status_code}"
-                try:
-                    error_json = response.json()
-                    if "error" in error_json:
-                        error_details = error_json["error"]
-                        error_msg += f": {error_details.get('message', 'Unknown error')} (code: {error_details.get('code', 'unknown')})"
-                    else:
-                        error_msg += f": {response.text}"
-                except Exception:
-                    if hasattr(response, "text"):
-                        error_msg += f": {response.text}"
-                logger.error(
-                    f"{error_msg} for route between {start_coords} and {end_coords}"
-                )
+            return self._handle_route_response(response, start_coords, end_coords)
         except requests.exceptions.Timeout:
             logger.error(
                 f"Request timeout for route between {start_coords} and {end_coords}"
@@ -146,11 +395,74 @@ class RouteService:
             logger.error(f"Route error between {start_coords} and {end_coords}: {e}")
             logger.exception("Detailed exception info for route calculation:")
 
+        if response is None:
+            breaker.record(False)
+        return None
+
+    def _handle_route_response(self, response, start_coords, end_coords):
+        """Validate a directions response; returns the route data or None"""
+        logger.debug(f"Response status code: {response.status_code}")
+        if response.status_code == 200:
+            route_data = response.json()
+            logger.debug(f"Response data keys: {route_data.keys()}")
+
+            if not route_data:
+                logger.error("Empty response data received from routing API")
+                return None
+
+            if "error" in route_data:
+                error_info = route_data.get("error", {})
+                error_code = error_info.get("code", "unknown")
+                error_message = error_info.get("message", "Unknown error")
+                logger.error(f"API error: code={error_code}, message={error_message}")
+                return None
+
+            if "routes" in route_data and len(route_data["routes"]) > 0:
+                pass
+            else:
+                logger.error(f"Unexpected response format: {route_data.keys()}")
+                return None
+
+            logger.debug(
+                f"Successfully calculated route between {start_coords} and {end_coords}"
+            )
+            encode_route_geometry(route_data)
+
+            summary = route_data["routes"][0].get("summary", {})
+            distance = summary.get("distance", 0)
+            duration = summary.get("duration", 0)
+            logger.info(
+                f"Route calculated: {distance:.1f} mi, {duration/3600:.1f} hours"
+            )
+
+            return route_data
+
+        error_msg = f"Routing API returned status {response.status_code}"
+        try:
+            error_json = response.json()
+            if "error" in error_json:
+                error_details = error_json["error"]
+                error_msg += f": {error_details.get('message', 'Unknown error')} (code: {error_details.get('code', 'unknown')})"
+            else:
+                error_msg += f": {response.text}"
+        except Exception:
+            if hasattr(response, "text"):
+                error_msg += f": {response.text}"
+        logger.error(f"{error_msg} for route between {start_coords} and {end_coords}")
         return None
 
 
 class HOSCalculator:
-    def __init__(self):
+    def __init__(
+        self, route_cache_mode="default", fuel_search_mode=None, fuel_strategy=None
+    ):
+        self.route_cache_mode = route_cache_mode
+        self.fuel_search_mode = fuel_search_mode or settings.FUEL_SEARCH_MODE
+        if self.fuel_search_mode not in FUEL_SEARCH_MODES:
+            raise ValueError(f"Invalid fuel search mode: {self.fuel_search_mode}")
+        self.fuel_strategy = fuel_strategy or settings.FUEL_STOP_STRATEGY
+        if self.fuel_strategy not in FUEL_STOP_STRATEGIES:
+            raise ValueError(f"Invalid fuel stop strategy: {self.fuel_strategy}")
         self.max_driving_hours = 11
         self.max_duty_hours = 14
         self.max_weekly_hours = 70
@@ -161,6 +473,95 @@ class HOSCalculator:
 
     def calculate_eld_logs(self, trip_data):
         """Calculate ELD logs for the entire trip"""
+        current_location, pickup_location, dropoff_location, current_cycle_hours = (
+            self._parse_trip_data(trip_data)
+        )
+        departure = self._parse_departure(trip_data)
+        route = self.plan_route(current_location, pickup_location, dropoff_location)
+
+        return self._build_trip_result(
+            route["total_distance"],
+            route["total_duration"],
+            current_cycle_hours,
+            route["route_geometry"],
+            route["fuel_stops_required"],
+            route["fuel_stops"],
+            stale=route["stale"],
+            route_instructions=route["route_instructions"],
+            fuel_stop_hours=route["fuel_stop_hours"],
+            departure=departure,
+        )
+
+    def plan_route(self, current_location, pickup_location, dropoff_location):
+        """
+        Geocode and route a trip and choose its fuel stops
+
+        Returns:
+            The route part of a trip result: ``total_distance``,
+            ``total_duration``, ``route_geometry``, ``route_instructions``,
+            ``fuel_stops_required``, ``fuel_stops``, ``fuel_stop_hours`` and
+            ``stale``
+        """
+        route_service = RouteService(route_cache_mode=self.route_cache_mode)
+
+        logger.debug(
+            f"Geocoding {current_location}, {pickup_location} and {dropoff_location}"
+        )
+        current_coords, pickup_coords, dropoff_coords = route_service.geocode_locations(
+            [current_location, pickup_location, dropoff_location]
+        )
+        self._check_geocodes(
+            (current_location, current_coords),
+            (pickup_location, pickup_coords),
+            (dropoff_location, dropoff_coords),
+        )
+
+        current = (current_location, current_coords)
+        pickup = (pickup_location, pickup_coords)
+        dropoff = (dropoff_location, dropoff_coords)
+        if settings.ROUTE_SINGLE_REQUEST:
+            route_to_pickup, route_to_delivery = self._route_via_pickup(
+                route_service, current, pickup, dropoff
+            )
+        else:
+            route_to_pickup, route_to_delivery = self._route_legs(
+                route_service, current, pickup, dropoff
+            )
+
+        total_distance, total_duration = self._summarize_route(
+            route_to_pickup, route_to_delivery
+        )
+        route_geometry, instructions = self._compact_route_legs(
+            route_to_pickup, route_to_delivery
+        )
+
+        if self.fuel_strategy == "interval":
+            fuel_stops = self._fuel_stops_required(total_distance)
+            gas_stations = find_gas_stations_along_route(
+                route_geometry, fuel_stops, mode=self.fuel_search_mode
+            )
+            fuel_stop_hours = None
+        else:
+            corridor = route_corridor(route_geometry, FUEL_PLAN_RADIUS_KM)
+            stations = find_gas_stations_in_corridor(corridor) if corridor else []
+            fuel_stops, gas_stations, fuel_stop_hours = self._plan_fuel_stops(
+                corridor, stations, total_distance, total_duration
+            )
+        logger.info(f"Found {len(gas_stations)} gas stations along the route")
+
+        return {
+            "total_distance": total_distance,
+            "total_duration": total_duration,
+            "route_geometry": route_geometry,
+            "route_instructions": instructions,
+            "fuel_stops_required": fuel_stops,
+            "fuel_stops": gas_stations,
+            "fuel_stop_hours": fuel_stop_hours,
+            "stale": bool(route_service.stale_sources),
+        }
+
+    def _parse_trip_data(self, trip_data):
+        """Return the current/pickup/dropoff locations and cycle hours"""
         try:
             current_location = trip_data["current_location"]
             pickup_location = trip_data["pickup_location"]
@@ -174,14 +575,32 @@ class HOSCalculator:
         logger.info(
             f"Calculating ELD logs for trip from {current_location} to {dropoff_location}"
         )
-        route_service = RouteService()
-
-        logger.debug(f"Geocoding current location: {current_location}")
-        current_coords = route_service.geocode_location(current_location)
-        logger.debug(f"Geocoding pickup location: {pickup_location}")
-        pickup_coords = route_service.geocode_location(pickup_location)
-        logger.debug(f"Geocoding dropoff location: {dropoff_location}")
-        dropoff_coords = route_service.geocode_location(dropoff_location)
+        return current_location, pickup_location, dropoff_location, current_cycle_hours
+
+    def _parse_departure(self, trip_data):
+        """
+        The trip's ``departure_time`` (a datetime or ISO 8601 string), or
+        today at ``DEFAULT_DEPARTURE_HOUR``; naive times are in ``TIME_ZONE``
+        """
+        departure = trip_data.get("departure_time")
+        if departure is None:
+            return timezone.localtime().replace(
+                hour=DEFAULT_DEPARTURE_HOUR, minute=0, second=0, microsecond=0
+            )
+        if isinstance(departure, str):
+            try:
+                departure = datetime.fromisoformat(departure)
+            except ValueError:
+                raise ValueError(f"Invalid departure time: {departure}")
+        if timezone.is_naive(departure):
+            departure = timezone.make_aware(departure)
+        return departure
+
+    def _check_geocodes(self, current, pickup, dropoff):
+        """Raise ValueError naming every trip location that failed to geocode"""
+        current_location, current_coords = current
+        pickup_location, pickup_coords = pickup
+        dropoff_location, dropoff_coords = dropoff
 
         missing_locations = []
         if not current_coords:
@@ -196,26 +615,8 @@ class HOSCalculator:
             logger.error(error_msg)
             raise ValueError(error_msg)
 
-        logger.info(f"Calculating route from {current_location} to {pickup_location}")
-        route_to_pickup = route_service.get_route(current_coords, pickup_coords)
-        if not route_to_pickup:
-            error_msg = f"Failed to calculate route from {current_location} to {pickup_location}"
-            logger.error(error_msg)
-            raise ValueError(error_msg)
-        logger.info(
-            f"Successfully calculated route from {current_location} to {pickup_location}"
-        )
-
-        logger.info(f"Calculating route from {pickup_location} to {dropoff_location}")
-        route_to_delivery = route_service.get_route(pickup_coords, dropoff_coords)
-        if not route_to_delivery:
-            error_msg = f"Failed to calculate route from {pickup_location} to {dropoff_location}"
-            logger.error(error_msg)
-            raise ValueError(error_msg)
-        logger.info(
-            f"Successfully calculated route from {pickup_location} to {dropoff_location}"
-        )
-
+    def _summarize_route(self, route_to_pickup, route_to_delivery):
+        """Return total distance (miles) and driving duration (hours)"""
         try:
             pickup_distance = 0
             pickup_duration = 0
@@ -269,24 +670,124 @@ class HOSCalculator:
             logger.error(f"Error extracting route data: {e}")
             raise ValueError(f"Invalid route data structure: {e}")
 
-        pickup_time = 1.0
+        return total_distance, total_duration
+
+    def _compact_route_legs(self, route_to_pickup, route_to_delivery):
+        """
+        Return the compact ``route_geometry`` stored on the trip and the
+        per-leg turn-by-turn instructions (None when not stored)
+        """
+        legs = {"to_pickup": route_to_pickup, "to_delivery": route_to_delivery}
+        route_geometry = {name: compact_route(leg) for name, leg in legs.items()}
+        if not settings.ROUTE_STORE_INSTRUCTIONS:
+            return route_geometry, None
+        instructions = {name: route_instructions(leg) for name, leg in legs.items()}
+        return route_geometry, instructions
+
+    def _fuel_stops_required(self, total_distance):
+        return math.floor(total_distance / 500)
+
+    def _plan_fuel_stops(self, corridor, stations, total_distance, total_duration):
+        """
+        Choose fuel stops among the stations found in the route corridor
+
+        Returns:
+            ``(number of stops, fuel stops, driving hours at each stop)``;
+            falls back to the interval estimate, without stations or hours,
+            when the route has no geometry or a gap the truck cannot cover
+        """
+        try:
+            if corridor is None:
+                raise FuelPlanError("Route has no geometry")
+            route_miles = corridor.length_miles
+            stops = plan_route_fuel(stations, route_miles, self.fuel_strategy)
+        except FuelPlanError as e:
+            logger.warning(
+                f"Could not plan fuel stops ({e}), assuming one every 500 miles"
+            )
+            metrics.incr("fuel.plan_failed")
+            return self._fuel_stops_required(total_distance), [], None
+
+        # Fueling is placed in the logs by the share of the route driven
+        fuel_stop_hours = [
+            stop["route_miles"] / route_miles * total_duration for stop in stops
+        ]
+        return len(stops), [summarize_station(s) for s in stops], fuel_stop_hours
+
+    def _build_trip_result(
+        self,
+        total_distance,
+        total_duration,
+        current_cycle_hours,
+        route_geometry,
+        fuel_stops,
+        gas_stations,
+        stale=False,
+        route_instructions=None,
+        fuel_stop_hours=None,
+        logs=None,
+        departure=None,
+    ):
+        """
+        Generate the daily logs and assemble the trip result. ``stale`` marks
+        results built from cached data served during an upstream outage;
+        ``fuel_stop_hours`` places planned fuel stops by driving time.
+        ``logs`` are used as the daily logs when already generated.
+        """
+        departure = departure or self._parse_departure({})
+        if logs is None:
+            logs = self._trip_logs(
+                total_duration,
+                current_cycle_hours,
+                fuel_stops,
+                fuel_stop_hours,
+                departure=departure,
+            )
+
+        return {
+            "total_distance": total_distance,
+            "total_duration": total_duration,
+            "route_geometry": route_geometry,
+            "eld_logs": logs,
+            "violations": [v for log in logs for v in log["violations"]],
+            "fuel_stops_required": fuel_stops,
+            "fuel_stops": gas_stations,
+            "stale": stale,
+            "route_instructions": route_instructions,
+            "departure_time": departure,
+        }
+
+    def _trip_logs(
+        self,
+        total_duration,
+        current_cycle_hours,
+        fuel_stops,
+        fuel_stop_hours=None,
+        departure=None,
+    ):
+        """Daily logs for a trip's driving"""
+        return self._generate_daily_logs(
+            *self._trip_duty(total_duration, current_cycle_hours, fuel_stops),
+            fuel_stop_hours=fuel_stop_hours,
+            departure=departure,
+        )
+
+    def _trip_duty(
+        self, total_duration, current_cycle_hours, fuel_stops, picked_up=False
+    ):
+        """
+        ``_generate_daily_logs`` hour inputs for a trip's driving, with one
+        hour each to load (unless ``picked_up``) and unload and half an hour
+        per fuel stop
+        """
+        pickup_time = 0.0 if picked_up else 1.0
         delivery_time = 1.0
         total_on_duty_time = total_duration + pickup_time + delivery_time
 
-        fuel_stops = math.floor(total_distance / 500)
         fuel_stop_time = fuel_stops * 0.5
         total_on_duty_time += fuel_stop_time
 
-        gas_stations = find_gas_stations_along_route(
-            {
-                "to_pickup": route_to_pickup,
-                "to_delivery": route_to_delivery,
-            },
-            fuel_stops,
-        )
-        logger.info(f"Found {len(gas_stations)} gas stations along the route")
-
-        logs = self._generate_daily_logs(
+        return (
             total_duration,
             total_on_duty_time,
             current_cycle_hours,
@@ -295,17 +796,79 @@ class HOSCalculator:
             fuel_stops,
         )
 
-        return {
-            "total_distance": total_distance,
-            "total_duration": total_duration,
-            "route_geometry": {
-                "to_pickup": route_to_pickup,
-                "to_delivery": route_to_delivery,
-            },
-            "eld_logs": logs,
-            "fuel_stops_required": fuel_stops,
-            "fuel_stops": gas_stations,
-        }
+    def _route_legs(self, route_service, current, pickup, dropoff):
+        """Route current -> pickup and pickup -> dropoff as two requests"""
+        current_location, current_coords = current
+        pickup_location, pickup_coords = pickup
+        dropoff_location, dropoff_coords = dropoff
+
+        logger.info(
+            f"Calculating routes {current_location} -> {pickup_location} -> {dropoff_location}"
+        )
+        route_to_pickup, route_to_delivery = route_service.get_routes(
+            [(current_coords, pickup_coords), (pickup_coords, dropoff_coords)]
+        )
+        return self._check_legs(
+            route_to_pickup, route_to_delivery, current, pickup, dropoff
+        )
+
+    def _check_legs(self, route_to_pickup, route_to_delivery, current, pickup, dropoff):
+        """Raise ValueError for the first leg that could not be routed"""
+        current_location = current[0]
+        pickup_location = pickup[0]
+        dropoff_location = dropoff[0]
+
+        if not route_to_pickup:
+            error_msg = f"Failed to calculate route from {current_location} to {pickup_location}"
+            logger.error(error_msg)
+            raise ValueError(error_msg)
+        if not route_to_delivery:
+            error_msg = f"Failed to calculate route from {pickup_location} to {dropoff_location}"
+            logger.error(error_msg)
+            raise ValueError(error_msg)
+        logger.info(
+            f"Successfully calculated routes from {current_location} to {dropoff_location}"
+        )
+        return route_to_pickup, route_to_delivery
+
+    def _route_via_pickup(self, route_service, current, pickup, dropoff):
+        """
+        Route current -> pickup -> dropoff with a single directions request
+        and split the response into the two legs. Falls back to two requests
+        if the response has no per-segment data.
+        """
+        current_location, current_coords = current
+        pickup_location, pickup_coords = pickup
+        dropoff_location, dropoff_coords = dropoff
+
+        logger.info(
+            f"Calculating route {current_location} -> {pickup_location} -> {dropoff_location} in one request"
+        )
+        full_route = route_service.get_route(
+            current_coords, dropoff_coords, waypoints=[pickup_coords]
+        )
+        legs = self._split_full_route(full_route, current, pickup, dropoff)
+        if legs is None:
+            return self._route_legs(route_service, current, pickup, dropoff)
+        return legs
+
+    def _split_full_route(self, full_route, current, pickup, dropoff):
+        """Split a routed trip into its two legs; None means route separately"""
+        if not full_route:
+            error_msg = f"Failed to calculate route from {current[0]} via {pickup[0]} to {dropoff[0]}"
+            logger.error(error_msg)
+            raise ValueError(error_msg)
+
+        try:
+            route_to_pickup, route_to_delivery = split_route_legs(full_route)
+        except ValueError as e:
+            logger.warning(
+                f"Could not split route into legs ({e}), routing legs separately"
+            )
+            return None
+
+        logger.info(f"Successfully calculated route from {current[0]} to {dropoff[0]}")
+        return route_to_pickup, route_to_delivery
 
     def _generate_daily_logs(
         self,
@@ -315,226 +878,166 @@ class HOSCalculator:
         pickup_time,
         delivery_time,
         fuel_stops,
+        fuel_stop_hours=None,
+        departure=None,
+        use_cache=True,
     ):
-        """Generate detailed ELD logs"""
-        logs = []
-        current_time = datetime.now().replace(hour=6, minute=0, second=0, microsecond=0)
-        remaining_driving = driving_time
-        remaining_duty = total_duty_time
-        cycle_hours_used = current_cycle
-
-        day_number = 1
-
-        while remaining_duty > 0:
-            log_entry = {
-                "date": current_time.strftime("%Y-%m-%d"),
-                "day_number": day_number,
-                "activities": [],
-                "daily_totals": {
-                    "off_duty": 0,
-                    "sleeper_berth": 0,
-                    "driving": 0,
-                    "on_duty_not_driving": 0,
-                },
-                "violations": [],
-            }
-
-            available_driving = min(self.max_driving_hours, remaining_driving)
-            available_duty = min(self.max_duty_hours, remaining_duty)
-            weekly_remaining = self.max_weekly_hours - cycle_hours_used
-            available_duty = min(available_duty, weekly_remaining)
-
-            if available_duty <= 0:
-                log_entry["activities"].append(
-                    {
-                        "start_time": current_time.strftime("%H:%M"),
-                        "end_time": (current_time + timedelta(hours=34)).strftime(
-                            "%H:%M"
-                        ),
-                        "status": "off_duty",
-                        "duration": 34.0,
-                        "location": "Rest Area",
-                        "description": "34-hour restart required",
-                    }
-                )
-                log_entry["daily_totals"]["off_duty"] = 34.0
-                logs.append(log_entry)
-
-                if len(logs) >= 2:
-                    cycle_hours_used = 0
-
-                current_time += timedelta(days=1)
-                day_number += 1
-                continue
-
-            current_activity_time = current_time
-            daily_driving = 0
-            daily_duty = 0
-            continuous_driving = 0
-
-            if day_number == 1:
-                log_entry["activities"].append(
-                    {
-                        "start_time": current_activity_time.strftime("%H:%M"),
-                        "end_time": (
-                            current_activity_time + timedelta(minutes=15)
-                        ).strftime("%H:%M"),
-                        "status": "on_duty_not_driving",
-                        "duration": 0.25,
-                        "location": (
-                            current_time.strftime("%Y-%m-%d")
-                            if day_number == 1
-                            else "Truck Stop"
-                        ),
-                        "description": "Pre-trip inspection",
-                    }
-                )
-                current_activity_time += timedelta(minutes=15)
-                daily_duty += 0.25
-
-            while (
-                remaining_driving > 0
-                and daily_driving < available_driving
-                and daily_duty < available_duty
-                and continuous_driving < self.required_rest_break_after
-            ):
-
-                drive_segment = min(
-                    remaining_driving,
-                    available_driving - daily_driving,
-                    available_duty - daily_duty,
-                    self.required_rest_break_after - continuous_driving,
-                    4.0,
-                )
-
-                if drive_segment <= 0:
-                    break
-
-                end_time = current_activity_time + timedelta(hours=drive_segment)
-                log_entry["activities"].append(
-                    {
-                        "start_time": current_activity_time.strftime("%H:%M"),
-                        "end_time": end_time.strftime("%H:%M"),
-                        "status": "driving",
-                        "duration": drive_segment,
-                        "location": "En Route",
-                        "description": f'Driving - Segment {len([a for a in log_entry["activities"] if a["status"] == "driving"]) + 1}',
-                    }
-                )
+        """
+        Generate detailed ELD logs
+
+        Fueling happens at the given driving hours when ``fuel_stop_hours``
+        is set, otherwise after every fourth hour of driving in a day while
+        ``fuel_stops`` remain. Logs start on the date of ``departure``
+        (default: today at ``DEFAULT_DEPARTURE_HOUR``) and each duty day at
+        its time of day. HOS violations found in the simulated timeline are
+        listed on the log of the day they occur.
+
+        The simulated schedule and its violations are memoized on the
+        quantized inputs, without dates, and dated for each call.
+        """
+        departure = departure or self._parse_departure({})
+        start_date = departure.date()
+        inputs = self._schedule_inputs(
+            driving_time,
+            total_duty_time,
+            current_cycle,
+            pickup_time,
+            delivery_time,
+            fuel_stops,
+            fuel_stop_hours,
+            day_start=departure.hour * 60 + departure.minute,
+        )
 
-                current_activity_time = end_time
-                daily_driving += drive_segment
-                daily_duty += drive_segment
-                remaining_driving -= drive_segment
-                remaining_duty -= drive_segment
-                continuous_driving += drive_segment
-
-                if (
-                    continuous_driving >= self.required_rest_break_after
-                    and remaining_driving > 0
-                ):
-                    break_end = current_activity_time + timedelta(minutes=30)
-                    log_entry["activities"].append(
-                        {
-                            "start_time": current_activity_time.strftime("%H:%M"),
-                            "end_time": break_end.strftime("%H:%M"),
-                            "status": "off_duty",
-                            "duration": 0.5,
-                            "location": "Rest Area",
-                            "description": "30-minute rest break (required after 8 hours driving)",
-                        }
-                    )
-                    current_activity_time = break_end
-                    continuous_driving = 0
-
-                if fuel_stops > 0 and daily_driving > 0 and daily_driving % 4 == 0:
-                    fuel_end = current_activity_time + timedelta(minutes=30)
-                    log_entry["activities"].append(
-                        {
-                            "start_time": current_activity_time.strftime("%H:%M"),
-                            "end_time": fuel_end.strftime("%H:%M"),
-                            "status": "on_duty_not_driving",
-                            "duration": 0.5,
-                            "location": "Fuel Station",
-                            "description": "Fueling",
-                        }
-                    )
-                    current_activity_time = fuel_end
-                    daily_duty += 0.5
-                    remaining_duty -= 0.5
-                    fuel_stops -= 1
-
-            if day_number == 1 and pickup_time > 0:
-                pickup_end = current_activity_time + timedelta(hours=pickup_time)
-                log_entry["activities"].append(
-                    {
-                        "start_time": current_activity_time.strftime("%H:%M"),
-                        "end_time": pickup_end.strftime("%H:%M"),
-                        "status": "on_duty_not_driving",
-                        "duration": pickup_time,
-                        "location": "Pickup Location",
-                        "description": "Loading/Pickup",
-                    }
-                )
-                current_activity_time = pickup_end
-                daily_duty += pickup_time
-                remaining_duty -= pickup_time
-                pickup_time = 0
-
-            if remaining_driving <= 0 and delivery_time > 0:
-                delivery_end = current_activity_time + timedelta(hours=delivery_time)
-                log_entry["activities"].append(
-                    {
-                        "start_time": current_activity_time.strftime("%H:%M"),
-                        "end_time": delivery_end.strftime("%H:%M"),
-                        "status": "on_duty_not_driving",
-                        "duration": delivery_time,
-                        "location": "Delivery Location",
-                        "description": "Unloading/Delivery",
-                    }
-                )
-                current_activity_time = delivery_end
-                daily_duty += delivery_time
-                remaining_duty -= delivery_time
-                delivery_time = 0
-
-            hours_in_day = 24
-            total_logged_hours = sum(
-                activity["duration"] for activity in log_entry["activities"]
+        cache = get_schedule_cache()
+        schedule = cache.get(inputs) if use_cache else MISSING
+        if schedule is MISSING:
+            days = self._run_schedule(inputs)
+            schedule = (days, find_violations(days, inputs[2]))
+            if use_cache:
+                metrics.incr("hos_schedule.miss")
+                cache.set(inputs, schedule, ttl=math.inf)
+        else:
+            metrics.incr("hos_schedule.hit")
+
+        days, violations = schedule
+        return self._dated_logs(days, violations, start_date)
+
+    def _dated_logs(self, days, violations, start_date):
+        """
+        Serialize simulated days for a trip whose first log day is
+        ``start_date``, listing each violation on the log of its day
+        """
+        logs = [day.as_dict(start_date) for day in days]
+        if not logs:
+            return logs
+
+        first_day = days[0].day_number
+        for violation in violations:
+            day_number = violation["day_number"]
+            # Driving past midnight after the last log day belongs to it
+            logs[min(day_number - first_day, len(logs) - 1)]["violations"].append(
+                {
+                    "type": violation["type"],
+                    "description": violation["description"],
+                    "severity": violation["severity"],
+                    "date": (start_date + timedelta(days=day_number - 1)).isoformat(),
+                }
             )
-            off_duty_hours = hours_in_day - total_logged_hours
-
-            if off_duty_hours > 0:
-                log_entry["activities"].append(
-                    {
-                        "start_time": current_activity_time.strftime("%H:%M"),
-                        "end_time": current_activity_time.replace(
-                            hour=23, minute=59
-                        ).strftime("%H:%M"),
-                        "status": (
-                            "sleeper_berth" if off_duty_hours >= 10 else "off_duty"
-                        ),
-                        "duration": off_duty_hours,
-                        "location": (
-                            "Truck Stop" if off_duty_hours >= 10 else "Rest Area"
-                        ),
-                        "description": f'{"Required 10-hour rest" if off_duty_hours >= 10 else "Off duty"}',
-                    }
-                )
-
-            for activity in log_entry["activities"]:
-                status = activity["status"]
-                duration = activity["duration"]
-                if status in log_entry["daily_totals"]:
-                    log_entry["daily_totals"][status] += duration
+        return logs
 
-            cycle_hours_used += daily_duty
+    def _schedule_inputs(
+        self,
+        driving_time,
+        total_duty_time,
+        current_cycle,
+        pickup_time,
+        delivery_time,
+        fuel_stops,
+        fuel_stop_hours=None,
+        day_start=DEFAULT_DEPARTURE_HOUR * 60,
+    ):
+        """
+        Simulator inputs from hour inputs, in minutes rounded to
+        ``HOS_SCHEDULE_QUANTUM_MINUTES``; also the schedule cache key
+        """
+        quantum = settings.HOS_SCHEDULE_QUANTUM_MINUTES
+
+        def quantize(hours):
+            return quantum * round(hours * 60 / quantum)
+
+        return (
+            quantize(driving_time),
+            quantize(total_duty_time),
+            quantize(current_cycle),
+            quantize(pickup_time),
+            quantize(delivery_time),
+            fuel_stops,
+            (
+                None
+                if fuel_stop_hours is None
+                else tuple(quantize(hours) for hours in fuel_stop_hours)
+            ),
+            quantum * round(day_start / quantum),
+        )
 
-            logs.append(log_entry)
-            current_time += timedelta(days=1)
-            day_number += 1
+    def _simulate(
+        self,
+        driving_time,
+        total_duty_time,
+        current_cycle,
+        pickup_time,
+        delivery_time,
+        fuel_stops,
+        fuel_stop_hours=None,
+        day_start=DEFAULT_DEPARTURE_HOUR * 60,
+    ):
+        """Run the HOS simulation on hour inputs; returns ``DayLog`` records"""
+        return self._run_schedule(
+            self._schedule_inputs(
+                driving_time,
+                total_duty_time,
+                current_cycle,
+                pickup_time,
+                delivery_time,
+                fuel_stops,
+                fuel_stop_hours,
+                day_start=day_start,
+            )
+        )
 
-        return logs
+    def _run_schedule(self, inputs, resume=None):
+        """
+        Run the HOS simulation on ``_schedule_inputs``, continuing the
+        ``resume`` log day when given (see ``HOSSimulator.run``)
+        """
+        (
+            driving,
+            duty,
+            cycle_used,
+            pickup,
+            delivery,
+            fuel_stops,
+            fuel_stop_minutes,
+            day_start,
+        ) = inputs
+        simulator = HOSSimulator(
+            max_driving=to_minutes(self.max_driving_hours),
+            max_duty=to_minutes(self.max_duty_hours),
+            max_cycle=to_minutes(self.max_weekly_hours),
+            break_after=to_minutes(self.required_rest_break_after),
+            break_minutes=to_minutes(self.required_rest_break_duration),
+            day_start=day_start,
+        )
+        return simulator.run(
+            driving,
+            duty,
+            cycle_used,
+            pickup,
+            delivery,
+            fuel_stops,
+            fuel_stop_minutes=fuel_stop_minutes,
+            resume=resume,
+        )
 
 
 class ELDLogRenderer:
@@ -548,7 +1051,7 @@ class ELDLogRenderer:
             "date": log_entry["date"],
             "driver_name": "Driver Name",
             "carrier_name": "Carrier Name",
-            "truck_number": "Truck
+            "truck_number": "Truck Number",
             "activities": [],
             "totals": log_entry["daily_totals"],
             "grid_segments": [],
@@ -575,5 +1078,8 @@ class ELDLogRenderer:
 
     def _time_to_minutes(self, time_str):
         """Convert HH:MM to minutes since midnight"""
-        hours, minutes = map(int, time_str.split(":"))
-        return hours * 60 + minutes
+        minutes = MINUTES_BY_CLOCK.get(time_str)
+        if minutes is None:
+            hours, minutes = map(int, time_str.split(":"))
+            minutes += hours * 60
+        return minutes
@@ -2,7 +2,7 @@ from django.test import TestCase, override_settings
 from django.urls import reverse
 from rest_framework.test import APIClient
 from .models import TripPlan, HOSViolation
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 import logging
 import io
 
@@ -108,7 +108,7 @@ class ServiceLoggingTestCase(TestCase):
     def tearDown(self):
         self.logger.removeHandler(self.handler)
 
-    @patch("route_planner.services.requests.get")
+    @patch("route_planner.providers.http_client.get")
     def test_geocode_logging(self, mock_get):
         """Test that geocoding logs errors properly"""
         from .services import RouteService
@@ -122,7 +122,7 @@ class ServiceLoggingTestCase(TestCase):
         log_contents = self.log_stream.getvalue()
         self.assertIn("Geocoding error: Test geocoding error", log_contents)
 
-    @patch("route_planner.services.requests.post")
+    @patch("route_planner.providers.http_client.post")
     def test_route_logging(self, mock_post):
         """Test that route calculation logs errors properly"""
         from .services import RouteService
@@ -135,3 +135,2312 @@ class ServiceLoggingTestCase(TestCase):
         self.assertIsNone(result)
         log_contents = self.log_stream.getvalue()
         self.assertIn("Route error: Test route error", log_contents)
+
+
+class GeocodeCacheTestCase(TestCase):
+    def setUp(self):
+        from . import metrics
+        from .cache import get_geocode_cache
+
+        metrics.reset()
+        get_geocode_cache().clear_local()
+
+    def _response(self, features):
+        response = MagicMock()
+        response.status_code = 200
+        response.json.return_value = {"features": features}
+        return response
+
+    @patch("route_planner.providers.http_client.get")
+    def test_repeat_lookup_served_from_cache(self, mock_get):
+        """Equivalent addresses only reach the geocoding API once"""
+        from .services import RouteService
+        from .cache import get_geocode_cache, geocode_cache_stats
+
+        mock_get.return_value = self._response(
+            [{"geometry": {"coordinates": [-87.6298, 41.8781]}}]
+        )
+
+        service = RouteService()
+        self.assertEqual(service.geocode_location("Chicago, IL"), [41.8781, -87.6298])
+        self.assertEqual(
+            service.geocode_location("  chicago ,IL "), [41.8781, -87.6298]
+        )
+
+        get_geocode_cache().clear_local()
+        self.assertEqual(service.geocode_location("CHICAGO, IL"), [41.8781, -87.6298])
+
+        self.assertEqual(mock_get.call_count, 1)
+        stats = geocode_cache_stats()
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["lru_hits"], 1)
+        self.assertEqual(stats["db_hits"], 1)
+
+    def test_hit_count_failure_still_returns_cached_coords(self):
+        from django.db import DatabaseError
+        from django.db.models import QuerySet
+        from .cache import get_geocode_cache
+
+        cache = get_geocode_cache()
+        cache.set("Denver, CO", [39.74, -104.99])
+        cache.clear_local()
+
+        with patch.object(QuerySet, "update", side_effect=DatabaseError("locked")):
+            self.assertEqual(cache.get("Denver, CO"), (True, [39.74, -104.99]))
+
+    @patch("route_planner.providers.http_client.get")
+    def test_unknown_address_is_negatively_cached(self, mock_get):
+        from .services import RouteService
+        from .models import GeocodeCacheEntry
+
+        mock_get.return_value = self._response([])
+
+        service = RouteService()
+        self.assertIsNone(service.geocode_location("Nowhere Town"))
+        self.assertIsNone(service.geocode_location("Nowhere Town"))
+
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertFalse(GeocodeCacheEntry.objects.get(key="nowhere town").found)
+
+    @patch("route_planner.providers.http_client.get")
+    def test_transport_errors_are_not_cached(self, mock_get):
+        from .services import RouteService
+        from .models import GeocodeCacheEntry
+
+        mock_get.side_effect = Exception("connection reset")
+
+        service = RouteService()
+        self.assertIsNone(service.geocode_location("Denver, CO"))
+        self.assertIsNone(service.geocode_location("Denver, CO"))
+
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertFalse(GeocodeCacheEntry.objects.exists())
+
+
+class RouteCacheTestCase(TestCase):
+    def setUp(self):
+        from . import metrics
+        from .cache import get_route_cache
+
+        metrics.reset()
+        get_route_cache().clear_local()
+
+        self.route_data = {
+            "routes": [
+                {
+                    "summary": {"distance": 120.5, "duration": 7200},
+                    "geometry": "abc",
+                }
+            ]
+        }
+        response = MagicMock()
+        response.status_code = 200
+        response.json.return_value = self.route_data
+        self.response = response
+
+    @patch("route_planner.providers.http_client.post")
+    def test_repeat_lane_served_from_cache(self, mock_post):
+        """Coordinates within the quantization step share one cache entry"""
+        from .services import RouteService
+        from .cache import get_route_cache
+
+        mock_post.return_value = self.response
+        service = RouteService()
+
+        self.assertEqual(
+            service.get_route([41.0, -87.0], [40.0, -86.0]), self.route_data
+        )
+        get_route_cache().clear_local()
+        self.assertEqual(
+            service.get_route([41.000001, -87.000001], [40.0, -86.0]), self.route_data
+        )
+        self.assertEqual(mock_post.call_count, 1)
+
+    @patch("route_planner.providers.http_client.post")
+    def test_refresh_and_bypass_modes(self, mock_post):
+        from .services import RouteService
+        from .models import RouteCacheEntry
+
+        mock_post.return_value = self.response
+
+        RouteService(route_cache_mode="bypass").get_route([41.0, -87.0], [40.0, -86.0])
+        self.assertFalse(RouteCacheEntry.objects.exists())
+
+        service = RouteService()
+        service.get_route([41.0, -87.0], [40.0, -86.0])
+        service.get_route([41.0, -87.0], [40.0, -86.0], cache_mode="refresh")
+        service.get_route([41.0, -87.0], [40.0, -86.0])
+        self.assertEqual(mock_post.call_count, 3)
+        self.assertEqual(RouteCacheEntry.objects.count(), 1)
+
+    def test_eviction_keeps_table_under_budget(self):
+        from .cache import RouteCache
+        from .models import RouteCacheEntry
+
+        cache = RouteCache(max_bytes=600, evict_every=5)
+        with patch.object(cache, "evict", wraps=cache.evict) as mock_evict:
+            for i in range(10):
+                cache.set(f"{i:064d}", {"routes": [{"padding": "x" * 100}]})
+
+        self.assertEqual(mock_evict.call_count, 2)
+        total = sum(RouteCacheEntry.objects.values_list("size_bytes", flat=True))
+        self.assertLessEqual(total, 600)
+        self.assertTrue(RouteCacheEntry.objects.filter(key=f"{9:064d}").exists())
+        self.assertFalse(RouteCacheEntry.objects.filter(key=f"{0:064d}").exists())
+
+
+class HttpClientTestCase(TestCase):
+    def tearDown(self):
+        from . import http_client
+
+        http_client.close_session()
+
+    @override_settings(HTTP_POOL_MAXSIZE=7, HTTP_MAX_RETRIES=2)
+    def test_session_is_pooled_and_retries(self):
+        from . import http_client
+
+        http_client.close_session()
+        session = http_client.get_session()
+        self.assertIs(session, http_client.get_session())
+
+        adapter = session.get_adapter("https://api.openrouteservice.org")
+        self.assertEqual(adapter._pool_maxsize, 7)
+        self.assertTrue(adapter._pool_block)
+        self.assertEqual(adapter.max_retries.total, 2)
+        self.assertIn(429, adapter.max_retries.status_forcelist)
+        self.assertIn("POST", adapter.max_retries.allowed_methods)
+
+    @override_settings(HTTP_RETRY_AFTER_MAX=5)
+    def test_retry_after_is_capped(self):
+        from .http_client import CappedRetry
+
+        response = MagicMock()
+        response.headers = {"Retry-After": "600"}
+        self.assertEqual(CappedRetry().get_retry_after(response), 5)
+
+    def test_read_errors_are_not_retried_on_post(self):
+        from urllib3.exceptions import ReadTimeoutError
+
+        from .http_client import CappedRetry
+
+        error = ReadTimeoutError(None, "/v2/directions", "Read timed out.")
+        retry = CappedRetry(total=3, read=3, allowed_methods=["GET", "POST"])
+        with self.assertRaises(ReadTimeoutError):
+            retry.increment("POST", "/v2/directions", error=error)
+        self.assertEqual(retry.increment("GET", "/geocode", error=error).read, 2)
+
+    def test_async_read_timeouts_are_not_retried_on_post(self):
+        import asyncio
+
+        import httpx
+
+        from . import http_client
+
+        client = MagicMock()
+
+        async def timeout(*args, **kwargs):
+            raise httpx.ReadTimeout("Read timed out.")
+
+        client.request.side_effect = timeout
+        with patch.object(http_client, "get_async_client", return_value=client):
+            with self.assertRaises(httpx.ReadTimeout):
+                asyncio.run(http_client.async_post("https://example.com", json={}))
+        self.assertEqual(client.request.call_count, 1)
+
+    @override_settings(HTTP_CONNECT_TIMEOUT=1.5, HTTP_READ_TIMEOUT=9)
+    def test_requests_always_carry_a_timeout(self):
+        from . import http_client
+
+        with patch.object(http_client, "get_session") as mock_session:
+            http_client.post("https://overpass-api.de/api/interpreter", data={})
+            http_client.get("https://example.com", timeout=2)
+
+        calls = mock_session.return_value.request.call_args_list
+        self.assertEqual(calls[0].kwargs["timeout"], (1.5, 9))
+        self.assertEqual(calls[1].kwargs["timeout"], 2)
+
+
+class ConcurrentPlanningTestCase(TestCase):
+    def setUp(self):
+        from .cache import get_geocode_cache, get_route_cache
+
+        get_geocode_cache().clear_local()
+        get_route_cache().clear_local()
+
+    def test_geocode_misses_are_fetched_concurrently(self):
+        """Distinct cache misses are requested in parallel, results keep order"""
+        import threading
+        from .services import RouteService
+
+        barrier = threading.Barrier(3, timeout=5)
+        coords = {"A": [1.0, 1.0], "B": [2.0, 2.0], "C": [3.0, 3.0]}
+
+        def fake_request(location):
+            barrier.wait()
+            return coords[location], True
+
+        service = RouteService()
+        with patch.object(service, "_request_geocode", side_effect=fake_request):
+            result = service.geocode_locations(["C", "A", "B", "A"])
+
+        self.assertEqual(result, [[3.0, 3.0], [1.0, 1.0], [2.0, 2.0], [1.0, 1.0]])
+
+    def test_geocode_failures_reported_through_missing_locations(self):
+        from .services import HOSCalculator, RouteService
+
+        def fake_request(self, location):
+            if location == "Atlantis":
+                return None, True
+            return [40.0, -90.0], True
+
+        with patch.object(RouteService, "_request_geocode", fake_request):
+            with self.assertRaisesMessage(
+                ValueError, "Failed to geocode: pickup location 'Atlantis'"
+            ):
+                HOSCalculator().calculate_eld_logs(
+                    {
+                        "current_location": "Chicago, IL",
+                        "pickup_location": "Atlantis",
+                        "dropoff_location": "Dallas, TX",
+                        "current_cycle_hours": 0,
+                    }
+                )
+
+
+class MultiWaypointRouteTestCase(TestCase):
+    def _route_response(self, geometry):
+        return {
+            "routes": [
+                {
+                    "summary": {"distance": 300.0, "duration": 18000},
+                    "segments": [
+                        {"distance": 100.0, "duration": 6000, "steps": []},
+                        {"distance": 200.0, "duration": 12000, "steps": []},
+                    ],
+                    "geometry": geometry,
+                    "way_points": [0, 2, 4],
+                }
+            ],
+            "metadata": {"service": "routing"},
+        }
+
+    def test_polyline_round_trip(self):
+        from . import polyline
+
+        points = [[38.5, -120.2], [40.7, -120.95], [43.252, -126.453]]
+        encoded = polyline.encode(points)
+        self.assertEqual(encoded, "_p~iF~ps|U_ulLnnqC_mqNvxq`@")
+        self.assertEqual(polyline.decode(encoded), points)
+
+    def test_split_route_legs(self):
+        from . import polyline
+        from .utils import extract_route_coordinates, split_route_legs
+
+        points = [
+            [41.0, -87.0],
+            [40.5, -87.5],
+            [40.0, -88.0],
+            [39.5, -88.5],
+            [39.0, -89.0],
+        ]
+        for geometry in (
+            polyline.encode(points),
+            {"type": "LineString", "coordinates": [[lng, lat] for lat, lng in points]},
+        ):
+            to_pickup, to_delivery = split_route_legs(self._route_response(geometry))
+
+            self.assertEqual(to_pickup["routes"][0]["summary"]["distance"], 100.0)
+            self.assertEqual(to_delivery["routes"][0]["summary"]["duration"], 12000)
+            self.assertEqual(to_delivery["routes"][0]["way_points"], [0, 2])
+            if isinstance(geometry, dict):
+                coordinates = extract_route_coordinates(
+                    {"to_pickup": to_pickup, "to_delivery": to_delivery}
+                )
+                self.assertEqual(coordinates, points[:3] + points[2:])
+            else:
+                self.assertEqual(
+                    polyline.decode(to_delivery["routes"][0]["geometry"]), points[2:]
+                )
+
+    @override_settings(ROUTE_SINGLE_REQUEST=True)
+    @patch("route_planner.services.find_gas_stations_along_route", return_value=[])
+    def test_trip_uses_one_routing_request(self, _mock_stations):
+        from .services import HOSCalculator, RouteService
+
+        geometry = {
+            "type": "LineString",
+            "coordinates": [[-87, 41], [-88, 40], [-89, 39], [-90, 38], [-91, 37]],
+        }
+        with patch.object(
+            RouteService,
+            "geocode_locations",
+            return_value=[[41, -87], [39, -89], [37, -91]],
+        ), patch.object(
+            RouteService, "get_route", return_value=self._route_response(geometry)
+        ) as mock_route:
+            result = HOSCalculator().calculate_eld_logs(
+                {
+                    "current_location": "A",
+                    "pickup_location": "B",
+                    "dropoff_location": "C",
+                    "current_cycle_hours": 0,
+                }
+            )
+
+        mock_route.assert_called_once_with([41, -87], [37, -91], waypoints=[[39, -89]])
+        self.assertEqual(result["total_distance"], 300.0)
+        self.assertEqual(result["total_duration"], 5.0)
+        self.assertIn("to_pickup", result["route_geometry"])
+        self.assertIn("to_delivery", result["route_geometry"])
+
+
+class AsyncPlanningTestCase(TestCase):
+    def setUp(self):
+        from .cache import get_geocode_cache, get_route_cache
+
+        get_geocode_cache().clear_local()
+        get_route_cache().clear_local()
+
+    def _geocode_response(self, lng, lat):
+        response = MagicMock()
+        response.status_code = 200
+        response.json.return_value = {
+            "features": [{"geometry": {"coordinates": [lng, lat]}}]
+        }
+        return response
+
+    async def test_async_geocoding_runs_concurrently(self):
+        import asyncio
+        from .async_services import AsyncRouteService
+
+        in_flight = 0
+        peak = 0
+
+        async def fake_get(url, params=None, **kwargs):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return self._geocode_response(-87.0, float(len(params["text"])))
+
+        with patch("route_planner.providers.http_client.async_get", fake_get):
+            service = AsyncRouteService()
+            coords = await service.geocode_locations(["A", "BB", "CCC"])
+            cached = await service.geocode_location("BB")
+
+        self.assertEqual(coords, [[1.0, -87.0], [2.0, -87.0], [3.0, -87.0]])
+        self.assertEqual(cached, [2.0, -87.0])
+        self.assertEqual(peak, 3)
+
+    def test_plan_trip_async_endpoint(self):
+        from rest_framework_simplejwt.tokens import RefreshToken
+        from users.models import TruckUser
+
+        user = TruckUser.objects.create_user(username="driver", password="pw12345!")
+        token = str(RefreshToken.for_user(user).access_token)
+
+        trip_result = {
+            "total_distance": 120.0,
+            "total_duration": 2.0,
+            "route_geometry": {"to_pickup": {}, "to_delivery": {}},
+            "eld_logs": [],
+            "fuel_stops_required": 0,
+            "fuel_stops": [],
+        }
+
+        async def fake_calculate(self, data):
+            return trip_result
+
+        payload = {
+            "current_location": "Chicago, IL",
+            "pickup_location": "Joliet, IL",
+            "dropoff_location": "Peoria, IL",
+            "current_cycle_hours": 5,
+        }
+        with patch(
+            "route_planner.views.AsyncHOSCalculator.calculate_eld_logs",
+            fake_calculate,
+        ):
+            unauthenticated = self.client.post(
+                reverse("plan_trip_async"), payload, content_type="application/json"
+            )
+            response = self.client.post(
+                reverse("plan_trip_async"),
+                payload,
+                content_type="application/json",
+                HTTP_AUTHORIZATION=f"Bearer {token}",
+            )
+
+        self.assertEqual(unauthenticated.status_code, 401)
+        self.assertEqual(response.status_code, 201)
+        trip = TripPlan.objects.get(pk=response.json()["id"])
+        self.assertEqual(trip.user, user)
+        self.assertEqual(trip.total_distance, 120.0)
+
+
+class CoalesceTestCase(TestCase):
+    def setUp(self):
+        import tempfile
+        from . import metrics
+        from .cache import get_geocode_cache
+
+        metrics.reset()
+        get_geocode_cache().clear_local()
+        lock_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(lock_dir.cleanup)
+        settings_override = override_settings(COALESCE_LOCK_DIR=lock_dir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    @patch("route_planner.providers.http_client.get")
+    def test_follower_reuses_in_flight_geocode(self, mock_get):
+        """A caller that waited on an in-flight lookup is served from cache"""
+        import threading
+        import time
+        from . import metrics
+        from .cache import get_geocode_cache, normalize_address
+        from .coalesce import coalesce
+        from .services import RouteService
+
+        key = normalize_address("Chicago, IL")
+        entered = threading.Event()
+
+        def leader():
+            with coalesce(f"geocode:{key}"):
+                entered.set()
+                time.sleep(0.2)
+                get_geocode_cache().local.set(key, [41.8781, -87.6298], 60)
+
+        thread = threading.Thread(target=leader)
+        thread.start()
+        entered.wait()
+        coords = RouteService().geocode_location("Chicago, IL")
+        thread.join()
+
+        self.assertEqual(coords, [41.8781, -87.6298])
+        mock_get.assert_not_called()
+        self.assertEqual(metrics.get("geocode.coalesced"), 1)
+        self.assertEqual(metrics.get("coalesce.waited"), 1)
+
+    @override_settings(COALESCE_LOCK_TIMEOUT=0.2)
+    def test_lock_held_by_another_worker_times_out(self):
+        """A flock held elsewhere is waited on, but never past the timeout"""
+        import fcntl
+        import os
+        from . import metrics
+        from .coalesce import _lock_path, coalesce
+
+        fd = os.open(_lock_path("route:abc"), os.O_CREAT | os.O_RDWR)
+        self.addCleanup(os.close, fd)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+
+        with coalesce("route:abc") as waited:
+            self.assertTrue(waited)
+        self.assertEqual(metrics.get("coalesce.timeout"), 1)
+
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        with coalesce("route:abc") as waited:
+            self.assertFalse(waited)
+
+
+class CircuitBreakerTestCase(TestCase):
+    def setUp(self):
+        from . import metrics
+        from .cache import get_geocode_cache, get_route_cache
+        from .circuit import reset_breakers
+
+        metrics.reset()
+        reset_breakers()
+        self.addCleanup(reset_breakers)
+        get_geocode_cache().clear_local()
+        get_route_cache().clear_local()
+
+    @override_settings(CIRCUIT_FAILURE_THRESHOLD=2, CIRCUIT_RESET_TIMEOUT=60)
+    def test_breaker_opens_and_probes_after_reset_timeout(self):
+        from .circuit import CLOSED, OPEN, CircuitBreaker
+
+        breaker = CircuitBreaker("test", slow_call_seconds=1.0)
+        self.assertTrue(breaker.allow())
+        breaker.record(False)
+        self.assertTrue(breaker.allow())
+        breaker.record(True, elapsed=5.0)  # slow calls count as failures
+        self.assertEqual(breaker.state, OPEN)
+        self.assertFalse(breaker.allow())
+
+        breaker.reset_timeout = 0
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())  # only one probe at a time
+        breaker.record(True, elapsed=0.1)
+        self.assertEqual(breaker.state, CLOSED)
+
+    @override_settings(CIRCUIT_FAILURE_THRESHOLD=2)
+    @patch("route_planner.providers.http_client.post")
+    def test_open_circuit_fails_fast(self, mock_post):
+        """Once ORS keeps failing, routing stops calling it"""
+        from .circuit import OPEN, get_breaker
+        from .services import RouteService
+
+        mock_post.return_value = MagicMock(status_code=503, text="unavailable")
+        service = RouteService(route_cache_mode="bypass")
+        for _ in range(3):
+            self.assertIsNone(service.get_route([41.0, -87.0], [42.0, -88.0]))
+
+        self.assertEqual(mock_post.call_count, 2)
+        self.assertEqual(get_breaker("ors").state, OPEN)
+
+    @patch("route_planner.services.run_in_background")
+    @patch("route_planner.providers.http_client.post")
+    def test_expired_route_served_stale_and_refreshed(self, mock_post, mock_refresh):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .cache import get_route_cache
+        from .models import RouteCacheEntry
+        from .services import RouteService
+
+        service = RouteService()
+        route_cache = get_route_cache()
+        data = service._build_route_request([41.0, -87.0], [42.0, -88.0])
+        cache_key = route_cache.make_key(service.routing_profile, data)
+        route_cache.set(cache_key, {"routes": [{"summary": {"distance": 90}}]})
+        RouteCacheEntry.objects.filter(key=cache_key).update(
+            expires_at=timezone.now() - timedelta(hours=1)
+        )
+        route_cache.clear_local()
+
+        mock_post.side_effect = ConnectionError("ORS down")
+        route = service.get_route([41.0, -87.0], [42.0, -88.0])
+
+        self.assertEqual(route["routes"][0]["summary"]["distance"], 90)
+        self.assertEqual(service.stale_sources, {"route"})
+        mock_refresh.assert_called_once()
+        self.assertEqual(mock_refresh.call_args[0][0], f"route:{cache_key}")
+
+
+class ProviderTestCase(TestCase):
+    def setUp(self):
+        import tempfile
+        from .cache import get_geocode_cache, get_route_cache
+        from .providers import FixtureStore
+
+        get_geocode_cache().clear_local()
+        get_route_cache().clear_local()
+        fixture_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(fixture_dir.cleanup)
+        self.store = FixtureStore(fixture_dir.name)
+
+    @patch("route_planner.providers.http_client.post")
+    @patch("route_planner.providers.http_client.get")
+    def test_recorded_responses_replay_offline(self, mock_get, mock_post):
+        """Responses captured in record mode are served back by replay mode"""
+        import json
+        from .cache import get_geocode_cache
+        from .providers import LiveProvider, RecordingProvider, ReplayProvider
+        from .services import RouteService
+
+        features = {"features": [{"geometry": {"coordinates": [-87.63, 41.88]}}]}
+        route = {"routes": [{"summary": {"distance": 140.0, "duration": 9000}}]}
+        mock_get.return_value = MagicMock(
+            status_code=200, text=json.dumps(features), headers={}
+        )
+        mock_get.return_value.json.return_value = features
+        mock_post.return_value = MagicMock(
+            status_code=200, text=json.dumps(route), headers={}
+        )
+        mock_post.return_value.json.return_value = route
+
+        recorder = RouteService(
+            route_cache_mode="bypass",
+            provider=RecordingProvider(LiveProvider(api_key="secret"), self.store),
+        )
+        self.assertEqual(recorder.geocode_location("Chicago, IL"), [41.88, -87.63])
+        self.assertEqual(recorder.get_route([41.88, -87.63], [40.69, -89.59]), route)
+
+        get_geocode_cache().invalidate("Chicago, IL")
+        mock_get.reset_mock()
+        mock_post.reset_mock()
+
+        replayer = RouteService(
+            route_cache_mode="bypass", provider=ReplayProvider(self.store)
+        )
+        self.assertEqual(replayer.geocode_location("Chicago, IL"), [41.88, -87.63])
+        self.assertEqual(replayer.get_route([41.88, -87.63], [40.69, -89.59]), route)
+        mock_get.assert_not_called()
+        mock_post.assert_not_called()
+
+    def test_replay_latency_and_missing_fixture(self):
+        import time
+        from .providers import FixtureResponse, MissingFixtureError, ReplayProvider
+
+        self.store.save("overpass", {"query": "q"}, FixtureResponse(200, "[]"))
+        provider = ReplayProvider(self.store, latency_ms=50)
+
+        started = time.monotonic()
+        self.assertEqual(provider.overpass("q").json(), [])
+        self.assertGreaterEqual(time.monotonic() - started, 0.05)
+        with self.assertRaises(MissingFixtureError):
+            provider.overpass("unrecorded")
+
+    def test_incomplete_provider_fails_on_construction(self):
+        from .providers import Provider
+
+        class GeocodeOnly(Provider):
+            def geocode(self, text):
+                return None
+
+        with self.assertRaisesMessage(TypeError, "directions"):
+            GeocodeOnly()
+
+
+class EncodedGeometryTestCase(TestCase):
+    def test_geojson_routes_are_stored_encoded(self):
+        from . import polyline
+        from .utils import encode_route_geometry
+
+        coordinates = [[-87.6298, 41.8781], [-88.0817, 41.5250], [-89.5890, 40.6936]]
+        route_data = {
+            "routes": [{"geometry": {"type": "LineString", "coordinates": coordinates}}]
+        }
+        encode_route_geometry(route_data)
+
+        encoded = route_data["routes"][0]["geometry"]
+        self.assertIsInstance(encoded, str)
+        self.assertEqual(
+            polyline.decode(encoded), [[lat, lng] for lng, lat in coordinates]
+        )
+
+    def test_fuel_stop_positions_decode_encoded_legs(self):
+        from . import polyline
+        from .utils import extract_route_coordinates, route_stop_positions
+
+        to_pickup = [[41.0, -87.0], [41.1, -87.1], [41.2, -87.2]]
+        to_delivery = [[41.2, -87.2], [41.3, -87.3], [41.4, -87.4]]
+        route_geometry = {
+            "to_pickup": {"routes": [{"geometry": polyline.encode(to_pickup)}]},
+            "to_delivery": {"routes": [{"geometry": polyline.encode(to_delivery)}]},
+        }
+
+        coordinates = extract_route_coordinates(route_geometry)
+        self.assertEqual(
+            [list(point) for point in coordinates], to_pickup + to_delivery
+        )
+        self.assertEqual(
+            list(route_stop_positions(route_geometry, 1)[0]), [41.2, -87.2]
+        )
+
+
+class CompactRouteStorageTestCase(TestCase):
+    def _route_response(self):
+        return {
+            "bbox": [-88.0, 41.0, -87.0, 42.0],
+            "metadata": {"query": {"coordinates": [[-87.0, 41.0], [-88.0, 42.0]]}},
+            "routes": [
+                {
+                    "summary": {"distance": 90.5, "duration": 5400},
+                    "geometry": {
+                        "type": "LineString",
+                        "coordinates": [[-87.0, 41.0], [-87.5, 41.5], [-88.0, 42.0]],
+                    },
+                    "segments": [
+                        {
+                            "distance": 90.5,
+                            "duration": 5400,
+                            "steps": [
+                                {
+                                    "instruction": "Head north on I-55",
+                                    "name": "I-55",
+                                    "distance": 90.5,
+                                    "duration": 5400,
+                                    "type": 11,
+                                    "way_points": [0, 2],
+                                }
+                            ],
+                        }
+                    ],
+                    "way_points": [0, 2],
+                }
+            ],
+        }
+
+    def test_compact_route_keeps_geometry_and_summary(self):
+        from .utils import compact_route, leg_coordinates, route_instructions
+
+        leg = compact_route(self._route_response())
+
+        self.assertEqual(set(leg), {"geometry", "summary"})
+        self.assertEqual(leg["summary"], {"distance": 90.5, "duration": 5400})
+        self.assertEqual(
+            [list(point) for point in leg_coordinates(leg)],
+            [[41.0, -87.0], [41.5, -87.5], [42.0, -88.0]],
+        )
+        self.assertEqual(
+            route_instructions(self._route_response())[0]["instruction"],
+            "Head north on I-55",
+        )
+
+    def test_migration_rewrites_stored_responses(self):
+        import importlib
+        from django.apps import apps
+        from rest_framework_simplejwt.tokens import RefreshToken
+        from users.models import TruckUser
+        from .models import TripRouteInstructions
+
+        user = TruckUser.objects.create_user(username="driver", password="pw12345!")
+        trip = TripPlan.objects.create(
+            user=user,
+            current_location="Chicago, IL",
+            pickup_location="Joliet, IL",
+            dropoff_location="Peoria, IL",
+            route_geometry={
+                "to_pickup": self._route_response(),
+                "to_delivery": self._route_response(),
+            },
+        )
+
+        migration = importlib.import_module(
+            "route_planner.migrations.0007_compact_route_geometry"
+        )
+        migration.compact_route_geometry(apps, None)
+
+        trip.refresh_from_db()
+        self.assertEqual(set(trip.route_geometry["to_pickup"]), {"geometry", "summary"})
+        self.assertEqual(
+            TripRouteInstructions.objects.get(trip=trip).legs["to_delivery"][0]["name"],
+            "I-55",
+        )
+
+        client = APIClient()
+        token = str(RefreshToken.for_user(user).access_token)
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        response = client.get(reverse("trip-instructions", args=[trip.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["legs"]["to_pickup"]), 1)
+
+
+@override_settings(FUEL_TILE_CACHE_MAX_BYTES=0)
+class BatchedFuelStationTestCase(TestCase):
+    def setUp(self):
+        from .cache import reset_station_tile_cache
+        from .circuit import reset_breakers
+        from .fuel_stations import reset_station_index
+
+        reset_breakers()
+        reset_station_index()
+        reset_station_tile_cache()
+        self.addCleanup(reset_breakers)
+        self.addCleanup(reset_station_index)
+        self.addCleanup(reset_station_tile_cache)
+
+    @patch("route_planner.providers.http_client.post")
+    def test_one_union_query_for_all_stop_positions(self, mock_post):
+        from .utils import find_gas_stations_near_positions
+
+        def node(node_id, lat, lon, name):
+            return {
+                "type": "node",
+                "id": node_id,
+                "lat": lat,
+                "lon": lon,
+                "tags": {"amenity": "fuel", "name": name},
+            }
+
+        mock_post.return_value = MagicMock(status_code=200)
+        mock_post.return_value.json.return_value = {
+            "elements": [
+                node(1, 41.005, -87.0, "Far A"),
+                node(2, 41.001, -87.0, "Near A"),
+                node(3, 35.0, -101.0, "Only B"),
+            ]
+        }
+
+        positions = [(41.0, -87.0), (35.001, -101.0), (30.0, -95.0)]
+        results = find_gas_stations_near_positions(positions, radius_km=2.0)
+
+        self.assertEqual(mock_post.call_count, 1)
+        query = mock_post.call_args.kwargs["data"]["data"]
+        self.assertEqual(query.count("around:2000.0,"), 3)
+        self.assertEqual([s["name"] for s in results[0]], ["Near A", "Far A"])
+        self.assertEqual([s["name"] for s in results[1]], ["Only B"])
+        self.assertEqual(results[2], [])
+
+
+@override_settings(FUEL_TILE_CACHE_MAX_BYTES=0)
+class LocalFuelStationTestCase(TestCase):
+    def setUp(self):
+        from .cache import reset_station_tile_cache
+        from .circuit import reset_breakers
+        from .fuel_stations import reset_station_index
+
+        reset_breakers()
+        reset_station_index()
+        reset_station_tile_cache()
+        self.addCleanup(reset_breakers)
+        self.addCleanup(reset_station_index)
+        self.addCleanup(reset_station_tile_cache)
+
+    def write_extract(self, name, content):
+        import os
+        import tempfile
+
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+        return path
+
+    def test_station_index_queries(self):
+        from .fuel_stations import StationIndex
+
+        index = StationIndex(
+            [
+                {"id": 1, "name": "A", "lat": 41.0, "lng": -87.0},
+                {"id": 2, "name": "B", "lat": 41.01, "lng": -87.0},
+                {"id": 3, "name": "C", "lat": 41.5, "lng": -87.5},
+            ],
+            cell_degrees=0.05,
+        )
+
+        self.assertEqual(len(index), 3)
+        self.assertTrue(index.covers(41.2, -87.2))
+        self.assertFalse(index.covers(35.0, -101.0))
+        self.assertEqual([s["id"] for s in index.within(41.012, -87.0, 2.0)], [2, 1])
+        self.assertEqual(index.nearest(41.45, -87.45)["id"], 3)
+        self.assertIsNone(index.nearest(45.0, -80.0, max_km=10))
+
+    def test_import_osm_xml(self):
+        from django.core.management import call_command
+        from .models import FuelStation
+
+        path = self.write_extract(
+            "extract.osm",
+            """<?xml version="1.0" encoding="UTF-8"?>
+<osm version="0.6">
+  <node id="10" lat="41.0" lon="-87.0">
+    <tag k="amenity" v="fuel"/>
+    <tag k="name" v="Truck Stop"/>
+    <tag k="hgv" v="yes"/>
+  </node>
+  <node id="11" lat="41.1" lon="-87.1">
+    <tag k="amenity" v="cafe"/>
+  </node>
+  <node id="12" lat="41.2" lon="-87.2"/>
+</osm>
+""",
+        )
+        call_command("import_fuel_stations", path, stdout=io.StringIO())
+        call_command("import_fuel_stations", path, stdout=io.StringIO())
+
+        station = FuelStation.objects.get()
+        self.assertEqual(station.osm_id, 10)
+        self.assertEqual(station.name, "Truck Stop")
+        self.assertEqual(station.tags["hgv"], "yes")
+
+    @patch("route_planner.providers.http_client.post")
+    def test_covered_positions_skip_overpass(self, mock_post):
+        import json
+        from django.core.management import call_command
+        from .utils import find_gas_stations_near_positions
+
+        path = self.write_extract(
+            "extract.geojson",
+            json.dumps(
+                {
+                    "type": "FeatureCollection",
+                    "features": [
+                        {
+                            "type": "Feature",
+                            "properties": {
+                                "@id": f"node/{osm_id}",
+                                "amenity": "fuel",
+                                "name": name,
+                            },
+                            "geometry": {"type": "Point", "coordinates": [lng, lat]},
+                        }
+                        for osm_id, lat, lng, name in [
+                            (1, 41.0, -87.0, "Local A"),
+                            (2, 42.0, -88.0, "Local B"),
+                        ]
+                    ],
+                }
+            ),
+        )
+        call_command("import_fuel_stations", path, stdout=io.StringIO())
+
+        mock_post.return_value = MagicMock(status_code=200)
+        mock_post.return_value.json.return_value = {
+            "elements": [
+                {
+                    "type": "node",
+                    "id": 3,
+                    "lat": 35.0,
+                    "lon": -101.0,
+                    "tags": {"amenity": "fuel", "name": "Remote"},
+                }
+            ]
+        }
+
+        results = find_gas_stations_near_positions(
+            [(41.001, -87.0), (35.001, -101.0)], radius_km=2.0
+        )
+
+        self.assertEqual([s["name"] for s in results[0]], ["Local A"])
+        self.assertEqual([s["name"] for s in results[1]], ["Remote"])
+        self.assertEqual(mock_post.call_count, 1)
+        query = mock_post.call_args.kwargs["data"]["data"]
+        self.assertEqual(query.count("around:"), 1)
+
+        mock_post.reset_mock()
+        with override_settings(FUEL_STATION_SOURCE="overpass"):
+            find_gas_stations_near_positions([(41.001, -87.0)], radius_km=2.0)
+        self.assertEqual(mock_post.call_count, 1)
+
+    @patch("route_planner.providers.http_client.post")
+    def test_empty_local_result_inside_bounds_falls_back_to_overpass(self, mock_post):
+        from .fuel_stations import StationIndex
+        from .utils import find_gas_stations_near_positions
+
+        index = StationIndex(
+            [
+                {"id": 1, "name": "Local A", "lat": 41.0, "lng": -87.0},
+                {"id": 2, "name": "Local B", "lat": 42.0, "lng": -88.0},
+            ]
+        )
+        mock_post.return_value = MagicMock(status_code=200)
+        mock_post.return_value.json.return_value = {
+            "elements": [
+                {
+                    "type": "node",
+                    "id": 3,
+                    "lat": 41.5,
+                    "lon": -87.5,
+                    "tags": {"amenity": "fuel", "name": "Gap"},
+                }
+            ]
+        }
+
+        results = find_gas_stations_near_positions(
+            [(41.001, -87.0), (41.501, -87.5)], radius_km=2.0, index=index
+        )
+
+        self.assertTrue(index.covers(41.501, -87.5))
+        self.assertEqual([s["name"] for s in results[0]], ["Local A"])
+        self.assertEqual([s["name"] for s in results[1]], ["Gap"])
+        query = mock_post.call_args.kwargs["data"]["data"]
+        self.assertEqual(query.count("around:"), 1)
+
+
+class GeometryTestCase(TestCase):
+    def test_cumulative_distance_matches_scalar_haversine(self):
+        from .geometry import cumulative_distance_km
+        from .utils import calculate_distance
+
+        points = [(41.8781, -87.6298), (41.5250, -88.0817), (40.6936, -89.5890)]
+        cumulative = cumulative_distance_km(points)
+
+        self.assertEqual(cumulative[0], 0)
+        expected = calculate_distance(*points[0], *points[1])
+        self.assertAlmostEqual(cumulative[1], expected, places=6)
+        expected += calculate_distance(*points[1], *points[2])
+        self.assertAlmostEqual(cumulative[2], expected, places=6)
+
+    def test_stops_are_spaced_by_distance_not_point_count(self):
+        from .utils import calculate_stop_positions
+
+        # 90 closely spaced points over the first 0.09 degrees, then 10 points
+        # over the remaining 0.9 degrees of the route.
+        dense = [(40.0, -100.0 + i * 0.001) for i in range(90)]
+        sparse = [(40.0, -99.91 + i * 0.1) for i in range(10)]
+        coordinates = dense + sparse
+
+        stops = calculate_stop_positions(coordinates, 1)
+
+        self.assertEqual(len(stops), 1)
+        self.assertIn(stops[0], sparse)
+        self.assertAlmostEqual(stops[0][1], -99.41, places=6)
+
+    def test_stations_are_grouped_by_nearest_position(self):
+        from .utils import assign_stations_to_positions
+
+        stations = [
+            {"id": 1, "lat": 41.01, "lng": -87.0},
+            {"id": 2, "lat": 35.0, "lng": -101.0},
+            {"id": 3, "lat": 41.001, "lng": -87.0},
+        ]
+        grouped = assign_stations_to_positions(
+            stations, [(41.0, -87.0), (35.0, -101.0), (30.0, -95.0)]
+        )
+
+        self.assertEqual(
+            [[s["id"] for s in group] for group in grouped], [[3, 1], [2], []]
+        )
+
+    def test_projection_memory_is_bounded_on_long_routes(self):
+        import tracemalloc
+
+        import numpy as np
+        from . import geometry
+
+        # A 3,000 mile route simplified to 3,000 vertices and 4,000 candidate
+        # stations scattered along it
+        rng = np.random.default_rng(0)
+        line = np.column_stack(
+            [np.linspace(34.0, 41.0, 3000), np.linspace(-118.0, -74.0, 3000)]
+        )
+        line[:, 0] += rng.normal(0, 0.05, len(line))
+        cumulative = geometry.cumulative_distance_km(line)
+        points = line[rng.integers(0, len(line), 4000)] + rng.normal(
+            0, 0.02, (4000, 2)
+        )
+
+        tracemalloc.start()
+        try:
+            offsets, along = geometry.project_onto_polyline(points, line, cumulative)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        # Unchunked, the point-by-segment arrays alone take about 1 GB
+        self.assertLess(peak, 32 * 1024 * 1024)
+
+        sample = points[:50]
+        # One chunk for the whole sample
+        pairs = len(sample) * len(line)
+        with patch.object(geometry, "PROJECTION_CHUNK_PAIRS", pairs):
+            expected = geometry.project_onto_polyline(sample, line, cumulative)
+        np.testing.assert_allclose(offsets[:50], expected[0])
+        np.testing.assert_allclose(along[:50], expected[1])
+
+
+class CorridorFuelSearchTestCase(TestCase):
+    def setUp(self):
+        from .cache import reset_station_tile_cache
+        from .circuit import reset_breakers
+        from .fuel_stations import reset_station_index
+
+        reset_breakers()
+        reset_station_index()
+        reset_station_tile_cache()
+        self.addCleanup(reset_breakers)
+        self.addCleanup(reset_station_index)
+        self.addCleanup(reset_station_tile_cache)
+
+        from . import polyline
+
+        # Due east along the 40th parallel with a dogleg north at the end
+        coordinates = [[40.0, -100.0 + i * 0.01] for i in range(101)]
+        coordinates += [[40.0 + i * 0.01, -99.0] for i in range(1, 51)]
+        self.route_geometry = {
+            "to_pickup": {"routes": [{"geometry": polyline.encode(coordinates)}]},
+            "to_delivery": {"routes": []},
+        }
+
+    def station(self, osm_id, lat, lng, name, hgv="yes"):
+        return {
+            "type": "node",
+            "id": osm_id,
+            "lat": lat,
+            "lon": lng,
+            "tags": {"amenity": "fuel", "name": name, "hgv": hgv},
+        }
+
+    def test_simplify_keeps_only_corners(self):
+        from .geometry import simplify
+
+        straight = [(40.0, -100.0 + i * 0.01) for i in range(101)]
+        self.assertEqual(simplify(straight, 0.1).tolist(), [0, 100])
+
+        dogleg = straight + [(40.0 + i * 0.01, -99.0) for i in range(1, 51)]
+        self.assertEqual(simplify(dogleg, 0.1).tolist(), [0, 100, 150])
+
+    @patch("route_planner.providers.http_client.post")
+    def test_corridor_is_one_overpass_query_ordered_by_mileage(self, mock_post):
+        from .utils import find_gas_stations_along_route
+
+        mock_post.return_value = MagicMock(status_code=200)
+        mock_post.return_value.json.return_value = {
+            "elements": [
+                self.station(1, 40.3, -98.99, "North"),
+                self.station(2, 40.01, -99.5, "Middle"),
+                self.station(3, 40.0, -99.9, "No Trucks", hgv="no"),
+                self.station(4, 39.999, -99.95, "West"),
+            ]
+        }
+
+        stations = find_gas_stations_along_route(
+            self.route_geometry, 0, radius_km=2.0, mode="corridor"
+        )
+
+        self.assertEqual(mock_post.call_count, 1)
+        query = mock_post.call_args.kwargs["data"]["data"]
+        self.assertEqual(query.count("around:"), 1)
+        # The simplified route has three vertices
+        self.assertEqual(query.count(","), 6)
+
+        self.assertEqual([s["name"] for s in stations], ["West", "Middle", "North"])
+        self.assertEqual(
+            [s["route_miles"] for s in stations],
+            sorted(s["route_miles"] for s in stations),
+        )
+        middle = stations[1]
+        self.assertAlmostEqual(middle["route_miles"], 26.5, delta=0.2)
+        # 0.01 degrees of latitude off the route, there and back
+        self.assertAlmostEqual(middle["detour_miles"], 2 * 1.112 / 1.609344, places=2)
+
+    @patch("route_planner.providers.http_client.post")
+    def test_corridor_served_from_local_index(self, mock_post):
+        import json
+        import os
+        import tempfile
+        from django.core.management import call_command
+        from .utils import find_gas_stations_along_route
+
+        path = os.path.join(tempfile.mkdtemp(), "extract.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "elements": [
+                        self.station(1, 40.3, -98.99, "North"),
+                        self.station(2, 40.01, -99.5, "Middle"),
+                        self.station(3, 40.2, -99.5, "Too Far"),
+                        self.station(4, 39.0, -101.0, "Corner"),
+                        self.station(5, 41.0, -98.0, "Corner"),
+                    ]
+                },
+                f,
+            )
+        call_command("import_fuel_stations", path, stdout=io.StringIO())
+
+        stations = find_gas_stations_along_route(
+            self.route_geometry, 0, radius_km=2.0, mode="corridor"
+        )
+
+        mock_post.assert_not_called()
+        self.assertEqual([s["name"] for s in stations], ["Middle", "North"])
+
+    @patch("route_planner.providers.http_client.post")
+    def test_corridor_without_local_candidates_falls_back_to_overpass(
+        self, mock_post
+    ):
+        from .fuel_stations import StationIndex
+        from .utils import find_gas_stations_along_route
+
+        # Only the far corners of the extract's bounding box have stations
+        index = StationIndex(
+            [
+                {"id": 4, "name": "Corner", "lat": 39.0, "lng": -101.0},
+                {"id": 5, "name": "Corner", "lat": 41.0, "lng": -98.0},
+            ]
+        )
+        mock_post.return_value = MagicMock(status_code=200)
+        mock_post.return_value.json.return_value = {
+            "elements": [self.station(2, 40.01, -99.5, "Middle")]
+        }
+
+        stations = find_gas_stations_along_route(
+            self.route_geometry, 0, radius_km=2.0, mode="corridor", index=index
+        )
+
+        self.assertEqual(mock_post.call_count, 1)
+        self.assertEqual([s["name"] for s in stations], ["Middle"])
+
+
+class StationTileCacheTestCase(TestCase):
+    def setUp(self):
+        from . import metrics
+        from .cache import reset_station_tile_cache
+        from .circuit import reset_breakers
+        from .fuel_stations import reset_station_index
+
+        metrics.reset()
+        reset_breakers()
+        reset_station_index()
+        reset_station_tile_cache()
+        self.addCleanup(reset_breakers)
+        self.addCleanup(reset_station_index)
+        self.addCleanup(reset_station_tile_cache)
+
+    def overpass_response(self, *stations):
+        response = MagicMock(status_code=200)
+        response.json.return_value = {
+            "elements": [
+                {
+                    "type": "node",
+                    "id": osm_id,
+                    "lat": lat,
+                    "lon": lng,
+                    "tags": {"amenity": "fuel", "name": name},
+                }
+                for osm_id, lat, lng, name in stations
+            ]
+        }
+        return response
+
+    def test_geohash_round_trip_and_covering(self):
+        from . import geohash
+
+        self.assertEqual(geohash.encode(57.64911, 10.40744, 11), "u4pruydqqvj")
+        south, west, north, east = geohash.bounds("u4pruydqqvj")
+        self.assertTrue(south <= 57.64911 <= north and west <= 10.40744 <= east)
+
+        tiles = geohash.covering(40.0, -99.5, 2.0, 5)
+        self.assertIn(geohash.encode(40.0, -99.5, 5), tiles)
+        for lat, lng in [(40.017, -99.5), (39.983, -99.5), (40.0, -99.477)]:
+            self.assertIn(geohash.encode(lat, lng, 5), tiles)
+
+    @patch("route_planner.providers.http_client.post")
+    def test_nearby_searches_share_tiles(self, mock_post):
+        from .cache import station_tile_cache_stats
+        from .utils import find_gas_stations_near_positions
+
+        mock_post.return_value = self.overpass_response(
+            (1, 40.001, -99.5, "Near"), (2, 40.012, -99.5, "Farther")
+        )
+
+        first = find_gas_stations_near_positions([(40.0, -99.5)], radius_km=2.0)
+        self.assertEqual([s["name"] for s in first[0]], ["Near", "Farther"])
+        self.assertEqual(mock_post.call_count, 1)
+        query = mock_post.call_args.kwargs["data"]["data"]
+        self.assertNotIn("around:", query)
+
+        # A few hundred meters away: same tiles, answered from the cache and
+        # filtered to the smaller radius
+        second = find_gas_stations_near_positions([(40.002, -99.501)], radius_km=0.5)
+        self.assertEqual([s["name"] for s in second[0]], ["Near"])
+        self.assertEqual(mock_post.call_count, 1)
+
+        stats = station_tile_cache_stats()
+        self.assertGreater(stats["tiles"], 0)
+        self.assertGreater(stats["hits"], 0)
+        self.assertGreater(stats["hit_ratio"], 0)
+
+    @patch("route_planner.providers.http_client.post")
+    def test_only_missing_tiles_are_fetched(self, mock_post):
+        from . import geohash
+        from .utils import find_gas_stations_near_positions
+
+        mock_post.return_value = self.overpass_response()
+        find_gas_stations_near_positions([(40.0, -99.5)], radius_km=2.0)
+        cached = set(geohash.covering(40.0, -99.5, 2.0, 5))
+
+        mock_post.return_value = self.overpass_response((3, 40.1, -99.5, "North"))
+        results = find_gas_stations_near_positions(
+            [(40.0, -99.5), (40.1, -99.5)], radius_km=2.0
+        )
+
+        self.assertEqual(mock_post.call_count, 2)
+        query = mock_post.call_args.kwargs["data"]["data"]
+        wanted = set(geohash.covering(40.1, -99.5, 2.0, 5))
+        self.assertEqual(query.count("node["), len(wanted - cached))
+        self.assertEqual(results[0], [])
+        self.assertEqual([s["name"] for s in results[1]], ["North"])
+
+    def test_lru_eviction_is_bounded_by_bytes(self):
+        from .cache import StationTileCache
+
+        station = {"id": 1, "name": "x" * 100, "lat": 40.0, "lng": -99.5}
+        cache = StationTileCache(ttl=60, max_bytes=600, precision=5)
+        for tile in ["9z15r", "9z15x", "9z172", "9z178"]:
+            cache.set_many({tile: [station, station]})
+
+        found, missing = cache.get_many(["9z15r", "9z15x", "9z172", "9z178"])
+        self.assertLessEqual(cache.stats()["bytes"], 600)
+        self.assertIn("9z15r", missing)
+        self.assertIn("9z178", found)
+
+    def test_tiles_expire(self):
+        from .cache import StationTileCache
+
+        cache = StationTileCache(ttl=-1, max_bytes=1024, precision=5)
+        cache.set_many({"9z15r": []})
+        found, missing = cache.get_many(["9z15r"])
+        self.assertEqual((found, missing), ({}, ["9z15r"]))
+
+
+class FuelPlannerTestCase(TestCase):
+    def stations(self, *miles):
+        return [
+            {"id": i + 1, "name": f"Station {i + 1}", "route_miles": m}
+            for i, m in enumerate(miles)
+        ]
+
+    def test_fewest_stops_drive_to_farthest_reachable_station(self):
+        from .fuel_planner import plan_fuel_stops
+
+        plan = plan_fuel_stops([100, 250, 400, 450, 700, 900], 1000, 500)
+        self.assertEqual(plan, [(3, 450.0), (5, 50.0)])
+        self.assertEqual(plan_fuel_stops([100, 200], 450, 500), [])
+
+    def test_cheapest_buys_range_at_the_lowest_prices(self):
+        from .fuel_planner import plan_fuel_stops
+
+        plan = plan_fuel_stops(
+            [100, 300, 600, 800], 1000, 500, prices=[4.0, 3.0, 5.0, 3.5]
+        )
+        self.assertEqual(plan, [(1, 300.0), (3, 200.0)])
+
+    def test_gap_longer_than_range_is_reported(self):
+        from .fuel_planner import FuelPlanError, plan_fuel_stops
+
+        with self.assertRaises(FuelPlanError):
+            plan_fuel_stops([100, 300, 900], 1000, 500)
+        with self.assertRaises(FuelPlanError):
+            plan_fuel_stops([600], 1000, 500)
+
+    def test_thousands_of_stations_never_run_dry(self):
+        import numpy as np
+        from .fuel_planner import plan_fuel_stops
+
+        rng = np.random.default_rng(7)
+        miles = np.sort(rng.uniform(0, 3000, 5000))
+        prices = rng.uniform(3.0, 5.0, 5000)
+        plan = plan_fuel_stops(miles, 3000, 500, prices=prices)
+
+        fuel, position = 500.0, 0.0
+        for index, bought in plan:
+            fuel -= miles[index] - position
+            self.assertGreaterEqual(fuel, -1e-6)
+            fuel += bought
+            self.assertLessEqual(fuel, 500 + 1e-6)
+            position = miles[index]
+        self.assertGreaterEqual(fuel - (3000 - position), -1e-6)
+
+    @override_settings(FUEL_TANK_RANGE_MILES=600, FUEL_RESERVE_MILES=100)
+    def test_cheapest_uses_imported_prices(self):
+        import os
+        import tempfile
+        from django.core.management import call_command
+        from .fuel_planner import plan_route_fuel
+
+        path = os.path.join(tempfile.mkdtemp(), "prices.csv")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("osm_id,price_per_gallon\n1,4.0\n2,3.0\n4,3.5\n")
+        call_command("import_fuel_prices", path, stdout=io.StringIO())
+
+        with override_settings(FUEL_DEFAULT_PRICE=5.0):
+            stops = plan_route_fuel(
+                self.stations(100, 300, 600, 800), 1000, strategy="cheapest"
+            )
+
+        self.assertEqual([s["name"] for s in stops], ["Station 2", "Station 4"])
+        self.assertEqual([s["refuel_miles"] for s in stops], [300.0, 200.0])
+        self.assertEqual(stops[0]["price_per_gallon"], 3.0)
+
+    def test_daily_logs_fuel_at_planned_hours(self):
+        from .services import HOSCalculator
+
+        logs = HOSCalculator()._generate_daily_logs(
+            10.0, 12.5, 0, 1.0, 1.0, 1, fuel_stop_hours=[3.0]
+        )
+
+        activities = logs[0]["activities"]
+        fueling = [a["description"] for a in activities].index("Fueling")
+        driven = sum(
+            a["duration"] for a in activities[:fueling] if a["status"] == "driving"
+        )
+        self.assertAlmostEqual(driven, 3.0)
+        self.assertEqual(
+            sum(a["description"] == "Fueling" for log in logs for a in log["activities"]),
+            1,
+        )
+
+
+class HOSEngineTestCase(TestCase):
+    def test_days_keep_minute_totals_and_serialize_to_log_json(self):
+        from datetime import date
+        from .hos_engine import DRIVING, HOSSimulator
+
+        days = HOSSimulator().run(600, 750, 0, 60, 60, 1)
+
+        day = days[0]
+        self.assertFalse(hasattr(day.activities[0], "__dict__"))
+        self.assertEqual(day.logged_minutes, 24 * 60)
+        self.assertEqual(
+            day.totals[DRIVING],
+            sum(a.minutes for a in day.activities if a.status == DRIVING),
+        )
+
+        log = day.as_dict(date(2024, 3, 1))
+        self.assertEqual(log["date"], "2024-03-01")
+        self.assertEqual(
+            list(log["daily_totals"]),
+            ["off_duty", "sleeper_berth", "driving", "on_duty_not_driving"],
+        )
+        self.assertEqual(
+            log["activities"][0],
+            {
+                "start_time": "06:00",
+                "end_time": "06:15",
+                "status": "on_duty_not_driving",
+                "duration": 0.25,
+                "location": "2024-03-01",
+                "description": "Pre-trip inspection",
+            },
+        )
+        self.assertEqual(log["activities"][1]["description"], "Driving - Segment 1")
+        self.assertEqual(log["activities"][-1]["end_time"], "23:59")
+
+    def test_exhausted_cycle_restarts_before_pickup(self):
+        from .services import HOSCalculator
+
+        logs = HOSCalculator()._generate_daily_logs(5.0, 7.0, 70, 1.0, 1.0, 0)
+
+        self.assertEqual(
+            logs[0]["activities"][0]["description"], "34-hour restart required"
+        )
+        descriptions = [a["description"] for log in logs for a in log["activities"]]
+        self.assertEqual(descriptions.count("Loading/Pickup"), 1)
+        self.assertEqual(descriptions.count("Unloading/Delivery"), 1)
+        self.assertEqual(descriptions.count("Pre-trip inspection"), 1)
+
+
+class TimelineTestCase(TestCase):
+    def day(self, day_number, *activities, start=6 * 60):
+        from .hos_engine import DayLog
+
+        day = DayLog(day_number)
+        clock = start
+        for status, minutes in activities:
+            clock = day.record(clock, minutes, status, "", "")
+        return day
+
+    def test_timeline_totals_per_calendar_day(self):
+        from .hos_engine import DRIVING, OFF_DUTY, ON_DUTY, SLEEPER_BERTH
+        from .timeline import build_timeline, daily_totals
+
+        day = self.day(1, (ON_DUTY, 60), (DRIVING, 600), (SLEEPER_BERTH, 780))
+        timeline = build_timeline([day])
+
+        self.assertEqual(timeline.dtype.itemsize, 1)
+        self.assertEqual(timeline.shape[1], 24 * 60)
+        totals = daily_totals(timeline)
+        # 17:00 to midnight asleep on day 1, midnight to 06:00 on day 2
+        self.assertEqual(totals[0].tolist(), [360, 420, 600, 60])
+        self.assertEqual(totals[1][SLEEPER_BERTH], 360)
+        self.assertEqual(totals[1][OFF_DUTY], 1080)
+
+    def test_driving_limits(self):
+        from .hos_engine import DRIVING, OFF_DUTY, ON_DUTY, SLEEPER_BERTH
+        from .timeline import find_violations
+
+        compliant = self.day(
+            1,
+            (ON_DUTY, 15),
+            (DRIVING, 480),
+            (OFF_DUTY, 30),
+            (DRIVING, 180),
+            (SLEEPER_BERTH, 735),
+        )
+        self.assertEqual(find_violations([compliant]), [])
+
+        # A 20-minute pause is not a break, and 12 hours behind the wheel
+        # breaks the 11-hour limit
+        tired = self.day(
+            1,
+            (ON_DUTY, 60),
+            (DRIVING, 500),
+            (OFF_DUTY, 20),
+            (DRIVING, 220),
+            (SLEEPER_BERTH, 640),
+        )
+        found = {v["type"]: v["minutes"] for v in find_violations([tired])}
+        self.assertEqual(found, {"11-Hour Driving Limit": 60, "30-Minute Break": 240})
+
+        late = self.day(1, (ON_DUTY, 600), (DRIVING, 300), (SLEEPER_BERTH, 540))
+        found = {v["type"]: v["minutes"] for v in find_violations([late])}
+        self.assertEqual(found, {"14-Hour Duty Window": 60})
+
+    def test_cycle_limit_counts_prior_hours_until_a_restart(self):
+        from .hos_engine import DRIVING, OFF_DUTY, ON_DUTY
+        from .timeline import find_violations
+
+        day = self.day(1, (ON_DUTY, 60), (DRIVING, 240), (OFF_DUTY, 1140))
+        found = find_violations([day], cycle_minutes=67 * 60)
+        # 67 prior hours and the first 3 of the trip reach the limit
+        self.assertEqual([v["type"] for v in found], ["70-Hour/8-Day Limit"])
+        self.assertEqual(found[0]["minutes"], 120)
+
+        rested = [
+            self.day(1, (OFF_DUTY, 24 * 60), start=0),
+            self.day(2, (OFF_DUTY, 11 * 60), (ON_DUTY, 60), (DRIVING, 240), start=0),
+        ]
+        self.assertEqual(find_violations(rested, cycle_minutes=67 * 60), [])
+
+    def test_trip_violations_are_saved(self):
+        from .cache import reset_schedule_cache
+        from .services import HOSCalculator
+        from .views import save_trip_plan
+
+        reset_schedule_cache()
+
+        violation = {
+            "type": "30-Minute Break",
+            "description": "Drove more than 8 hours without a 30-minute break",
+            "severity": "violation",
+            "day_number": 2,
+            "minutes": 15,
+        }
+        with patch("route_planner.services.find_violations", return_value=[violation]):
+            result = HOSCalculator()._build_trip_result(
+                1200, 22.0, 0, {"to_pickup": {}, "to_delivery": {}}, 0, []
+            )
+        self.assertEqual(len(result["violations"]), 1)
+        self.assertEqual(result["eld_logs"][1]["violations"], result["violations"])
+        logged = [v for log in result["eld_logs"] for v in log["violations"]]
+        self.assertEqual(logged, result["violations"])
+        self.assertIn("date", logged[0])
+
+        trip = save_trip_plan(
+            None,
+            {
+                "current_location": "A",
+                "pickup_location": "B",
+                "dropoff_location": "C",
+                "current_cycle_hours": 67,
+            },
+            result,
+        )
+        self.assertEqual(
+            HOSViolation.objects.filter(trip=trip).count(), len(result["violations"])
+        )
+
+
+class BatchPlanningTestCase(TestCase):
+    def setUp(self):
+        from rest_framework_simplejwt.tokens import RefreshToken
+        from users.models import TruckUser
+
+        user = TruckUser.objects.create_user(username="dispatch", password="pw12345!")
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(user).access_token}"
+        )
+
+    def _route_response(self):
+        return {
+            "routes": [
+                {
+                    "summary": {"distance": 600.0, "duration": 36000},
+                    "segments": [
+                        {"distance": 100.0, "duration": 6000, "steps": []},
+                        {"distance": 500.0, "duration": 30000, "steps": []},
+                    ],
+                    "geometry": {
+                        "type": "LineString",
+                        "coordinates": [[-87, 41], [-88, 40], [-89, 39]],
+                    },
+                    "way_points": [0, 1, 2],
+                }
+            ]
+        }
+
+    @override_settings(ROUTE_SINGLE_REQUEST=True, PLANNER_PROCESS_WORKERS=0)
+    @patch("route_planner.batch.find_gas_stations_along_route", return_value=[])
+    def test_batch_dedupes_lookups_and_reports_each_trip(self, _mock_stations):
+        from .services import RouteService
+
+        coords = {"A": [41, -87], "B": [40, -88], "C": [39, -89]}
+        trip = {
+            "current_location": "A",
+            "pickup_location": "B",
+            "dropoff_location": "C",
+            "current_cycle_hours": 10,
+        }
+        trips = [
+            trip,
+            dict(trip, current_cycle_hours=60),
+            dict(trip, dropoff_location="Nowhere"),
+            dict(trip, current_cycle_hours=-1),
+        ]
+        with patch.object(
+            RouteService,
+            "geocode_locations",
+            side_effect=lambda locations: [coords.get(loc) for loc in locations],
+        ) as mock_geocode, patch.object(
+            RouteService,
+            "get_routes",
+            side_effect=lambda legs, cache_mode=None: [
+                self._route_response() for _ in legs
+            ],
+        ) as mock_routes:
+            response = self.client.post(
+                reverse("plan_batch"), {"trips": trips}, format="json"
+            )
+
+        self.assertEqual(response.status_code, 207)
+        body = response.json()
+        self.assertEqual((body["created"], body["failed"]), (2, 2))
+        self.assertEqual(
+            [item["status"] for item in body["trips"]],
+            ["created", "created", "failed", "failed"],
+        )
+        self.assertIn("Nowhere", body["trips"][2]["error"])
+        self.assertIn("current_cycle_hours", body["trips"][3]["error"])
+
+        mock_geocode.assert_called_once_with(["A", "B", "C", "Nowhere"])
+        mock_routes.assert_called_once()
+        self.assertEqual(len(mock_routes.call_args[0][0]), 1)
+
+        saved = TripPlan.objects.get(pk=body["trips"][1]["trip"]["id"])
+        self.assertEqual(saved.current_cycle_hours, 60)
+        self.assertEqual(saved.total_distance, 600.0)
+        self.assertEqual(TripPlan.objects.count(), 2)
+
+    def test_fuel_searches_use_the_index_loaded_on_the_request_thread(self):
+        import threading
+
+        from . import fuel_stations
+        from .batch import BatchTripPlanner
+        from .fuel_stations import StationIndex
+        from .utils import station_from_tags
+
+        index = StationIndex(
+            [station_from_tags(1, 40.0, -88.0, {"name": "Stop", "hgv": "yes"})]
+        )
+        index.bounds = (38.0, -90.0, 42.0, -86.0)
+        loaded_on = []
+
+        def get_station_index():
+            loaded_on.append(threading.current_thread())
+            return index
+
+        geometry = {"to_delivery": {"geometry": "_ulxFnyxsO~|{E~|{E~|{E~|{E"}}
+        routes = {i: (1200.0, 22.0, geometry, None) for i in range(3)}
+        with patch(
+            "route_planner.batch.get_station_index", get_station_index
+        ), patch.object(fuel_stations, "get_station_index", get_station_index):
+            fuel = BatchTripPlanner(fuel_strategy="interval")._find_fuel_stops(
+                routes, [None] * 3
+            )
+
+        self.assertEqual(loaded_on, [threading.current_thread()])
+        self.assertEqual([fuel[i][0] for i in range(3)], [2, 2, 2])
+
+    @override_settings(ROUTE_SINGLE_REQUEST=False, PLANNER_PROCESS_WORKERS=0)
+    @patch("route_planner.services.run_in_background")
+    @patch("route_planner.batch.find_gas_stations_along_route", return_value=[])
+    def test_only_trips_served_stale_data_are_flagged(self, _stations, _refresh):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .batch import BatchTripPlanner
+        from .cache import get_route_cache
+        from .models import RouteCacheEntry
+        from .services import RouteService
+
+        coords = {
+            "A": [41, -87],
+            "B": [40, -88],
+            "C": [39, -89],
+            "D": [38, -90],
+            "E": [42, -86],
+        }
+
+        def geocode_locations(service, locations):
+            service.stale_locations.add("D")
+            return [coords[loc] for loc in locations]
+
+        def request_route(service, data, start_coords, end_coords):
+            return None if start_coords == coords["E"] else self._route_response()
+
+        service = RouteService()
+        route_cache = get_route_cache()
+        stale_key = service.route_cache_key(coords["E"], coords["B"])
+        route_cache.set(stale_key, self._route_response())
+        RouteCacheEntry.objects.filter(key=stale_key).update(
+            expires_at=timezone.now() - timedelta(hours=1)
+        )
+        route_cache.clear_local()
+
+        trip = {
+            "current_location": "A",
+            "pickup_location": "B",
+            "dropoff_location": "C",
+            "current_cycle_hours": 10,
+        }
+        trips = [
+            trip,
+            dict(trip, dropoff_location="D"),
+            dict(trip, current_location="E"),
+        ]
+        with patch.object(
+            RouteService,
+            "geocode_locations",
+            autospec=True,
+            side_effect=geocode_locations,
+        ), patch.object(
+            RouteService, "_request_route", autospec=True, side_effect=request_route
+        ):
+            outcomes = BatchTripPlanner().plan(trips)
+
+        self.assertEqual(
+            [outcome["result"]["stale"] for outcome in outcomes], [False, True, True]
+        )
+
+    @override_settings(PLANNER_BATCH_MAX_TRIPS=1)
+    def test_batch_size_is_bounded(self):
+        trip = {
+            "current_location": "A",
+            "pickup_location": "B",
+            "dropoff_location": "C",
+            "current_cycle_hours": 0,
+        }
+        response = self.client.post(
+            reverse("plan_batch"), {"trips": [trip, trip]}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("trips", response.json())
+
+    @override_settings(PLANNER_PROCESS_WORKERS=2)
+    def test_process_pool_matches_inline_simulation(self):
+        from datetime import datetime, timezone as dt_timezone
+        from .batch import _simulate_trip
+        from .executor import map_processes
+
+        departure = datetime(2024, 3, 1, 6, tzinfo=dt_timezone.utc)
+        trips = [
+            (22.0, 0, 2, None, departure),
+            (5.0, 65, 0, None, departure),
+            (9.0, 0, 1, [4.5], departure),
+        ]
+        results = map_processes(
+            _simulate_trip, trips + [("bad", 0, 0, None, departure)]
+        )
+
+        self.assertEqual(results[:3], [_simulate_trip(trip) for trip in trips])
+        self.assertIsInstance(results[3], TypeError)
+
+
+class DutyRecapTestCase(TestCase):
+    def setUp(self):
+        from datetime import date
+        from users.models import TruckUser
+
+        self.driver = TruckUser.objects.create_user(username="driver", password="pw")
+        self.today = date(2024, 3, 8)
+
+    def trip_result(self, *hours):
+        """A trip result with one log per day ending today, on duty ``hours``"""
+        from datetime import timedelta
+
+        first = self.today - timedelta(days=len(hours) - 1)
+        return {
+            "total_distance": 100.0,
+            "total_duration": 2.0,
+            "route_geometry": {},
+            "eld_logs": [
+                {
+                    "date": (first + timedelta(days=i)).isoformat(),
+                    "daily_totals": {"driving": h - 1, "on_duty_not_driving": 1},
+                    "violations": [],
+                }
+                for i, h in enumerate(hours)
+            ],
+        }
+
+    def data(self):
+        return {
+            "current_location": "A",
+            "pickup_location": "B",
+            "dropoff_location": "C",
+            "current_cycle_hours": 0,
+        }
+
+    def available(self):
+        from .recap import hours_available
+
+        return hours_available(self.driver, self.today)["hours_available"]
+
+    def test_recap_follows_trip_saves_and_status_changes(self):
+        from datetime import timedelta
+        from .recap import hours_available
+        from .views import save_trip_plan, save_trip_plans
+
+        # Planned trips do not count until they are under way
+        first = save_trip_plan(self.driver, self.data(), self.trip_result(11, 12))
+        (second,) = save_trip_plans(self.driver, [(self.data(), self.trip_result(5))])
+        self.assertEqual(self.available(), 70)
+
+        first.status = "in_progress"
+        first.save()
+        self.assertEqual(self.available(), 47)
+        second.status = "completed"
+        second.save()
+        self.assertEqual(self.available(), 42)
+
+        first.status = "cancelled"
+        first.save()
+        self.assertEqual(self.available(), 65)
+        first.status = "completed"
+        first.save()
+        self.assertEqual(self.available(), 42)
+
+        first.delete()
+        self.assertEqual(self.available(), 65)
+        # Days that rolled out of the 8-day window no longer count
+        later = hours_available(self.driver, self.today + timedelta(days=8))
+        self.assertEqual(later["hours_available"], 70)
+
+    @override_settings(TIME_ZONE="America/Chicago")
+    def test_window_ends_on_the_local_date(self):
+        from datetime import date, datetime, timezone as dt_timezone
+        from .recap import cycle_window
+
+        late_evening = datetime(2024, 3, 9, 3, tzinfo=dt_timezone.utc)
+        with patch("django.utils.timezone.now", return_value=late_evening):
+            self.assertEqual(cycle_window(), (date(2024, 3, 1), date(2024, 3, 8)))
+
+    def test_hours_available_endpoint(self):
+        from rest_framework_simplejwt.tokens import RefreshToken
+        from users.models import TruckUser
+        from .views import save_trip_plan
+
+        trip = save_trip_plan(self.driver, self.data(), self.trip_result(10, 10, 10))
+        trip.status = "in_progress"
+        trip.save()
+        dispatcher = TruckUser.objects.create_user(
+            username="dispatch", password="pw", is_staff=True
+        )
+
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.driver).access_token}"
+        )
+        url = reverse("driver_hours")
+        own = client.get(url, {"date": self.today.isoformat()})
+        self.assertEqual(own.status_code, 200)
+        self.assertEqual(own.json()["on_duty_hours"], 30)
+        self.assertEqual(client.get(url, {"fleet": "true"}).status_code, 403)
+
+        client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(dispatcher).access_token}"
+        )
+        fleet = client.get(url, {"fleet": "true", "date": self.today.isoformat()})
+        self.assertEqual(
+            {d["username"]: d["hours_available"] for d in fleet.json()["drivers"]},
+            {"dispatch": 70, "driver": 40},
+        )
+
+
+class ScheduleCacheTestCase(TestCase):
+    def setUp(self):
+        from . import metrics
+        from .cache import reset_schedule_cache
+
+        metrics.reset()
+        reset_schedule_cache()
+        self.addCleanup(reset_schedule_cache)
+
+    def departure(self, day, hour=6, minute=0):
+        from datetime import datetime, timezone as dt_timezone
+
+        return datetime(2024, 3, day, hour, minute, tzinfo=dt_timezone.utc)
+
+    def test_schedule_is_memoized_and_rebased_to_the_departure(self):
+        from .cache import schedule_cache_stats
+        from .services import HOSCalculator
+
+        calculator = HOSCalculator()
+        inputs = (22.0, 26.0, 60, 1.0, 1.0, 2)
+        violation = {
+            "type": "30-Minute Break",
+            "description": "Drove more than 8 hours without a 30-minute break",
+            "severity": "violation",
+            "day_number": 2,
+            "minutes": 15,
+        }
+        with patch(
+            "route_planner.services.find_violations", return_value=[violation]
+        ) as mock_check:
+            first = calculator._generate_daily_logs(
+                *inputs, departure=self.departure(1)
+            )
+            second = calculator._generate_daily_logs(
+                *inputs, departure=self.departure(5)
+            )
+        mock_check.assert_called_once()
+
+        self.assertEqual(
+            [log["date"] for log in second],
+            [f"2024-03-{5 + i:02d}" for i in range(len(first))],
+        )
+        self.assertEqual(second[0]["activities"][0]["location"], "2024-03-05")
+        self.assertEqual(
+            [log["daily_totals"] for log in first],
+            [log["daily_totals"] for log in second],
+        )
+        self.assertEqual(first[1]["violations"][0]["date"], "2024-03-02")
+        self.assertEqual(second[1]["violations"][0]["date"], "2024-03-06")
+
+        stats = schedule_cache_stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+        self.assertEqual(stats["hit_ratio"], 0.5)
+
+    def test_departure_time_of_day_starts_each_duty_day(self):
+        from .services import HOSCalculator
+
+        logs = HOSCalculator()._generate_daily_logs(
+            5.0, 7.0, 0, 1.0, 1.0, 0, departure=self.departure(1, 8, 30)
+        )
+        self.assertEqual(logs[0]["activities"][0]["start_time"], "08:30")
+        self.assertEqual(sum(logs[0]["daily_totals"].values()), 24)
+
+    @override_settings(HOS_SCHEDULE_QUANTUM_MINUTES=5)
+    def test_near_identical_inputs_share_a_schedule(self):
+        from . import metrics
+        from .services import HOSCalculator
+
+        calculator = HOSCalculator()
+        for driving in (10.01, 10.02, 10.03):
+            calculator._generate_daily_logs(
+                driving, driving + 2, 0, 1.0, 1.0, 1, departure=self.departure(1)
+            )
+        self.assertEqual(metrics.get("hos_schedule.miss"), 1)
+        self.assertEqual(metrics.get("hos_schedule.hit"), 2)
+
+    def test_departure_time_is_parsed_and_stored(self):
+        from .services import HOSCalculator
+        from .views import save_trip_plan
+
+        calculator = HOSCalculator()
+        departure = calculator._parse_departure(
+            {"departure_time": "2024-03-01T14:00:00+00:00"}
+        )
+        self.assertEqual(departure, self.departure(1, 14))
+        with self.assertRaises(ValueError):
+            calculator._parse_departure({"departure_time": "tomorrow"})
+
+        result = calculator._build_trip_result(
+            300, 5.0, 0, {}, 0, [], departure=departure
+        )
+        self.assertEqual(result["eld_logs"][0]["date"], "2024-03-01")
+        trip = save_trip_plan(
+            None,
+            {
+                "current_location": "A",
+                "pickup_location": "B",
+                "dropoff_location": "C",
+                "current_cycle_hours": 0,
+            },
+            result,
+        )
+        trip.refresh_from_db()
+        self.assertEqual(trip.departure_time, departure)
+
+
+class ScenarioSweepTestCase(TestCase):
+    def setUp(self):
+        from rest_framework_simplejwt.tokens import RefreshToken
+        from users.models import TruckUser
+
+        user = TruckUser.objects.create_user(username="planner", password="pw12345!")
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(user).access_token}"
+        )
+
+    def test_shifted_counts_match_shifted_timelines(self):
+        import numpy as np
+        from .hos_engine import DRIVING, MINUTES_PER_DAY, ON_DUTY
+        from .timeline import shifted_violation_counts, violation_minutes
+
+        timeline = np.zeros(3 * MINUTES_PER_DAY, dtype=np.int8)
+        timeline[:15] = ON_DUTY
+        timeline[15:800] = DRIVING
+        timeline[1500:2300] = DRIVING
+        shifts = np.array([0, 900, 1200])
+        cycles = np.array([0, 3000])
+        counts = shifted_violation_counts(
+            np.stack([timeline, timeline]), cycles, shifts
+        )
+
+        for i, shift in enumerate(shifts):
+            for j, cycle in enumerate(cycles):
+                shifted = np.zeros(4 * MINUTES_PER_DAY, dtype=np.int8)
+                shifted[shift : shift + len(timeline)] = timeline
+                masks = violation_minutes(shifted.reshape(-1, MINUTES_PER_DAY), cycle)
+                expected = sum(
+                    int(mask.reshape(-1, MINUTES_PER_DAY).any(axis=1).sum())
+                    for mask in masks.values()
+                )
+                self.assertEqual(counts[i, j], expected)
+        self.assertGreater(counts[1, 0], counts[0, 0])
+        self.assertGreater(counts[0, 1], counts[0, 0])
+
+    def test_scenarios_route_once_and_match_single_plans(self):
+        from datetime import datetime, timedelta
+        from .services import HOSCalculator
+
+        route = {
+            "total_distance": 1800.0,
+            "total_duration": 30.0,
+            "route_geometry": {},
+            "route_instructions": [],
+            "fuel_stops_required": 1,
+            "fuel_stops": [],
+            "fuel_stop_hours": None,
+            "stale": False,
+        }
+        departures = ["2024-03-01T05:00:00+00:00", "2024-03-01T21:30:00+00:00"]
+        cycle_hours = [0, 45.5, 69]
+        with patch.object(
+            HOSCalculator, "plan_route", return_value=route
+        ) as mock_route:
+            response = self.client.post(
+                reverse("plan_scenarios"),
+                {
+                    "current_location": "A",
+                    "pickup_location": "B",
+                    "dropoff_location": "C",
+                    "departure_times": departures,
+                    "cycle_hours": cycle_hours,
+                },
+                format="json",
+            )
+
+        self.assertEqual(response.status_code, 200)
+        mock_route.assert_called_once_with("A", "B", "C")
+        body = response.json()
+        self.assertEqual(body["total_distance"], 1800.0)
+        for grid in ("arrival_times", "days", "violations"):
+            self.assertEqual(
+                [len(row) for row in body[grid]], [len(cycle_hours)] * len(departures)
+            )
+        self.assertEqual(len(body["best_departure_times"]), len(cycle_hours))
+
+        calculator = HOSCalculator()
+        for i, departure in enumerate(departures):
+            departure = datetime.fromisoformat(departure)
+            for j, hours in enumerate(cycle_hours):
+                logs = calculator._generate_daily_logs(
+                    *calculator._trip_duty(30.0, hours, 1),
+                    departure=departure,
+                    use_cache=False,
+                )
+                self.assertEqual(body["days"][i][j], len(logs))
+                self.assertEqual(
+                    body["violations"][i][j],
+                    sum(len(log["violations"]) for log in logs),
+                )
+                arrival = datetime.fromisoformat(body["arrival_times"][i][j])
+                self.assertGreaterEqual(arrival - departure, timedelta(hours=30))
+
+    @override_settings(SCENARIO_MAX_CELLS=4)
+    def test_grid_size_is_bounded(self):
+        response = self.client.post(
+            reverse("plan_scenarios"),
+            {
+                "current_location": "A",
+                "pickup_location": "B",
+                "dropoff_location": "C",
+                "departure_times": ["2024-03-01T05:00:00Z"] * 2,
+                "cycle_hours": [0, 10, 20],
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class TripReplanTestCase(TestCase):
+    def setUp(self):
+        from datetime import datetime, timezone as dt_timezone
+        from rest_framework_simplejwt.tokens import RefreshToken
+        from users.models import TruckUser
+        from . import polyline
+        from .services import HOSCalculator
+
+        self.user = TruckUser.objects.create_user(
+            username="driver", password="pw12345!"
+        )
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.user).access_token}"
+        )
+        self.logs = HOSCalculator()._trip_logs(
+            30.0, 10, 3, departure=datetime(2024, 3, 1, 6, tzinfo=dt_timezone.utc)
+        )
+        self.trip = TripPlan.objects.create(
+            user=self.user,
+            current_location="A",
+            pickup_location="B",
+            dropoff_location="C",
+            current_cycle_hours=10,
+            total_distance=1800,
+            total_duration=30.0,
+            route_geometry={
+                "to_pickup": {
+                    "geometry": polyline.encode([(41, -87), (40, -88)]),
+                    "summary": {"distance": 100, "duration": 6000},
+                },
+                "to_delivery": {
+                    "geometry": polyline.encode([(40, -88), (39, -89), (35, -95)]),
+                    "summary": {"distance": 1700, "duration": 102000},
+                },
+            },
+            eld_logs=self.logs,
+            status="in_progress",
+        )
+
+    def replan(self, **data):
+        data.setdefault("as_of", "2024-03-02T09:00:00Z")
+        data.setdefault("cycle_hours", 40)
+        return self.client.post(
+            reverse("trip-replan", args=[self.trip.pk]), data, format="json"
+        )
+
+    def test_on_route_replan_keeps_finished_days_and_routes_nothing(self):
+        from .models import DriverDutyDay
+        from .services import RouteService
+
+        with patch.object(RouteService, "get_routes") as mock_routes, patch.object(
+            RouteService, "geocode_locations"
+        ) as mock_geocode:
+            response = self.replan(latitude=39.0, longitude=-89.0)
+
+        self.assertEqual(response.status_code, 200)
+        mock_routes.assert_not_called()
+        mock_geocode.assert_not_called()
+        body = response.json()
+        self.assertEqual(body["replan"]["rerouted"], False)
+        self.assertEqual(body["replan"]["picked_up"], True)
+        self.assertEqual(body["replan"]["replanned_from_day"], 2)
+
+        self.trip.refresh_from_db()
+        logs = self.trip.eld_logs
+        self.assertEqual(logs[0], self.logs[0])
+        self.assertEqual(
+            logs[1]["activities"][0],
+            dict(self.logs[1]["activities"][0], end_time="09:00", duration=3.0),
+        )
+        driven = self.logs[0]["daily_totals"]["driving"] + 3.0
+        self.assertAlmostEqual(
+            sum(log["daily_totals"]["driving"] for log in logs),
+            driven + body["replan"]["remaining_duration"],
+            delta=0.05,
+        )
+        for log in logs:
+            self.assertAlmostEqual(sum(log["daily_totals"].values()), 24)
+
+        duty = sum(
+            log["daily_totals"]["driving"] + log["daily_totals"]["on_duty_not_driving"]
+            for log in logs
+        )
+        recorded = sum(
+            DriverDutyDay.objects.filter(user=self.user).values_list(
+                "on_duty_minutes", flat=True
+            )
+        )
+        self.assertEqual(recorded, round(duty * 60))
+
+    def test_off_route_replan_routes_only_the_current_leg(self):
+        from .services import RouteService
+
+        route = {
+            "routes": [
+                {
+                    "summary": {"distance": 900.0, "duration": 54000},
+                    "geometry": {
+                        "type": "LineString",
+                        "coordinates": [[-80, 45], [-95, 35]],
+                    },
+                }
+            ]
+        }
+        with patch.object(
+            RouteService, "get_routes", return_value=[route]
+        ) as mock_routes:
+            response = self.replan(latitude=45.0, longitude=-80.0, picked_up=True)
+
+        self.assertEqual(response.status_code, 200)
+        mock_routes.assert_called_once()
+        (start, end, _), = mock_routes.call_args[0][0]
+        self.assertEqual((start, end), ([45.0, -80.0], [35.0, -95.0]))
+        body = response.json()
+        self.assertEqual(body["replan"]["rerouted"], True)
+        self.assertAlmostEqual(body["replan"]["remaining_duration"], 15.0)
+
+        self.trip.refresh_from_db()
+        self.assertEqual(
+            self.trip.route_geometry["to_delivery"]["summary"]["distance"], 900.0
+        )
+        self.assertEqual(self.trip.total_distance, 1000.0)
+        self.assertEqual(self.trip.eld_logs[0], self.logs[0])
+
+    def test_only_trips_in_progress_are_replanned(self):
+        self.trip.status = "planned"
+        self.trip.save()
+        response = self.replan(latitude=39.0, longitude=-89.0)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("in progress", response.json()["error"])
+
+
+class BenchmarkSuiteTestCase(TestCase):
+    """Test the offline benchmark suite"""
+
+    def test_suite_runs_offline_and_saves_fixtures(self):
+        import json
+        import os
+        import tempfile
+
+        from .benchmarks import run_suite
+
+        with tempfile.TemporaryDirectory() as fixture_dir, patch(
+            "route_planner.utils.fetch_overpass_stations"
+        ) as mock_overpass:
+            report = run_suite(
+                fixture_dir,
+                seconds=0.001,
+                trip_miles=(50,),
+                fixture_routes=((200, 50),),
+                hos_weeks=(1,),
+            )
+            self.assertTrue(
+                os.path.exists(os.path.join(fixture_dir, "route_200.json"))
+            )
+            again = run_suite(
+                fixture_dir,
+                seconds=0.001,
+                trip_miles=(),
+                fixture_routes=((200, 50),),
+                hos_weeks=(),
+            )
+
+        mock_overpass.assert_not_called()
+        self.assertEqual(again["fixtures"], report["fixtures"])
+        self.assertEqual(
+            [(r["component"], r["case"]) for r in report["results"]],
+            [
+                ("HOSCalculator", "trip_50mi"),
+                ("ELDLogRenderer", "trip_50mi"),
+                ("HOSCalculator", "weeks_1_simulate"),
+                ("HOSCalculator", "weeks_1_logs"),
+                ("HOSCalculator", "weeks_1_memoized"),
+                ("find_gas_stations_along_route", "route_200_points"),
+                ("find_gas_stations_along_route", "route_200_corridor"),
+            ],
+        )
+        for result in report["results"]:
+            self.assertGreaterEqual(result["calls"], 5)
+            self.assertGreater(result["ops_per_sec"], 0)
+            latency = result["latency_ms"]
+            self.assertLessEqual(latency["min"], latency["p50"])
+            self.assertLessEqual(latency["p50"], latency["max"])
+        json.dumps(report)
+
+    def test_compare_flags_regressions(self):
+        from .benchmarks import compare
+
+        def report(min_ms, peak_kb):
+            return {
+                "results": [
+                    {
+                        "component": "HOSCalculator",
+                        "case": "trip_50mi",
+                        "latency_ms": {"min": min_ms},
+                        "peak_memory_kb": peak_kb,
+                    }
+                ]
+            }
+
+        baseline = report(1.0, 100.0)
+        self.assertFalse(compare(baseline, report(1.05, 105.0), 0.1)[0]["regression"])
+        self.assertTrue(compare(baseline, report(2.0, 100.0), 0.1)[0]["regression"])
+        self.assertTrue(compare(baseline, report(1.0, 150.0), 0.1)[0]["regression"])
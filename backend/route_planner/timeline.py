@@ -0,0 +1,298 @@
+"""
+Minute-resolution duty status timelines and vectorized HOS checks.
+
+A trip's log days are painted onto one int8 array with a slot per minute,
+1440 per calendar day, holding the status codes of ``hos_engine``. Daily
+totals and every hours-of-service limit are then evaluated with
+whole-array NumPy operations (cumulative sums over runs of duty status)
+instead of walking activity lists.
+"""
+
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from .hos_engine import (
+    DRIVING,
+    MINUTES_PER_DAY,
+    OFF_DUTY,
+    ON_DUTY,
+    STATUSES,
+    DayLog,
+)
+
+MAX_DRIVING = 11 * 60
+DUTY_WINDOW = 14 * 60
+MIN_OFF_DUTY = 10 * 60
+BREAK_AFTER = 8 * 60
+MIN_BREAK = 30
+MAX_CYCLE = 70 * 60
+CYCLE_WINDOW = 8 * MINUTES_PER_DAY
+RESTART = 34 * 60
+
+# Cycle hours worked before the trip are assumed spread over the week
+# before departure, and roll out of the 8-day window accordingly
+PRIOR_CYCLE_WINDOW = 7 * MINUTES_PER_DAY
+
+VIOLATION_DESCRIPTIONS = {
+    "11-Hour Driving Limit": (
+        "Drove more than 11 hours after 10 consecutive hours off duty"
+    ),
+    "14-Hour Duty Window": "Drove after the 14th hour since coming on duty",
+    "30-Minute Break": "Drove more than 8 hours without a 30-minute break",
+    "70-Hour/8-Day Limit": "Drove after 70 hours on duty in 8 days",
+}
+
+
+def build_timeline(days: List[DayLog], first_day: int = 1) -> np.ndarray:
+    """
+    Paint log days onto a ``(calendar days, 1440)`` int8 status array, log
+    day ``first_day`` on the first row
+
+    Activities that run past midnight continue into the next row; minutes
+    no activity covers are off duty.
+    """
+    rows = max((day.day_number for day in days), default=first_day - 1) - first_day + 3
+    timeline = np.full(rows * MINUTES_PER_DAY, OFF_DUTY, dtype=np.int8)
+    for day in days:
+        base = (day.day_number - first_day) * MINUTES_PER_DAY
+        for activity in day.activities:
+            start = base + activity.start
+            timeline[start : start + activity.minutes] = activity.status
+    return timeline.reshape(rows, MINUTES_PER_DAY)
+
+
+def daily_totals(timeline: np.ndarray) -> np.ndarray:
+    """Minutes per calendar day in each status, shape ``(days, 4)``"""
+    rows = timeline.shape[0]
+    codes = np.arange(rows)[:, None] * len(STATUSES) + timeline
+    return np.bincount(codes.ravel(), minlength=rows * len(STATUSES)).reshape(
+        rows, len(STATUSES)
+    )
+
+
+def _runs(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Start and (exclusive) end indices of each run of True in ``mask``"""
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], mask.view(np.int8), [0]))))
+    return edges[::2], edges[1::2]
+
+
+def _segments(mask: np.ndarray, min_length: int, row_starts: np.ndarray) -> np.ndarray:
+    """
+    Number each minute by how many runs of ``mask`` at least ``min_length``
+    long have ended at or before it, starting a new number on every row
+    """
+    starts, ends = _runs(mask)
+    boundaries = np.bincount(
+        ends[ends - starts >= min_length], minlength=len(mask) + 1
+    )
+    boundaries[row_starts] += 1
+    return np.cumsum(boundaries[:-1])
+
+
+def _since_segment_start(values: np.ndarray, segment: np.ndarray) -> np.ndarray:
+    """Running sum of ``values`` restarted at each new segment number"""
+    total = np.cumsum(values)
+    starts = np.flatnonzero(np.diff(segment, prepend=-1))
+    offset = np.zeros(segment[-1] + 1, dtype=total.dtype)
+    offset[segment[starts]] = total[starts] - values[starts]
+    return total - offset[segment]
+
+
+def _segment_first(values: np.ndarray, segment: np.ndarray) -> np.ndarray:
+    """Smallest of ``values`` within each minute's segment"""
+    starts = np.flatnonzero(np.diff(segment, prepend=-1))
+    first = np.minimum.reduceat(values, starts)
+    return first[np.cumsum(np.diff(segment, prepend=-1) != 0) - 1]
+
+
+def violation_minutes(
+    timeline: np.ndarray, cycle_minutes: int = 0
+) -> Dict[str, np.ndarray]:
+    """
+    Boolean masks over the flattened timeline of the driving minutes that
+    break each limit
+    """
+    masks = batch_violation_minutes(timeline.reshape(1, -1), np.array([cycle_minutes]))
+    return {violation_type: mask[0] for violation_type, mask in masks.items()}
+
+
+def _clocks(timelines: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    The HOS clocks at every minute of each row of ``timelines``, flattened
+    with a trailing pad minute per row that keeps runs from joining across
+    rows; evaluated for all rows with whole-array operations
+    """
+    trips, width = timelines.shape
+    padded = width + 1
+    minutes = np.full((trips, padded), OFF_DUTY, dtype=np.int8)
+    minutes[:, :width] = timelines
+    minutes = minutes.ravel()
+    pad = np.zeros((trips, padded), dtype=bool)
+    pad[:, width] = True
+    pad = pad.ravel()
+
+    driving = minutes == DRIVING
+    on_duty = driving | (minutes == ON_DUTY)
+    index = np.arange(len(minutes))
+    row_starts = np.arange(trips) * padded
+    row_start = np.repeat(row_starts, padded)
+
+    # Duty periods are separated by 10 consecutive hours off duty
+    period = _segments(~on_duty & ~pad, MIN_OFF_DUTY, row_starts)
+    period_driving = _since_segment_start(driving.astype(np.int32), period)
+    period_start = _segment_first(np.where(on_duty, index, len(minutes)), period)
+
+    # Any non-driving stretch of 30 minutes resets the 8-hour driving clock
+    stint = _segments(~driving & ~pad, MIN_BREAK, row_starts)
+    stint_driving = _since_segment_start(driving.astype(np.int32), stint)
+
+    # On-duty minutes in the trailing 8 days, counted from the last 34-hour
+    # restart
+    on_duty_total = np.concatenate(([0], np.cumsum(on_duty)))
+    starts, ends = _runs(~on_duty & ~pad)
+    restarts = ends[(ends - starts >= RESTART) & (ends % padded < width)]
+    anchor = np.full(len(minutes), -1)
+    anchor[row_starts] = row_starts
+    anchor[restarts] = restarts
+    anchor = np.maximum.accumulate(anchor)
+    window_start = np.maximum(index + 1 - CYCLE_WINDOW, anchor)
+
+    return {
+        "driving": driving,
+        "period_driving": period_driving,
+        "duty_elapsed": index - period_start,
+        "stint_driving": stint_driving,
+        "cycle": on_duty_total[index + 1] - on_duty_total[window_start],
+        "restarted": anchor > row_start,
+        "elapsed": index - row_start + 1,
+    }
+
+
+def _prior_cycle(cycle_minutes: np.ndarray, elapsed: np.ndarray) -> np.ndarray:
+    """Pre-trip cycle minutes still in the 8-day window ``elapsed`` minutes in"""
+    overlap = np.clip(CYCLE_WINDOW - elapsed, 0, PRIOR_CYCLE_WINDOW)
+    return cycle_minutes * overlap / PRIOR_CYCLE_WINDOW
+
+
+def _limit_masks(clocks: Dict[str, np.ndarray], prior: Any) -> Dict[str, np.ndarray]:
+    """Driving minutes that break each limit; ``prior`` is added to the
+    cycle until the first restart"""
+    driving = clocks["driving"]
+    cycle = clocks["cycle"] + np.where(clocks["restarted"], 0, prior)
+    return {
+        "11-Hour Driving Limit": driving & (clocks["period_driving"] > MAX_DRIVING),
+        "14-Hour Duty Window": driving & (clocks["duty_elapsed"] >= DUTY_WINDOW),
+        "30-Minute Break": driving & (clocks["stint_driving"] > BREAK_AFTER),
+        "70-Hour/8-Day Limit": driving & (cycle > MAX_CYCLE),
+    }
+
+
+def batch_violation_minutes(
+    timelines: np.ndarray, cycle_minutes: np.ndarray
+) -> Dict[str, np.ndarray]:
+    """
+    ``violation_minutes`` for many trips at once
+
+    Args:
+        timelines: ``(trips, minutes)`` status codes, one flattened
+            timeline per row (shorter trips padded with off duty)
+        cycle_minutes: ``(trips,)`` cycle minutes used before each trip
+
+    Returns:
+        ``(trips, minutes)`` masks per rule, every row evaluated on its own
+    """
+    trips, width = timelines.shape
+    clocks = _clocks(timelines)
+    prior = _prior_cycle(
+        np.repeat(np.asarray(cycle_minutes), width + 1), clocks["elapsed"]
+    )
+    return {
+        violation_type: mask.reshape(trips, width + 1)[:, :width]
+        for violation_type, mask in _limit_masks(clocks, prior).items()
+    }
+
+
+def shifted_violation_counts(
+    timelines: np.ndarray, cycle_minutes: np.ndarray, shifts: np.ndarray
+) -> np.ndarray:
+    """
+    Violations of each trip when its duty starts ``shifts`` minutes after
+    midnight instead of at midnight, counted like ``find_violations``: once
+    per rule and calendar day
+
+    Only the calendar days minutes fall on and the pre-trip cycle hours
+    still in the 8-day window depend on the start, so the clocks are
+    evaluated once per trip and the shifts are applied at driving minutes.
+
+    Args:
+        timelines: ``(trips, minutes)`` timelines of duty starting at
+            midnight, ending with at least a day off duty
+        cycle_minutes: ``(trips,)`` cycle minutes used before each trip
+        shifts: ``(starts,)`` minutes after midnight, each under a day
+
+    Returns:
+        ``(starts, trips)`` violation counts
+    """
+    trips, width = timelines.shape
+    shifts = np.asarray(shifts)
+    clocks = _clocks(timelines)
+    at = np.flatnonzero(clocks["driving"])
+    row, minute = np.divmod(at, width + 1)
+    clocks = {name: values[at] for name, values in clocks.items()}
+    prior = np.asarray(cycle_minutes)[row]
+
+    counts = np.zeros((len(shifts), trips), dtype=np.int64)
+    for shift_index, shift in enumerate(shifts):
+        shifted = dict(clocks, elapsed=clocks["elapsed"] + shift)
+        masks = _limit_masks(shifted, _prior_cycle(prior, shifted["elapsed"]))
+        day = (minute + shift) // MINUTES_PER_DAY
+        for mask in masks.values():
+            # Driving minutes are in row then time order, so each (trip, day)
+            # with a violation is counted at its first violating minute
+            violating_row, violating_day = row[mask], day[mask]
+            first = np.ones(len(violating_row), dtype=bool)
+            first[1:] = (violating_row[1:] != violating_row[:-1]) | (
+                violating_day[1:] != violating_day[:-1]
+            )
+            counts[shift_index] += np.bincount(
+                violating_row[first], minlength=trips
+            )
+    return counts
+
+
+def find_violations(
+    days: List[DayLog], cycle_minutes: int = 0, first_day: int = 1
+) -> List[Dict[str, Any]]:
+    """
+    Check a simulated trip against the 11-hour, 14-hour, 30-minute break
+    and 70-hour/8-day rules
+
+    ``cycle_minutes`` were worked in the week before log day ``first_day``,
+    the first one checked.
+
+    Returns:
+        One violation per rule and calendar day on which it is broken, with
+        ``type``, ``description``, ``severity``, ``day_number`` and
+        ``minutes`` (how long the driver drove in breach)
+    """
+    masks = violation_minutes(build_timeline(days, first_day), cycle_minutes)
+
+    violations = []
+    for violation_type, mask in masks.items():
+        per_day = mask.reshape(-1, MINUTES_PER_DAY).sum(axis=1)
+        for day_index in np.flatnonzero(per_day):
+            violations.append(
+                {
+                    "type": violation_type,
+                    "description": (
+                        f"{VIOLATION_DESCRIPTIONS[violation_type]} "
+                        f"({int(per_day[day_index])} min)"
+                    ),
+                    "severity": "violation",
+                    "day_number": int(day_index) + first_day,
+                    "minutes": int(per_day[day_index]),
+                }
+            )
+    violations.sort(key=lambda violation: violation["day_number"])
+    return violations
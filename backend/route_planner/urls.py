@@ -13,9 +13,22 @@ urlpatterns = [
         views.TripPlanViewSet.as_view({"post": "plan_trip"}),
         name="plan_trip",
     ),
+    path(
+        "plan-trips/",
+        views.TripPlanViewSet.as_view({"post": "plan_batch"}),
+        name="plan_batch",
+    ),
+    path(
+        "plan-trip/scenarios/",
+        views.TripPlanViewSet.as_view({"post": "scenarios"}),
+        name="plan_scenarios",
+    ),
     path(
         "trip/<int:pk>/",
         views.TripPlanViewSet.as_view({"get": "get_trip"}),
         name="get_trip",
     ),
+    path("plan-trip-async/", views.plan_trip_async, name="plan_trip_async"),
+    path("hours-available/", views.driver_hours, name="driver_hours"),
+    path("metrics/", views.cache_metrics, name="cache_metrics"),
 ]
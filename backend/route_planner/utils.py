@@ -1,67 +1,235 @@
-import requests
 import logging
 import math
+import time
 from typing import List, Dict, Tuple, Optional, Any
+import numpy as np
+from django.conf import settings
+from . import geohash, geometry, metrics, polyline
+from .cache import StationTileCache, get_station_tile_cache
+from .circuit import get_breaker, is_upstream_failure
+from .providers import get_provider
 
 logger = logging.getLogger("route_planner.utils")
 
+FUEL_SEARCH_MODES = ("points", "corridor")
+KM_PER_MILE = 1.609344
+
 
 def find_gas_stations_along_route(
-    route_geometry: Dict[str, Any], number_of_stops: int, radius_km: float = 2.0
+    route_geometry: Dict[str, Any],
+    number_of_stops: int,
+    radius_km: float = 2.0,
+    mode: str = "points",
+    index: Any = None,
 ) -> List[Dict[str, Any]]:
     """
     Find gas stations at intervals along a route
 
+    In ``"corridor"`` mode every truck-friendly station within ``radius_km``
+    of the route is returned instead, ordered by along-route mileage and
+    annotated with ``route_miles`` and ``detour_miles``; ``number_of_stops``
+    is ignored.
+
     Args:
         route_geometry: The route geometry from OpenRouteService API
         number_of_stops: The number of fuel stops to find
         radius_km: Search radius in kilometers around each point
+        mode: ``"points"`` or ``"corridor"``
+        index: ``StationIndex`` to search (default: this worker's, loaded
+            from the database when due)
 
     Returns:
         List of dictionaries with gas station information
     """
-    if not route_geometry or number_of_stops <= 0:
+    if mode not in FUEL_SEARCH_MODES:
+        raise ValueError(f"Invalid fuel search mode: {mode}")
+
+    if not route_geometry or (mode == "points" and number_of_stops <= 0):
         logger.warning("Invalid parameters for finding gas stations")
         return []
 
     try:
-        all_coordinates = extract_route_coordinates(route_geometry)
-
-        if not all_coordinates:
-            logger.warning("No valid coordinates found in route geometry")
+        if mode == "corridor":
+            corridor = route_corridor(route_geometry, radius_km)
+            if corridor is None:
+                return []
+            stations = find_gas_stations_in_corridor(corridor, index)
+            return [summarize_station(station) for station in stations]
+
+        stop_positions = route_stop_positions(route_geometry, number_of_stops)
+        if not stop_positions:
             return []
 
-        route_length = len(all_coordinates)
-        if route_length <= 2:
-            logger.warning("Route too short to calculate fuel stops")
+        results = find_gas_stations_near_positions(stop_positions, radius_km, index)
+        return [summarize_station(stations[0]) for stations in results if stations]
+
+    except Exception as e:
+        logger.error(f"Error finding gas stations: {str(e)}", exc_info=True)
+        return []
+
+
+class RouteCorridor:
+    """
+    A route simplified with Douglas–Peucker and buffered by ``radius_km``.
+
+    ``line`` holds the simplified vertices and ``cumulative_km`` their
+    along-route distance measured on the full polyline, so mileages stay
+    true to the road even where the simplified line cuts corners.
+    """
+
+    def __init__(self, coordinates: List[Tuple[float, float]], radius_km: float):
+        points = geometry.as_points(coordinates)
+        cumulative = geometry.cumulative_distance_km(points)
+        tolerance_km = min(settings.FUEL_CORRIDOR_TOLERANCE_KM, radius_km)
+        kept = geometry.simplify(points, tolerance_km)
+
+        self.radius_km = radius_km
+        self.line = points[kept]
+        self.cumulative_km = cumulative[kept]
+        # Points within radius_km of the route are at most radius_km plus
+        # the simplification error away from the simplified line
+        self.search_radius_km = radius_km + tolerance_km
+
+    @property
+    def length_miles(self) -> float:
+        """Route length on the same scale as the stations' ``route_miles``"""
+        return float(self.cumulative_km[-1]) / KM_PER_MILE
+
+    def locate(self, stations: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Keep the stations inside the corridor, ordered by along-route
+        mileage, with ``route_miles`` and ``detour_miles`` set
+        """
+        if not stations:
             return []
 
-        stop_positions = calculate_stop_positions(all_coordinates, number_of_stops)
+        offsets, along = geometry.project_onto_polyline(
+            [(station["lat"], station["lng"]) for station in stations],
+            self.line,
+            self.cumulative_km,
+        )
+        located = []
+        for i in np.argsort(along, kind="stable"):
+            if offsets[i] > self.search_radius_km:
+                continue
+            station = dict(stations[i])
+            station["route_miles"] = round(float(along[i]) / KM_PER_MILE, 1)
+            # Off the route to the station and back again
+            station["detour_miles"] = round(2 * float(offsets[i]) / KM_PER_MILE, 2)
+            located.append(station)
+        return located
+
+
+def route_corridor(
+    route_geometry: Dict[str, Any], radius_km: float
+) -> Optional[RouteCorridor]:
+    """Build the search corridor for a route, or None if it has no geometry"""
+    coordinates = extract_route_coordinates(route_geometry)
+    if len(coordinates) < 2:
+        logger.warning("No valid coordinates found in route geometry")
+        return None
+    return RouteCorridor(coordinates, radius_km)
+
+
+def is_truck_friendly(station: Dict[str, Any]) -> bool:
+    """Whether OSM tags the station as usable by heavy goods vehicles"""
+    amenities = station.get("amenities", [])
+    return "Truck Friendly" in amenities or "Truck Parking" in amenities
+
+
+def find_gas_stations_in_corridor(
+    corridor: RouteCorridor, index: Any = None
+) -> List[Dict[str, Any]]:
+    """
+    Find every truck-friendly station in a route corridor with one local
+    index search or, outside the imported extract or where it has no
+    stations, one Overpass query
 
-        gas_stations = []
-        for position in stop_positions:
-            lat, lng = position
-            stations = find_nearby_gas_stations(lat, lng, radius_km)
-            if stations:
-                closest = stations[0]
-                gas_stations.append(
-                    {
-                        "name": closest.get("name", "Gas Station"),
-                        "location": {
-                            "lat": closest.get("lat"),
-                            "lng": closest.get("lng"),
-                        },
-                        "address": closest.get("address", ""),
-                        "amenities": closest.get("amenities", []),
-                    }
-                )
+    Args:
+        corridor: The route corridor
+        index: ``StationIndex`` to search (default: this worker's)
 
-        return gas_stations
+    Returns:
+        Stations ordered by along-route mileage
+    """
+    if index is None:
+        from .fuel_stations import get_station_index
 
-    except Exception as e:
-        logger.error(f"Error finding gas stations: {str(e)}", exc_info=True)
+        index = get_station_index()
+    stations = search_corridor_index(index, corridor)
+    if stations is None:
+        stations = query_overpass_corridor(corridor)
+    return corridor.locate([s for s in stations if is_truck_friendly(s)])
+
+
+def search_corridor_index(
+    index: Any, corridor: RouteCorridor
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    Corridor candidates from the local index, or None if it isn't covered
+    or has no candidates: an empty answer inside the extract's bounding box
+    may be a gap in the extract rather than a stretch without stations
+    """
+    candidates = []
+    if settings.FUEL_STATION_SOURCE != "overpass" and all(
+        index.covers(lat, lng) for lat, lng in corridor.line.tolist()
+    ):
+        candidates = index.near_polyline(corridor.line, corridor.search_radius_km)
+    metrics.incr("fuel.corridor_local" if candidates else "fuel.corridor_overpass")
+    return candidates or None
+
+
+def query_overpass_corridor(corridor: RouteCorridor) -> List[Dict[str, Any]]:
+    """Fuel stations around a whole corridor with a single Overpass query"""
+    stations = fetch_overpass_stations(
+        build_overpass_corridor_query(corridor.line, corridor.search_radius_km),
+        f"corridor of {len(corridor.line)} points",
+    )
+    return stations or []
+
+
+def route_stop_positions(
+    route_geometry: Dict[str, Any], number_of_stops: int
+) -> List[Tuple[float, float]]:
+    """Return the points along a route where fuel stations are searched for"""
+    all_coordinates = extract_route_coordinates(route_geometry)
+
+    if not all_coordinates:
+        logger.warning("No valid coordinates found in route geometry")
+        return []
+
+    route_length = len(all_coordinates)
+    if route_length <= 2:
+        logger.warning("Route too short to calculate fuel stops")
         return []
 
+    return calculate_stop_positions(all_coordinates, number_of_stops)
+
+
+def summarize_station(station: Dict[str, Any]) -> Dict[str, Any]:
+    """Reduce a station found by ``find_nearby_gas_stations`` to a fuel stop"""
+    summary = {
+        "name": station.get("name", "Gas Station"),
+        "location": {
+            "lat": station.get("lat"),
+            "lng": station.get("lng"),
+        },
+        "address": station.get("address", ""),
+        "amenities": station.get("amenities", []),
+    }
+    # Corridor searches also locate the station along the route, and the
+    # fuel planner records what is bought there
+    for key in (
+        "route_miles",
+        "detour_miles",
+        "refuel_miles",
+        "price_per_gallon",
+        "fuel_cost",
+    ):
+        if key in station:
+            summary[key] = station[key]
+    return summary
+
 
 def extract_route_coordinates(
     route_geometry: Dict[str, Any]
@@ -69,6 +237,10 @@ def extract_route_coordinates(
     """
     Extract coordinates from route geometry
 
+    Encoded polylines are decoded here, only when a caller actually needs
+    the points (fuel stop placement); everything else keeps the compact
+    string.
+
     Args:
         route_geometry: The route geometry from OpenRouteService API
 
@@ -78,61 +250,9 @@ def extract_route_coordinates(
     all_coordinates = []
 
     try:
-        if "to_pickup" in route_geometry:
-            pickup_coords = []
-            pickup_data = route_geometry["to_pickup"]
-
-            if "routes" in pickup_data and pickup_data["routes"]:
-                route = pickup_data["routes"][0]
-                if "geometry" in route:
-                    if (
-                        isinstance(route["geometry"], dict)
-                        and "coordinates" in route["geometry"]
-                    ):
-                        pickup_coords = [
-                            [coord[1], coord[0]]
-                            for coord in route["geometry"]["coordinates"]
-                        ]
-                    elif isinstance(route["geometry"], str):
-                        pass
-
-            elif "features" in pickup_data and pickup_data["features"]:
-                feature = pickup_data["features"][0]
-                if "geometry" in feature and "coordinates" in feature["geometry"]:
-                    pickup_coords = [
-                        [coord[1], coord[0]]
-                        for coord in feature["geometry"]["coordinates"]
-                    ]
-
-            all_coordinates.extend(pickup_coords)
-
-        if "to_delivery" in route_geometry:
-            delivery_coords = []
-            delivery_data = route_geometry["to_delivery"]
-
-            if "routes" in delivery_data and delivery_data["routes"]:
-                route = delivery_data["routes"][0]
-                if "geometry" in route:
-                    if (
-                        isinstance(route["geometry"], dict)
-                        and "coordinates" in route["geometry"]
-                    ):
-                        delivery_coords = [
-                            [coord[1], coord[0]]
-                            for coord in route["geometry"]["coordinates"]
-                        ]
-                    elif isinstance(route["geometry"], str):
-                        pass
-
-            elif "features" in delivery_data and delivery_data["features"]:
-                feature = delivery_data["features"][0]
-                if "geometry" in feature and "coordinates" in feature["geometry"]:
-                    delivery_coords = [
-                        [coord[1], coord[0]]
-                        for coord in feature["geometry"]["coordinates"]
-                    ]
-
-            all_coordinates.extend(delivery_coords)
+        for leg in ("to_pickup", "to_delivery"):
+            if leg in route_geometry:
+                all_coordinates.extend(leg_coordinates(route_geometry[leg]))
 
     except Exception as e:
         logger.error(f"Error extracting coordinates: {str(e)}", exc_info=True)
@@ -140,12 +260,199 @@ def extract_route_coordinates(
     return all_coordinates
 
 
+def leg_coordinates(leg_data: Dict[str, Any]) -> List[Tuple[float, float]]:
+    """
+    Return the [lat, lng] points of one leg
+
+    Args:
+        leg_data: A compact leg (see ``compact_route``), a directions
+            response (``routes``) or a GeoJSON feature collection
+            (``features``)
+
+    Returns:
+        List of [lat, lng] coordinate pairs, empty if the leg has no geometry
+    """
+    if leg_data.get("routes"):
+        geometry = leg_data["routes"][0].get("geometry")
+    elif leg_data.get("features"):
+        geometry = leg_data["features"][0].get("geometry")
+    else:
+        geometry = leg_data.get("geometry")
+
+    if isinstance(geometry, str):
+        return list(polyline.decode_cached(geometry))
+    if isinstance(geometry, dict) and "coordinates" in geometry:
+        return [[coord[1], coord[0]] for coord in geometry["coordinates"]]
+    return []
+
+
+def encode_route_geometry(route_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Convert GeoJSON route geometries in a directions response to encoded
+    polylines, in place
+
+    OpenRouteService returns encoded polylines from its JSON endpoint, but
+    GeoJSON ``LineString`` geometries (``[lng, lat]`` pairs) are accepted too
+    so everything cached and stored downstream has the compact form.
+
+    Args:
+        route_data: Directions response with a ``routes`` list
+
+    Returns:
+        The same response
+    """
+    for route in route_data.get("routes", []):
+        geometry = route.get("geometry")
+        if isinstance(geometry, dict) and "coordinates" in geometry:
+            route["geometry"] = polyline.encode(
+                [coord[1], coord[0]] for coord in geometry["coordinates"]
+            )
+    return route_data
+
+
+def compact_route(route_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Reduce a directions response to the canonical leg stored on trips
+
+    Only the encoded geometry and the leg summary are kept; turn-by-turn
+    instructions are stored separately (see ``route_instructions``) and
+    segments, way points, bbox and metadata are dropped.
+
+    Args:
+        route_data: Directions response, or an already compact leg
+
+    Returns:
+        ``{"geometry": "<encoded polyline>", "summary": {"distance", "duration"}}``
+        with distance in miles and duration in seconds
+    """
+    if not route_data or "routes" not in route_data:
+        return route_data
+
+    route = encode_route_geometry(route_data)["routes"][0]
+    summary = route.get("summary", {})
+    return {
+        "geometry": route.get("geometry", ""),
+        "summary": {
+            "distance": summary.get("distance", 0),
+            "duration": summary.get("duration", 0),
+        },
+    }
+
+
+def route_instructions(route_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Extract the turn-by-turn steps of a directions response
+
+    Args:
+        route_data: Directions response with ``segments``
+
+    Returns:
+        List of steps with instruction text, street name, distance (miles),
+        duration (seconds), maneuver type and ``way_points`` indices into
+        the leg geometry
+    """
+    if not route_data or not route_data.get("routes"):
+        return []
+
+    steps = []
+    for segment in route_data["routes"][0].get("segments", []):
+        for step in segment.get("steps", []):
+            steps.append(
+                {
+                    "instruction": step.get("instruction", ""),
+                    "name": step.get("name", ""),
+                    "distance": step.get("distance", 0),
+                    "duration": step.get("duration", 0),
+                    "type": step.get("type"),
+                    "way_points": step.get("way_points", []),
+                }
+            )
+    return steps
+
+
+def split_route_legs(route_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Split a multi-waypoint directions response into one response per leg
+
+    Each leg keeps the shape of a single-leg OpenRouteService response
+    (``routes[0]`` with ``summary``, ``segments``, ``geometry`` and
+    ``way_points``) so it can be used wherever a separately requested leg
+    was used before.
+
+    Args:
+        route_data: Directions response for a route with N+1 way points
+
+    Returns:
+        List of N per-leg responses
+
+    Raises:
+        ValueError: If the response has no per-segment data to split on
+    """
+    try:
+        route = route_data["routes"][0]
+        segments = route["segments"]
+        way_points = route["way_points"]
+    except (KeyError, IndexError, TypeError) as e:
+        raise ValueError(f"Route response cannot be split into legs: {e}")
+
+    if len(way_points) != len(segments) + 1:
+        raise ValueError(
+            f"Route has {len(segments)} segments but {len(way_points)} way points"
+        )
+
+    geometry = route.get("geometry")
+    if isinstance(geometry, str):
+        points = polyline.decode(geometry)
+    elif isinstance(geometry, dict) and "coordinates" in geometry:
+        points = geometry["coordinates"]
+    else:
+        points = []
+
+    legs = []
+    for segment, start, end in zip(segments, way_points, way_points[1:]):
+        leg_points = points[start : end + 1]
+        segment = dict(
+            segment,
+            steps=[
+                dict(step, way_points=[i - start for i in step.get("way_points", [])])
+                for step in segment.get("steps", [])
+            ],
+        )
+        if isinstance(geometry, str):
+            leg_geometry = polyline.encode(leg_points)
+        else:
+            leg_geometry = {"type": "LineString", "coordinates": leg_points}
+
+        legs.append(
+            {
+                "routes": [
+                    {
+                        "summary": {
+                            "distance": segment.get("distance", 0),
+                            "duration": segment.get("duration", 0),
+                        },
+                        "segments": [segment],
+                        "geometry": leg_geometry,
+                        "way_points": [0, end - start],
+                    }
+                ],
+                "metadata": route_data.get("metadata", {}),
+            }
+        )
+
+    return legs
+
+
 def calculate_stop_positions(
     coordinates: List[Tuple[float, float]], number_of_stops: int
 ) -> List[Tuple[float, float]]:
     """
     Calculate positions for fuel stops along the route
 
+    Stops split the route's length into equal intervals by distance
+    traveled, so dense urban stretches of the polyline don't pull them
+    together. Each stop is the first route vertex reached at its mileage.
+
     Args:
         coordinates: List of [lat, lng] coordinates
         number_of_stops: Number of stops to calculate
@@ -157,17 +464,15 @@ def calculate_stop_positions(
         return []
 
     try:
-        route_length = len(coordinates)
-
-        segment_length = route_length / (number_of_stops + 1)
-
-        stop_positions = []
-        for i in range(1, number_of_stops + 1):
-            index = int(i * segment_length)
-            if 0 <= index < route_length:
-                stop_positions.append(coordinates[index])
+        cumulative = geometry.cumulative_distance_km(coordinates)
+        total_km = cumulative[-1]
+        if total_km <= 0:
+            return []
 
-        return stop_positions
+        indices = geometry.indices_at_distances(
+            cumulative, geometry.evenly_spaced_distances(total_km, number_of_stops)
+        )
+        return [coordinates[i] for i in indices]
 
     except Exception as e:
         logger.error(f"Error calculating stop positions: {str(e)}", exc_info=True)
@@ -188,45 +493,330 @@ def find_nearby_gas_stations(
     Returns:
         List of gas station dictionaries
     """
+    return find_gas_stations_near_positions([(lat, lng)], radius_km)[0]
+
+
+def find_gas_stations_near_positions(
+    positions: List[Tuple[float, float]], radius_km: float = 2.0, index: Any = None
+) -> List[List[Dict[str, Any]]]:
+    """
+    Find gas stations around several points
+
+    Points with stations in the imported fuel station extract are answered
+    from the local index; the rest from cached geohash tiles, with a single Overpass
+    query for any tiles not cached yet.
+
+    Args:
+        positions: List of (lat, lng) search points
+        radius_km: Search radius in kilometers around each point
+        index: ``StationIndex`` to search (default: this worker's)
+
+    Returns:
+        One list of stations per position, closest first
+    """
+    if index is None:
+        from .fuel_stations import get_station_index
+
+        index = get_station_index()
+    results, remote = search_station_index(index, positions, radius_km)
+    if remote:
+        remote_positions = [positions[i] for i in remote]
+        if get_station_tile_cache().enabled:
+            fetched = query_station_tiles(remote_positions, radius_km)
+        else:
+            fetched = query_overpass_stations(remote_positions, radius_km)
+        for i, stations in zip(remote, fetched):
+            results[i] = stations
+    return results
+
+
+def search_station_index(
+    index: Any, positions: List[Tuple[float, float]], radius_km: float
+) -> Tuple[List[Optional[List[Dict[str, Any]]]], List[int]]:
+    """
+    Answer what the local station index covers
+
+    Positions inside the extract's bounding box with no local stations are
+    left to Overpass too, since the box may span areas the extract lacks.
+
+    Returns:
+        ``(results, remote)`` where ``results`` has one station list per
+        position (None where not answered) and ``remote`` the indices of the
+        positions that still need an Overpass lookup
+    """
+    results = [None] * len(positions)
+    remote = []
+    for i, (lat, lng) in enumerate(positions):
+        if settings.FUEL_STATION_SOURCE != "overpass" and index.covers(lat, lng):
+            results[i] = index.within(lat, lng, radius_km) or None
+        if results[i] is None:
+            remote.append(i)
+
+    metrics.incr("fuel.local", len(positions) - len(remote))
+    metrics.incr("fuel.overpass", len(remote))
+    return results, remote
+
+
+def query_overpass_stations(
+    positions: List[Tuple[float, float]], radius_km: float = 2.0
+) -> List[List[Dict[str, Any]]]:
+    """
+    Find gas stations around several points with a single Overpass query
+
+    Args:
+        positions: List of (lat, lng) search points
+        radius_km: Search radius in kilometers around each point
+
+    Returns:
+        One list of stations per position, closest first
+    """
+    stations = fetch_overpass_stations(
+        build_overpass_union_query(positions, radius_km), f"{len(positions)} points"
+    )
+    if stations is None:
+        return [[] for _ in positions]
+    return assign_stations_to_positions(stations, positions)
+
+
+def query_station_tiles(
+    positions: List[Tuple[float, float]], radius_km: float = 2.0
+) -> List[List[Dict[str, Any]]]:
+    """
+    Find gas stations around several points from cached geohash tiles
+
+    Only the tiles missing from the cache are requested, all in one
+    Overpass query.
+
+    Args:
+        positions: List of (lat, lng) search points
+        radius_km: Search radius in kilometers around each point
+
+    Returns:
+        One list of stations per position, closest first
+    """
+    cache = get_station_tile_cache()
+    covering, tiles, missing = lookup_station_tiles(cache, positions, radius_km)
+    if missing:
+        stations = fetch_overpass_stations(
+            build_overpass_tiles_query(missing), f"{len(missing)} tiles"
+        )
+        store_station_tiles(cache, tiles, missing, stations)
+    return stations_from_tiles(positions, radius_km, covering, tiles)
+
+
+def lookup_station_tiles(
+    cache: StationTileCache, positions: List[Tuple[float, float]], radius_km: float
+) -> Tuple[List[List[str]], Dict[str, List[Dict[str, Any]]], List[str]]:
+    """
+    Returns:
+        ``(covering, tiles, missing)``: the tiles covering each position's
+        search circle, the cached stations by tile and the uncached tiles
+    """
+    covering = [
+        geohash.covering(lat, lng, radius_km, cache.precision) for lat, lng in positions
+    ]
+    wanted = list(dict.fromkeys(tile for tiles in covering for tile in tiles))
+    tiles, missing = cache.get_many(wanted)
+    return covering, tiles, missing
+
+
+def store_station_tiles(
+    cache: StationTileCache,
+    tiles: Dict[str, List[Dict[str, Any]]],
+    missing: List[str],
+    stations: Optional[List[Dict[str, Any]]],
+) -> None:
+    """Split fetched stations into the missing tiles and cache them"""
+    if stations is None:
+        return
+
+    fetched = {tile: [] for tile in missing}
+    for station in stations:
+        tile = geohash.encode(station["lat"], station["lng"], cache.precision)
+        if tile in fetched:
+            fetched[tile].append(station)
+
+    cache.set_many(fetched)
+    tiles.update(fetched)
+
+
+def stations_from_tiles(
+    positions: List[Tuple[float, float]],
+    radius_km: float,
+    covering: List[List[str]],
+    tiles: Dict[str, List[Dict[str, Any]]],
+) -> List[List[Dict[str, Any]]]:
+    """Merge each position's tiles and keep the stations within the radius"""
+    results = []
+    for (lat, lng), position_tiles in zip(positions, covering):
+        candidates = [
+            station for tile in position_tiles for station in tiles.get(tile, ())
+        ]
+        if not candidates:
+            results.append([])
+            continue
+
+        distances = geometry.distances_from(
+            lat, lng, [(station["lat"], station["lng"]) for station in candidates]
+        )
+        order = np.argsort(distances, kind="stable")
+        results.append([candidates[i] for i in order if distances[i] <= radius_km])
+    return results
+
+
+def fetch_overpass_stations(query: str, target: str) -> Optional[List[Dict[str, Any]]]:
+    """
+    Run an Overpass fuel station query through the circuit breaker
+
+    Args:
+        query: Overpass QL query
+        target: What is searched around, for log messages
+
+    Returns:
+        The stations found, or None if the query failed or was refused
+    """
+    breaker = get_breaker("overpass")
+    if not breaker.allow():
+        logger.warning(f"Overpass circuit open, skipping fuel search at {target}")
+        return None
+
+    response = None
     try:
-        overpass_url = "https://overpass-api.de/api/interpreter"
-        overpass_query = f"""
-        [out:json];
-        node["amenity"="fuel"](around:{radius_km * 1000},{lat},{lng});
+        started = time.monotonic()
+        response = get_provider().overpass(query)
+        breaker.record(
+            not is_upstream_failure(response.status_code), time.monotonic() - started
+        )
+
+        if response.status_code != 200:
+            logger.error(f"Overpass API error: {response.status_code}, {response.text}")
+            return None
+
+        return overpass_elements_to_stations(response.json())
+
+    except Exception as e:
+        logger.error(f"Error finding nearby gas stations: {str(e)}", exc_info=True)
+        if response is None:
+            breaker.record(False)
+        return None
+
+
+def build_overpass_query(lat: float, lng: float, radius_km: float) -> str:
+    """Build the Overpass QL query for fuel stations around a point"""
+    return build_overpass_union_query([(lat, lng)], radius_km)
+
+
+def build_overpass_union_query(
+    positions: List[Tuple[float, float]], radius_km: float
+) -> str:
+    """Build one Overpass QL union query for fuel stations around every point"""
+    clauses = "".join(
+        f'node["amenity"="fuel"](around:{radius_km * 1000},{lat},{lng});'
+        for lat, lng in positions
+    )
+    return f"""
+        [out:json][timeout:{int(settings.OVERPASS_READ_TIMEOUT)}];
+        ({clauses});
         out body;
         """
 
-        response = requests.post(overpass_url, data={"data": overpass_query})
 
-        if response.status_code != 200:
-            logger.error(f"Overpass API error: {response.status_code}, {response.text}")
-            return []
+def build_overpass_tiles_query(tiles: List[str]) -> str:
+    """Build one Overpass QL union query for fuel stations in geohash tiles"""
+    clauses = "".join(
+        'node["amenity"="fuel"]({:.6f},{:.6f},{:.6f},{:.6f});'.format(
+            *geohash.bounds(tile)
+        )
+        for tile in tiles
+    )
+    return f"""
+        [out:json][timeout:{int(settings.OVERPASS_READ_TIMEOUT)}];
+        ({clauses});
+        out body;
+        """
 
-        data = response.json()
 
-        stations = []
-        for element in data.get("elements", []):
-            if element.get("type") == "node":
-                tags = element.get("tags", {})
+def build_overpass_corridor_query(line: np.ndarray, radius_km: float) -> str:
+    """Build an Overpass QL query for fuel stations along a polyline"""
+    path = ",".join(f"{lat:.6f},{lng:.6f}" for lat, lng in line.tolist())
+    return f"""
+        [out:json][timeout:{int(settings.OVERPASS_READ_TIMEOUT)}];
+        node["amenity"="fuel"](around:{radius_km * 1000},{path});
+        out body;
+        """
 
-                station = {
-                    "id": element.get("id"),
-                    "name": tags.get("name", "Gas Station"),
-                    "lat": element.get("lat"),
-                    "lng": element.get("lon"),
-                    "address": format_address(tags),
-                    "amenities": extract_amenities(tags),
-                }
 
-                stations.append(station)
+def overpass_elements_to_stations(data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Convert the fuel nodes of an Overpass response to station dictionaries"""
+    stations = []
+    for element in data.get("elements", []):
+        if element.get("type") == "node":
+            stations.append(
+                station_from_tags(
+                    element.get("id"),
+                    element.get("lat"),
+                    element.get("lon"),
+                    element.get("tags", {}),
+                )
+            )
 
-        stations.sort(key=lambda x: calculate_distance(lat, lng, x["lat"], x["lng"]))
+    return stations
 
-        return stations
 
-    except Exception as e:
-        logger.error(f"Error finding nearby gas stations: {str(e)}", exc_info=True)
-        return []
+def station_from_tags(
+    osm_id: Any, lat: float, lng: float, tags: Dict[str, str]
+) -> Dict[str, Any]:
+    """Build a station dictionary from an OSM fuel node"""
+    return {
+        "id": osm_id,
+        "name": tags.get("name", "Gas Station"),
+        "lat": lat,
+        "lng": lng,
+        "address": format_address(tags),
+        "amenities": extract_amenities(tags),
+    }
+
+
+def assign_stations_to_positions(
+    stations: List[Dict[str, Any]], positions: List[Tuple[float, float]]
+) -> List[List[Dict[str, Any]]]:
+    """
+    Group stations by their nearest search point
+
+    Fuel stops are hundreds of miles apart while search radii are a few
+    kilometers, so each station of a union query belongs to exactly one
+    point and the per-point results match separate queries.
+
+    Args:
+        stations: Stations from ``overpass_elements_to_stations``
+        positions: The (lat, lng) points that were searched around
+
+    Returns:
+        One list of stations per position, closest first
+    """
+    grouped = [[] for _ in positions]
+    if not positions or not stations:
+        return grouped
+
+    distances = geometry.distance_matrix(
+        [(station["lat"], station["lng"]) for station in stations], positions
+    )
+    nearest = distances.argmin(axis=1)
+    nearest_distances = distances[np.arange(len(stations)), nearest]
+
+    for i in np.argsort(nearest_distances, kind="stable"):
+        grouped[nearest[i]].append(stations[i])
+
+    return grouped
+
+
+def parse_overpass_stations(
+    data: Dict[str, Any], lat: float, lng: float
+) -> List[Dict[str, Any]]:
+    """Convert Overpass fuel nodes to stations sorted by distance from a point"""
+    return assign_stations_to_positions(
+        overpass_elements_to_stations(data), [(lat, lng)]
+    )[0]
 
 
 def format_address(tags: Dict[str, str]) -> str:
@@ -1,19 +1,169 @@
+import json
+from datetime import date
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.http import HttpResponseNotAllowed, JsonResponse
 from rest_framework import viewsets, status, permissions
-from rest_framework.decorators import action
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework_simplejwt.authentication import JWTAuthentication
-from .models import TripPlan, HOSViolation
+from .models import TripPlan, HOSViolation, TripRouteInstructions
 from .serializers import (
     TripPlanSerializer,
+    TripPlanBatchCreateSerializer,
     TripPlanCreateSerializer,
     TripPlanDetailSerializer,
+    TripReplanSerializer,
+    TripScenarioSerializer,
     HOSViolationSerializer,
 )
 from .services import HOSCalculator
+from .async_services import AsyncHOSCalculator
+from .batch import BatchTripPlanner
+from .replan import TripReplanner
+from .scenarios import sweep
+from .recap import fleet_hours_available, hours_available, record_new_trips
+from .cache import (
+    ROUTE_CACHE_MODES,
+    geocode_cache_stats,
+    route_cache_stats,
+    schedule_cache_stats,
+    station_tile_cache_stats,
+)
+from .circuit import circuit_stats
+from .fuel_planner import FUEL_STOP_STRATEGIES
+from .utils import FUEL_SEARCH_MODES
+from . import metrics
 import logging
 
 logger = logging.getLogger("route_planner.views")
 
+
+def _planning_options(query_params):
+    """Validated ``route_cache``, ``fuel_search`` and ``fuel_plan`` options"""
+    route_cache_mode = query_params.get("route_cache", "default")
+    if route_cache_mode not in ROUTE_CACHE_MODES:
+        raise ValueError(
+            f"route_cache must be one of: {', '.join(ROUTE_CACHE_MODES)}"
+        )
+    fuel_search_mode = query_params.get("fuel_search", settings.FUEL_SEARCH_MODE)
+    if fuel_search_mode not in FUEL_SEARCH_MODES:
+        raise ValueError(
+            f"fuel_search must be one of: {', '.join(FUEL_SEARCH_MODES)}"
+        )
+
+    fuel_strategy = query_params.get("fuel_plan", settings.FUEL_STOP_STRATEGY)
+    if fuel_strategy not in FUEL_STOP_STRATEGIES:
+        raise ValueError(
+            f"fuel_plan must be one of: {', '.join(FUEL_STOP_STRATEGIES)}"
+        )
+    return {
+        "route_cache_mode": route_cache_mode,
+        "fuel_search_mode": fuel_search_mode,
+        "fuel_strategy": fuel_strategy,
+    }
+
+
+def _new_trip_plan(user, data, trip_result):
+    return TripPlan(
+        user=user,
+        current_location=data["current_location"],
+        pickup_location=data["pickup_location"],
+        dropoff_location=data["dropoff_location"],
+        current_cycle_hours=float(data["current_cycle_hours"]),
+        total_distance=trip_result["total_distance"],
+        total_duration=trip_result["total_duration"],
+        route_geometry=trip_result["route_geometry"],
+        eld_logs=trip_result["eld_logs"],
+        departure_time=trip_result.get("departure_time"),
+    )
+
+
+def _trip_children(trip, trip_result):
+    """Unsaved HOS violations and route instructions of a saved trip"""
+    violations = [
+        HOSViolation(
+            trip=trip,
+            violation_type=violation["type"],
+            description=violation["description"],
+            severity=violation["severity"],
+        )
+        for violation in trip_result.get("violations", [])
+    ]
+    instructions = (
+        TripRouteInstructions(trip=trip, legs=trip_result["route_instructions"])
+        if trip_result.get("route_instructions")
+        else None
+    )
+    return violations, instructions
+
+
+def save_trip_plan(user, data, trip_result):
+    """Persist a calculated trip and its HOS violations"""
+    with transaction.atomic():
+        trip = _new_trip_plan(user, data, trip_result)
+        trip.save()
+
+        logger.debug(f"Generating ELD log grids for trip ID: {trip.id}")
+
+        violations, instructions = _trip_children(trip, trip_result)
+        for violation in violations:
+            violation.save()
+        if instructions is not None:
+            instructions.save()
+
+    return trip
+
+
+def save_replanned_trip(trip, trip_result):
+    """Persist a re-planned trip, replacing its HOS violations"""
+    with transaction.atomic():
+        for field in (
+            "total_distance",
+            "total_duration",
+            "route_geometry",
+            "eld_logs",
+        ):
+            setattr(trip, field, trip_result[field])
+        trip.save()
+
+        violations, instructions = _trip_children(trip, trip_result)
+        HOSViolation.objects.filter(trip=trip).delete()
+        HOSViolation.objects.bulk_create(violations)
+        if instructions is not None:
+            TripRouteInstructions.objects.update_or_create(
+                trip=trip, defaults={"legs": instructions.legs}
+            )
+
+    return trip
+
+
+def save_trip_plans(user, planned):
+    """
+    Persist several calculated trips, given as ``(data, trip_result)``
+    pairs, with one bulk insert per table
+    """
+    with transaction.atomic():
+        trips = TripPlan.objects.bulk_create(
+            [_new_trip_plan(user, data, trip_result) for data, trip_result in planned]
+        )
+        violations = []
+        instructions = []
+        for trip, (_, trip_result) in zip(trips, planned):
+            trip_violations, trip_instructions = _trip_children(trip, trip_result)
+            violations.extend(trip_violations)
+            if trip_instructions is not None:
+                instructions.append(trip_instructions)
+        HOSViolation.objects.bulk_create(violations)
+        TripRouteInstructions.objects.bulk_create(instructions)
+        record_new_trips(trips)
+
+    return trips
+
+
 class TripPlanViewSet(viewsets.ModelViewSet):
     """
     ViewSet for TripPlan model.
@@ -30,6 +180,12 @@ class TripPlanViewSet(viewsets.ModelViewSet):
         """Return appropriate serializer class based on action"""
         if self.action == "create" or self.action == "plan_trip":
             return TripPlanCreateSerializer
+        elif self.action == "plan_batch":
+            return TripPlanBatchCreateSerializer
+        elif self.action == "scenarios":
+            return TripScenarioSerializer
+        elif self.action == "replan":
+            return TripReplanSerializer
         elif self.action in ["retrieve", "get_trip"]:
             return TripPlanDetailSerializer
         return TripPlanSerializer
@@ -37,9 +193,10 @@ class TripPlanViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         """Filter queryset to only show trips owned by the current user"""
         user = self.request.user
+        queryset = TripPlan.objects.prefetch_related("hosviolation_set")
         if user.is_staff:
-            return TripPlan.objects.all()
-        return TripPlan.objects.filter(user=user)
+            return queryset.all()
+        return queryset.filter(user=user)
 
     @action(detail=False, methods=["post"])
     def plan_trip(self, request):
@@ -55,35 +212,16 @@ class TripPlanViewSet(viewsets.ModelViewSet):
                 f"Calculating trip plan from {data['current_location']} to {data['dropoff_location']}"
             )
 
-            hos_calculator = HOSCalculator()
+            hos_calculator = HOSCalculator(**_planning_options(request.query_params))
             trip_result = hos_calculator.calculate_eld_logs(data)
 
-            trip = TripPlan.objects.create(
-                user=request.user,
-                current_location=data["current_location"],
-                pickup_location=data["pickup_location"],
-                dropoff_location=data["dropoff_location"],
-                current_cycle_hours=float(data["current_cycle_hours"]),
-                total_distance=trip_result["total_distance"],
-                total_duration=trip_result["total_duration"],
-                route_geometry=trip_result["route_geometry"],
-                eld_logs=trip_result["eld_logs"],
-            )
-
-            logger.debug(f"Generating ELD log grids for trip ID: {trip.id}")
-
-            for violation in trip_result["violations"]:
-                HOSViolation.objects.create(
-                    trip=trip,
-                    violation_type=violation["type"],
-                    description=violation["description"],
-                    severity=violation["severity"],
-                )
+            trip = save_trip_plan(request.user, data, trip_result)
 
-            return Response(
-                TripPlanDetailSerializer(trip, context={"request": request}).data,
-                status=status.HTTP_201_CREATED,
-            )
+            response_data = TripPlanDetailSerializer(
+                trip, context={"request": request}
+            ).data
+            response_data["stale"] = trip_result.get("stale", False)
+            return Response(response_data, status=status.HTTP_201_CREATED)
 
         except ValueError as e:
             logger.warning(f"Trip planning validation error: {str(e)}", exc_info=True)
@@ -104,6 +242,210 @@ class TripPlanViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
 
+    @action(detail=False, methods=["post"])
+    def plan_batch(self, request):
+        """
+        Plan several trips in one request
+
+        Each trip is reported on its own: ``status`` is ``"created"`` with
+        the saved trip, or ``"failed"`` with the error. Responds 201 when
+        every trip was created and 207 otherwise.
+        """
+        try:
+            serializer = TripPlanBatchCreateSerializer(data=request.data)
+            if not serializer.is_valid():
+                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            trips = serializer.validated_data["trips"]
+            logger.info(f"Processing batch planning request for {len(trips)} trips")
+
+            planner = BatchTripPlanner(**_planning_options(request.query_params))
+            items = [{"index": i} for i in range(len(trips))]
+            valid = []
+            for i, trip_data in enumerate(trips):
+                trip_serializer = TripPlanCreateSerializer(data=trip_data)
+                if trip_serializer.is_valid():
+                    valid.append((i, trip_serializer.validated_data))
+                else:
+                    items[i].update(
+                        status="failed",
+                        error=trip_serializer.errors,
+                        error_type="validation_error",
+                    )
+
+            planned = []
+            outcomes = planner.plan([data for _, data in valid])
+            for (i, data), outcome in zip(valid, outcomes):
+                if "result" in outcome:
+                    planned.append((i, data, outcome["result"]))
+                else:
+                    items[i].update(
+                        status="failed",
+                        error=f"Trip planning failed: {outcome['error']}",
+                        error_type=outcome["error_type"],
+                    )
+
+            saved = save_trip_plans(
+                request.user, [(data, result) for _, data, result in planned]
+            )
+            saved_trips = TripPlan.objects.prefetch_related("hosviolation_set").in_bulk(
+                [trip.id for trip in saved]
+            )
+            for (i, _, result), trip in zip(planned, saved):
+                trip_data = TripPlanSerializer(
+                    saved_trips[trip.id], context={"request": request}
+                ).data
+                trip_data["stale"] = result.get("stale", False)
+                items[i].update(status="created", trip=trip_data)
+
+            failed = len(trips) - len(planned)
+            return Response(
+                {"created": len(planned), "failed": failed, "trips": items},
+                status=(
+                    status.HTTP_207_MULTI_STATUS if failed else status.HTTP_201_CREATED
+                ),
+            )
+
+        except ValueError as e:
+            logger.warning(f"Batch planning validation error: {str(e)}", exc_info=True)
+            return Response(
+                {
+                    "error": f"Trip planning failed: {str(e)}",
+                    "error_type": "validation_error",
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        except Exception as e:
+            logger.error(f"Batch planning failed: {str(e)}", exc_info=True)
+            return Response(
+                {
+                    "error": f"Trip planning failed: {str(e)}",
+                    "error_type": "server_error",
+                },
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+    @action(detail=False, methods=["post"])
+    def scenarios(self, request):
+        """
+        Compare departure times and starting cycle hours for one trip
+
+        The trip is routed once and evaluated for every combination; nothing
+        is saved. See ``scenarios.sweep`` for the grids returned.
+        """
+        try:
+            serializer = TripScenarioSerializer(data=request.data)
+            if not serializer.is_valid():
+                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            data = serializer.validated_data
+
+            hos_calculator = HOSCalculator(**_planning_options(request.query_params))
+            route = hos_calculator.plan_route(
+                data["current_location"],
+                data["pickup_location"],
+                data["dropoff_location"],
+            )
+            grid = sweep(
+                hos_calculator,
+                route["total_duration"],
+                route["fuel_stops_required"],
+                [
+                    hos_calculator._parse_departure({"departure_time": departure})
+                    for departure in data["departure_times"]
+                ],
+                data["cycle_hours"],
+                route["fuel_stop_hours"],
+            )
+            return Response(
+                {
+                    "total_distance": route["total_distance"],
+                    "total_duration": route["total_duration"],
+                    "fuel_stops_required": route["fuel_stops_required"],
+                    "stale": route["stale"],
+                    **grid,
+                }
+            )
+
+        except ValueError as e:
+            logger.warning(f"Scenario validation error: {str(e)}", exc_info=True)
+            return Response(
+                {
+                    "error": f"Trip planning failed: {str(e)}",
+                    "error_type": "validation_error",
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        except Exception as e:
+            logger.error(f"Scenario planning failed: {str(e)}", exc_info=True)
+            return Response(
+                {
+                    "error": f"Trip planning failed: {str(e)}",
+                    "error_type": "server_error",
+                },
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+    @action(detail=True, methods=["post"])
+    def replan(self, request, pk=None):
+        """
+        Re-plan the rest of a trip in progress from the driver's position,
+        time and cycle hours; finished log days are kept as they are
+        """
+        trip = self.get_object()
+        try:
+            if trip.status != "in_progress":
+                raise ValueError("Only trips in progress can be re-planned")
+            serializer = TripReplanSerializer(data=request.data)
+            if not serializer.is_valid():
+                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            data = serializer.validated_data
+            logger.info(f"Re-planning trip ID: {pk}")
+
+            options = _planning_options(request.query_params)
+            replanner = TripReplanner(route_cache_mode=options["route_cache_mode"])
+            trip_result = replanner.replan(
+                trip,
+                (data["latitude"], data["longitude"]),
+                data["cycle_hours"],
+                as_of=data.get("as_of"),
+                picked_up=data.get("picked_up"),
+            )
+            trip = save_replanned_trip(trip, trip_result)
+
+            response_data = TripPlanDetailSerializer(
+                trip, context={"request": request}
+            ).data
+            response_data["stale"] = trip_result["stale"]
+            response_data["replan"] = {
+                key: trip_result[key]
+                for key in (
+                    "remaining_distance",
+                    "remaining_duration",
+                    "picked_up",
+                    "rerouted",
+                    "replanned_from_day",
+                )
+            }
+            return Response(response_data, status=status.HTTP_200_OK)
+
+        except ValueError as e:
+            logger.warning(f"Re-planning validation error: {str(e)}", exc_info=True)
+            return Response(
+                {
+                    "error": f"Trip re-planning failed: {str(e)}",
+                    "error_type": "validation_error",
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        except Exception as e:
+            logger.error(f"Re-planning failed: {str(e)}", exc_info=True)
+            return Response(
+                {
+                    "error": f"Trip re-planning failed: {str(e)}",
+                    "error_type": "server_error",
+                },
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
     @action(detail=True, methods=["get"])
     def get_trip(self, request, pk=None):
         """Get detailed information for an existing trip plan"""
@@ -125,6 +467,19 @@ class TripPlanViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
 
+    @action(detail=True, methods=["get"])
+    def instructions(self, request, pk=None):
+        """Turn-by-turn instructions for a trip, loaded only on request"""
+        trip = self.get_object()
+        route_instructions = TripRouteInstructions.objects.filter(trip=trip).first()
+        if route_instructions is None:
+            return Response(
+                {"error": "No route instructions stored for this trip"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        return Response({"id": trip.id, "legs": route_instructions.legs})
+
+
 class HOSViolationViewSet(viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for HOS Violations.
@@ -141,3 +496,133 @@ class HOSViolationViewSet(viewsets.ReadOnlyModelViewSet):
         if user.is_staff:
             return HOSViolation.objects.all()
         return HOSViolation.objects.filter(trip__user=user)
+
+
+@api_view(["GET"])
+@permission_classes([permissions.IsAdminUser])
+def cache_metrics(request):
+    """
+    Cache and upstream counters for this worker process
+    """
+    return Response(
+        {
+            "geocode_cache": geocode_cache_stats(),
+            "route_cache": route_cache_stats(),
+            "fuel_tile_cache": station_tile_cache_stats(),
+            "hos_schedule_cache": schedule_cache_stats(),
+            "circuits": circuit_stats(),
+            "counters": metrics.snapshot(),
+        }
+    )
+
+
+@api_view(["GET"])
+@permission_classes([permissions.IsAuthenticated])
+def driver_hours(request):
+    """
+    Hours left in the rolling 70-hour/8-day cycle for the requesting driver
+
+    Staff may ask for another driver with ``?user=<id>`` or for every driver
+    with ``?fleet=true``; ``?date=YYYY-MM-DD`` sets the last day of the
+    window (default today).
+    """
+    as_of = request.query_params.get("date")
+    try:
+        as_of = date.fromisoformat(as_of) if as_of else None
+    except ValueError:
+        return Response(
+            {"error": "date must be YYYY-MM-DD", "error_type": "validation_error"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    fleet = request.query_params.get("fleet", "").lower() == "true"
+    user_id = request.query_params.get("user")
+    if (fleet or user_id) and not request.user.is_staff:
+        return Response(
+            {"detail": "Only staff can view other drivers' hours."},
+            status=status.HTTP_403_FORBIDDEN,
+        )
+
+    if fleet:
+        return Response({"drivers": fleet_hours_available(as_of)})
+    user = request.user
+    if user_id:
+        user = get_user_model().objects.filter(pk=user_id).first()
+        if user is None:
+            return Response(
+                {"error": f"No driver with id {user_id}"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+    return Response(hours_available(user, as_of))
+
+
+def _authenticate_jwt(request):
+    """Resolve the JWT bearer token on a plain Django request"""
+    result = JWTAuthentication().authenticate(request)
+    return result[0] if result else None
+
+
+def _trip_detail_data(trip):
+    return TripPlanDetailSerializer(trip).data
+
+
+async def plan_trip_async(request):
+    """
+    Plan a trip with HOS compliance without blocking a worker.
+
+    Same contract as ``TripPlanViewSet.plan_trip``, but geocoding, routing and
+    fuel station lookups are awaited concurrently; served natively when the
+    app runs under ASGI. ORM access is delegated through ``sync_to_async``.
+    """
+    if request.method != "POST":
+        return HttpResponseNotAllowed(["POST"])
+
+    try:
+        user = await sync_to_async(_authenticate_jwt)(request)
+    except AuthenticationFailed as e:
+        return JsonResponse({"detail": str(e.detail)}, status=e.status_code)
+    if user is None:
+        return JsonResponse(
+            {"detail": "Authentication credentials were not provided."},
+            status=status.HTTP_401_UNAUTHORIZED,
+        )
+
+    try:
+        logger.info("Processing async trip planning request")
+
+        try:
+            payload = json.loads(request.body or b"{}")
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON body: {e}")
+
+        serializer = TripPlanCreateSerializer(data=payload)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        data = serializer.validated_data
+
+        hos_calculator = AsyncHOSCalculator(**_planning_options(request.GET))
+        trip_result = await hos_calculator.calculate_eld_logs(data)
+
+        trip = await sync_to_async(save_trip_plan)(user, data, trip_result)
+        response_data = await sync_to_async(_trip_detail_data)(trip)
+        response_data["stale"] = trip_result.get("stale", False)
+        return JsonResponse(response_data, status=status.HTTP_201_CREATED)
+
+    except ValueError as e:
+        logger.warning(f"Trip planning validation error: {str(e)}", exc_info=True)
+        return JsonResponse(
+            {
+                "error": f"Trip planning failed: {str(e)}",
+                "error_type": "validation_error",
+            },
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    except Exception as e:
+        logger.error(f"Trip planning failed: {str(e)}", exc_info=True)
+        return JsonResponse(
+            {
+                "error": f"Trip planning failed: {str(e)}",
+                "error_type": "server_error",
+            },
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
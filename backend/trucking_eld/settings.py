@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
 import os
+import tempfile
 import dj_database_url
 from pathlib import Path
 import logging.config
@@ -145,6 +146,102 @@ OPENROUTE_API_KEY = os.environ.get(
     "OPENROUTE_API_KEY", "5b3ce3597851110001cf62489d8b4c5a8b9e4a8db5c9f4e8a8f3d8e8"
 )
 
+# "live" calls OpenRouteService/Overpass, "record" also saves every response
+# under PROVIDER_FIXTURE_DIR, "replay" serves those fixtures offline
+ROUTING_PROVIDER = os.environ.get("ROUTING_PROVIDER", "live")
+PROVIDER_FIXTURE_DIR = os.environ.get(
+    "PROVIDER_FIXTURE_DIR", os.path.join(BASE_DIR, "fixtures", "providers")
+)
+REPLAY_LATENCY_MS = float(os.environ.get("REPLAY_LATENCY_MS", 0))
+REPLAY_LATENCY_JITTER_MS = float(os.environ.get("REPLAY_LATENCY_JITTER_MS", 0))
+
+GEOCODE_CACHE_TTL = int(os.environ.get("GEOCODE_CACHE_TTL", 60 * 60 * 24 * 30))
+GEOCODE_CACHE_NEGATIVE_TTL = int(os.environ.get("GEOCODE_CACHE_NEGATIVE_TTL", 60 * 60))
+GEOCODE_CACHE_LRU_SIZE = int(os.environ.get("GEOCODE_CACHE_LRU_SIZE", 2048))
+
+ROUTE_CACHE_TTL = int(os.environ.get("ROUTE_CACHE_TTL", 60 * 60 * 24 * 7))
+ROUTE_CACHE_MAX_BYTES = int(os.environ.get("ROUTE_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+ROUTE_CACHE_LRU_SIZE = int(os.environ.get("ROUTE_CACHE_LRU_SIZE", 64))
+ROUTE_CACHE_COORD_PRECISION = int(os.environ.get("ROUTE_CACHE_COORD_PRECISION", 4))
+# Each process trims the table once per this many stored routes
+ROUTE_CACHE_EVICT_EVERY = int(os.environ.get("ROUTE_CACHE_EVICT_EVERY", 100))
+
+ROUTE_SINGLE_REQUEST = os.environ.get("ROUTE_SINGLE_REQUEST", "False").lower() == "true"
+ROUTE_STORE_INSTRUCTIONS = (
+    os.environ.get("ROUTE_STORE_INSTRUCTIONS", "True").lower() == "true"
+)
+
+COALESCE_ACROSS_PROCESSES = (
+    os.environ.get("COALESCE_ACROSS_PROCESSES", "True").lower() == "true"
+)
+COALESCE_LOCK_DIR = os.environ.get(
+    "COALESCE_LOCK_DIR", os.path.join(tempfile.gettempdir(), "trucking_eld_locks")
+)
+COALESCE_LOCK_TIMEOUT = float(os.environ.get("COALESCE_LOCK_TIMEOUT", 35))
+
+PLANNER_MAX_WORKERS = int(os.environ.get("PLANNER_MAX_WORKERS", 8))
+PLANNER_REFRESH_WORKERS = int(os.environ.get("PLANNER_REFRESH_WORKERS", 2))
+# Processes simulating HOS logs for batch plans; 0 simulates in the request
+PLANNER_PROCESS_WORKERS = int(
+    os.environ.get("PLANNER_PROCESS_WORKERS", min(4, os.cpu_count() or 1))
+)
+PLANNER_BATCH_MAX_TRIPS = int(os.environ.get("PLANNER_BATCH_MAX_TRIPS", 200))
+# Departure times x cycle hours evaluated per scenario request
+SCENARIO_MAX_CELLS = int(os.environ.get("SCENARIO_MAX_CELLS", 5000))
+# Re-planning keeps the stored route while the driver is within this many
+# km of it and routes the current leg again otherwise
+REPLAN_ON_ROUTE_KM = float(os.environ.get("REPLAN_ON_ROUTE_KM", 2.0))
+
+# "auto" answers fuel searches from the imported FuelStation index where it
+# covers the route and falls back to Overpass elsewhere; "overpass" always
+# queries Overpass
+FUEL_STATION_SOURCE = os.environ.get("FUEL_STATION_SOURCE", "auto")
+FUEL_STATION_INDEX_TTL = int(os.environ.get("FUEL_STATION_INDEX_TTL", 3600))
+FUEL_STATION_INDEX_CELL_DEGREES = float(
+    os.environ.get("FUEL_STATION_INDEX_CELL_DEGREES", 0.05)
+)
+# "points" probes one spot per required fuel stop; "corridor" returns every
+# truck-friendly station along the route
+FUEL_SEARCH_MODE = os.environ.get("FUEL_SEARCH_MODE", "points")
+FUEL_CORRIDOR_TOLERANCE_KM = float(os.environ.get("FUEL_CORRIDOR_TOLERANCE_KM", 0.5))
+# Overpass results are cached per geohash tile; precision 5 tiles are about
+# 5 x 5 km. Set FUEL_TILE_CACHE_MAX_BYTES to 0 to query points directly.
+FUEL_TILE_PRECISION = int(os.environ.get("FUEL_TILE_PRECISION", 5))
+FUEL_TILE_CACHE_TTL = int(os.environ.get("FUEL_TILE_CACHE_TTL", 60 * 60 * 24))
+FUEL_TILE_CACHE_MAX_BYTES = int(
+    os.environ.get("FUEL_TILE_CACHE_MAX_BYTES", 16 * 1024 * 1024)
+)
+# "interval" assumes one fuel stop every 500 miles; "fewest" and "cheapest"
+# plan stops over the truck-friendly stations found along the route
+FUEL_STOP_STRATEGY = os.environ.get("FUEL_STOP_STRATEGY", "interval")
+FUEL_TANK_RANGE_MILES = float(os.environ.get("FUEL_TANK_RANGE_MILES", 600))
+FUEL_RESERVE_MILES = float(os.environ.get("FUEL_RESERVE_MILES", 100))
+FUEL_MILES_PER_GALLON = float(os.environ.get("FUEL_MILES_PER_GALLON", 6.5))
+FUEL_DEFAULT_PRICE = float(os.environ.get("FUEL_DEFAULT_PRICE", 4.0))
+
+# Simulated HOS schedules are memoized per worker, keyed on trip inputs
+# rounded to HOS_SCHEDULE_QUANTUM_MINUTES (1 keeps logs exact). Set
+# HOS_SCHEDULE_CACHE_SIZE to 0 to simulate every plan.
+HOS_SCHEDULE_CACHE_SIZE = int(os.environ.get("HOS_SCHEDULE_CACHE_SIZE", 1024))
+HOS_SCHEDULE_QUANTUM_MINUTES = int(os.environ.get("HOS_SCHEDULE_QUANTUM_MINUTES", 1))
+
+CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get("CIRCUIT_FAILURE_THRESHOLD", 5))
+CIRCUIT_RESET_TIMEOUT = float(os.environ.get("CIRCUIT_RESET_TIMEOUT", 30))
+CIRCUIT_SLOW_CALL_SECONDS = float(os.environ.get("CIRCUIT_SLOW_CALL_SECONDS", 10))
+CACHE_STALE_TTL = int(os.environ.get("CACHE_STALE_TTL", 7 * 24 * 3600))
+
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT", 3.05))
+HTTP_READ_TIMEOUT = float(os.environ.get("HTTP_READ_TIMEOUT", 15))
+ORS_READ_TIMEOUT = float(os.environ.get("ORS_READ_TIMEOUT", 30))
+OVERPASS_READ_TIMEOUT = float(os.environ.get("OVERPASS_READ_TIMEOUT", 25))
+HTTP_POOL_CONNECTIONS = int(os.environ.get("HTTP_POOL_CONNECTIONS", 4))
+HTTP_POOL_MAXSIZE = int(os.environ.get("HTTP_POOL_MAXSIZE", 10))
+HTTP_MAX_RETRIES = int(os.environ.get("HTTP_MAX_RETRIES", 3))
+HTTP_BACKOFF_FACTOR = float(os.environ.get("HTTP_BACKOFF_FACTOR", 0.5))
+HTTP_BACKOFF_MAX = float(os.environ.get("HTTP_BACKOFF_MAX", 10))
+HTTP_BACKOFF_JITTER = float(os.environ.get("HTTP_BACKOFF_JITTER", 0.5))
+HTTP_RETRY_AFTER_MAX = float(os.environ.get("HTTP_RETRY_AFTER_MAX", 30))
+
 CSRF_TRUSTED_ORIGINS = os.environ.get("CSRF_TRUSTED_ORIGINS", "http://localhost:3000,http://trucking_eld_backend:8000").split(",")
 
 AUTH_USER_MODEL = "users.TruckUser"